@@ -10,6 +10,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 import rados_deploy
 import rados_deploy.internal.data_deploy.plugin as plugin
+from rados_deploy.internal.util.printer import *
+from rados_deploy.internal.util.tracer import enable_tracing, disable_tracing, trace_export, trace_span
 
 def _get_modules():
     import rados_deploy.cli.install as install
@@ -25,6 +27,7 @@ def generic_args(parser):
     parser.add_argument('--install_dir', type=str, metavar='path', default='./deps/', help='Installation directory for rados-deploy, metareserve etc, for all remote machines. Note: The home directory of the remote machines is prepended to this path if it is relative.')
     parser.add_argument('--key-path', dest='key_path', type=str, default=None, help='Path to ssh key to access nodes.')
     parser.add_argument('--admin', metavar='id', dest='admin_id', type=int, default=None, help='ID of the node that is/will be the Ceph admin node.')
+    parser.add_argument('--trace', metavar='path', type=str, default=None, help='If set, records how long every phase and command took on each node, and writes it to given path in Chrome trace format (view it with chrome://tracing or https://ui.perfetto.dev).')
     
 
 def subparser(parser):
@@ -38,7 +41,16 @@ def deploy(mainparser, parsers, args):
     '''Processing of deploy commandline args occurs here.'''
     for parsers_for_module, module in zip(parsers, _get_modules()):
         if module.deploy_args_set(args):
-            return module.deploy(parsers_for_module, args)
+            if not args.trace:
+                return module.deploy(parsers_for_module, args)
+            enable_tracing()
+            try:
+                with trace_span(args.command):
+                    return module.deploy(parsers_for_module, args)
+            finally:
+                disable_tracing()
+                if trace_export(args.trace):
+                    prints('Wrote trace to {}'.format(args.trace))
     mainparser.print_help()
     return False
 
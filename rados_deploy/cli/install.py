@@ -10,12 +10,18 @@ def subparser(subparsers):
     '''Register subparser modules'''
     installparser = subparsers.add_parser('install', help='Orchestrate RADOS-Ceph environment on server cluster.')
     installparser.add_argument('--arrow-url', metavar='url', dest='arrow_url', type=str, default=defaults.arrow_url(), help='Arrow download URL. Defaults to Arrow with JNI bridge and RADOS-Ceph connector.')
+    installparser.add_argument('--arrow-sha256', metavar='hash', dest='arrow_sha256', type=str, default=None, help='If set, verifies that the sha256 checksum of the archive downloaded from the Arrow download URL matches given value.')
     
-    installparser.add_argument('--cores', metavar='amount', type=int, default=defaults.cores(), help='Amount of cores to use for compiling on remote nodes (default={}).'.format(defaults.cores()))
+    installparser.add_argument('--cores', metavar='amount', type=int, default=defaults.cores(), help='Amount of cores to use for compiling on remote nodes (default: number of cores of admin node, limited to 1 core per 2GB of available memory).')
     installparser.add_argument('--use-sudo', metavar='bool', dest='use_sudo', help='If set, uses superuser-priviledged commands during installation. Otherwise, performs local installs, no superuser privileges required.')
-    installparser.add_argument('--force-reinstall', dest='force_reinstall', help='If set, we always will re-download and install Arrow. Otherwise, we will skip installing if we already have installed Arrow.', action='store_true')
+    installparser.add_argument('--artifact-dir', metavar='path', dest='artifact_dir', type=str, default=None, help='Directory on the admin node to cache Arrow builds in (default=~/.rados_deploy/artifacts). Builds are reused when the Arrow source and build flags did not change.')
+    installparser.add_argument('--force-reinstall', dest='force_reinstall', help='If set, we always will re-download, compile and install Arrow. Otherwise, we will skip installing if we already have installed Arrow, or restore it from the artifact cache if we built the same source before.', action='store_true')
+    installparser.add_argument('--incremental', help='If set, we compile Arrow using Ninja and ccache, and keep its build directory between installs. Only changed sources are recompiled.', action='store_true')
     installparser.add_argument('--debug', dest='debug', help='If set, we compile Arrow using debug flags.', action='store_true')
+    installparser.add_argument('--apt-proxy', metavar='url', dest='apt_proxy', type=str, default=None, help='If set, nodes fetch packages through given apt proxy, e.g. "http://proxyhost:3142".')
+    installparser.add_argument('--apt-cache', dest='apt_cache', help='If set, starts an apt cache on the admin node, through which all nodes fetch packages. This way, every package is downloaded from the internet only once.', action='store_true')
     installparser.add_argument('--silent', help='If set, less boot output is shown.', action='store_true')
+    installparser.add_argument('--max-in-flight', metavar='amount', dest='max_in_flight', type=int, default=defaults.max_in_flight(), help='Maximum number of commands running at the same time when fanning out to cluster nodes (default={}). Lower this when nodes refuse ssh connections (sshd MaxStartups).'.format(defaults.max_in_flight()))
     installparser.add_argument('--retries', metavar='amount', type=int, default=defaults.retries(), help='Amount of retries to use for risky operations (default={}).'.format(defaults.retries()))
     return [installparser]
 
@@ -35,4 +41,4 @@ def deploy(parsers, args):
         return False
     if not _install_ssh(reservation, key_path=args.key_path, cluster_keypair=None, silent=args.silent, use_sudo=args.use_sudo):
         return False
-    return _install(reservation, install_dir=args.install_dir, key_path=args.key_path, admin_id=args.admin_id, arrow_url=args.arrow_url, use_sudo=args.use_sudo, force_reinstall=args.force_reinstall, debug=args.debug, silent=args.silent, cores=args.cores)[0] if reservation else False
\ No newline at end of file
+    return _install(reservation, install_dir=args.install_dir, key_path=args.key_path, admin_id=args.admin_id, arrow_url=args.arrow_url, use_sudo=args.use_sudo, force_reinstall=args.force_reinstall, debug=args.debug, silent=args.silent, cores=args.cores, apt_proxy=args.apt_proxy, apt_cache=args.apt_cache, artifact_dir=args.artifact_dir, incremental=args.incremental, arrow_sha256=args.arrow_sha256, max_in_flight=args.max_in_flight)[0] if reservation else False
\ No newline at end of file
@@ -15,6 +15,8 @@ def subparser(subparsers):
     startparser.add_argument('--placement-groups', metavar='amount', dest='placement_groups', type=int, default=None, help='Amount of placement groups in Ceph. By default, we use the formula `(num osds * 100) / (pool size)`, as found here: https://ceph.io/pgcalc/.'.format(defaults.mountpoint_path()))
     startparser.add_argument('--disable-client-cache', dest='disable_client_cache', help='If set, disables the I/O cache on the clients.')
     startparser.add_argument('--silent', help='If set, less boot output is shown.', action='store_true')
+    startparser.add_argument('--reconcile', help='If set, and a cluster with the same daemons is already running, only applies config changes instead of rebuilding the cluster. Falls back to a full rebuild otherwise.', action='store_true')
+    startparser.add_argument('--max-in-flight', metavar='amount', dest='max_in_flight', type=int, default=defaults.max_in_flight(), help='Maximum number of commands running at the same time when fanning out to cluster nodes (default={}). Lower this when nodes refuse ssh connections (sshd MaxStartups).'.format(defaults.max_in_flight()))
     startparser.add_argument('--retries', metavar='amount', type=int, default=defaults.retries(), help='Amount of retries to use for risky operations (default={}).'.format(defaults.retries()))
 
     subsubparsers = startparser.add_subparsers(help='Subsubcommands', dest='subcommand')
@@ -26,7 +28,7 @@ Memstore stores all data inside the RAM of each Ceph OSD node.''')
     bluestoreparser = subsubparsers.add_parser('bluestore', help='''Start a bluestore cluster.
 Bluestore stores all data on a separate device, using its own filesystem.
 Each node must provide extra info:
- - device_path: Path to storage device, e.g. "/dev/nvme0n1p4".''')
+ - device_path: Path to storage device, e.g. "/dev/nvme0n1p4". Use a comma-separated list for multiple devices, e.g. "/dev/nvme0n1,/dev/nvme1n1".''')
     bluestoreparser.add_argument('--device-path', metavar='path', dest='device_path', type=str, default=None, help='Overrides "device_path" specification for all nodes.')
     
     return [startparser, memstoreparser, bluestoreparser]
@@ -43,11 +45,11 @@ def deploy(parsers, args):
     if args.subcommand == 'memstore':
         from rados_deploy.start import memstore
         reservation = _cli_util.read_reservation_cli()
-        return memstore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, osd_op_threads=args.osd_op_threads, osd_pool_size=args.osd_pool_size, osd_max_obj_size=args.osd_max_obj_size, placement_groups=args.placement_groups, use_client_cache=not args.disable_client_cache, storage_size=args.storage_size, silent=args.silent, retries=args.retries)[0] if reservation else False
+        return memstore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, osd_op_threads=args.osd_op_threads, osd_pool_size=args.osd_pool_size, osd_max_obj_size=args.osd_max_obj_size, placement_groups=args.placement_groups, use_client_cache=not args.disable_client_cache, storage_size=args.storage_size, silent=args.silent, retries=args.retries, reconcile=args.reconcile, max_in_flight=args.max_in_flight)[0] if reservation else False
     elif args.subcommand == 'bluestore':
         from rados_deploy.start import bluestore
         reservation = _cli_util.read_reservation_cli()
-        return bluestore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, osd_op_threads=args.osd_op_threads, osd_pool_size=args.osd_pool_size, osd_max_obj_size=args.osd_max_obj_size, placement_groups=args.placement_groups, use_client_cache=not args.disable_client_cache, device_path=args.device_path, silent=args.silent, retries=args.retries)[0] if reservation else False
+        return bluestore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, osd_op_threads=args.osd_op_threads, osd_pool_size=args.osd_pool_size, osd_max_obj_size=args.osd_max_obj_size, placement_groups=args.placement_groups, use_client_cache=not args.disable_client_cache, device_path=args.device_path, silent=args.silent, retries=args.retries, reconcile=args.reconcile, max_in_flight=args.max_in_flight)[0] if reservation else False
     else: # User did not specify what type of storage type to use.
         printe('Did not provide a storage type (e.g. bluestore).')
         parsers[0].print_help()
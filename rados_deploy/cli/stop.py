@@ -8,6 +8,7 @@ def subparser(subparsers):
     '''Register subparser modules'''
     stopparser = subparsers.add_parser('stop', help='Stop RADOS-Ceph on a cluster.')
     stopparser.add_argument('--mountpoint', metavar='path', type=str, default=start_defaults.mountpoint_path(), help='Mountpoint for CephFS on all nodes (default={}).'.format(start_defaults.mountpoint_path()))
+    stopparser.add_argument('--max-in-flight', metavar='amount', dest='max_in_flight', type=int, default=start_defaults.max_in_flight(), help='Maximum number of commands running at the same time when fanning out to cluster nodes (default={}). Lower this when nodes refuse ssh connections (sshd MaxStartups).'.format(start_defaults.max_in_flight()))
     stopparser.add_argument('--silent', help='If set, less output is shown.', action='store_true')
     
     subsubparsers = stopparser.add_subparsers(help='Subsubcommands', dest='subcommand')
@@ -30,11 +31,11 @@ def deploy(parsers, args):
     if args.subcommand == 'memstore':
         from rados_deploy.stop import memstore
         reservation = _cli_util.read_reservation_cli()
-        return memstore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, silent=args.silent) if reservation else False
+        return memstore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, silent=args.silent, max_in_flight=args.max_in_flight) if reservation else False
     elif args.subcommand == 'bluestore':
         from rados_deploy.stop import bluestore
         reservation = _cli_util.read_reservation_cli()
-        return bluestore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, silent=args.silent) if reservation else False
+        return bluestore(reservation, key_path=args.key_path, admin_id=args.admin_id, mountpoint_path=args.mountpoint, silent=args.silent, max_in_flight=args.max_in_flight) if reservation else False
     else: # User did not specify what type of storage type to use.
         printe('Did not provide a storage type (e.g. bluestore).')
         parsers[0].print_help()
@@ -6,25 +6,33 @@ import tempfile
 from rados_deploy import Designation
 import rados_deploy.internal.defaults.install as defaults
 from rados_deploy.internal.remoto.modulegenerator import ModuleGenerator
+from rados_deploy.internal.remoto.modules.apt import apt_cache_url
 from rados_deploy.internal.remoto.ssh_wrapper import get_wrapper, get_wrappers, close_wrappers
 import rados_deploy.internal.util.fs as fs
 import rados_deploy.internal.util.importer as importer
 import rados_deploy.internal.util.location as loc
 from rados_deploy.internal.util.printer import *
+from rados_deploy.internal.util.tracer import trace_remote_call, trace_span
 
 
-def _install_rados(connection, module, reservation, install_dir, arrow_url=defaults.arrow_url(), force_reinstall=False, debug=False, silent=False, cores=defaults.cores()):
+def _install_rados(connection, module, reservation, install_dir, arrow_url=defaults.arrow_url(), force_reinstall=False, debug=False, silent=False, cores=defaults.cores(), apt_proxy=None, apt_cache_node=None, artifact_dir=None, incremental=False, arrow_sha256=None, max_in_flight=None):
     remote_module = connection.import_module(module)
 
+    if apt_cache_node:
+        if not trace_remote_call(remote_module, 'install_apt_cache', silent):
+            printe('Could not start apt cache on admin node.')
+            return False
+        apt_proxy = apt_cache_url(apt_cache_node.hostname)
+
     hosts = [x.hostname for x in reservation.nodes]
-    if not remote_module.install_ceph_deploy(loc.cephdeploydir(install_dir), silent):
+    if not trace_remote_call(remote_module, 'install_ceph_deploy', loc.cephdeploydir(install_dir), silent):
         printe('Could not install ceph-deploy.')
         return False
     hosts_designations_mapping = {x.hostname: [Designation[y.strip().upper()].name for y in x.extra_info['designations'].split(',')] if 'designations' in x.extra_info else [] for x in reservation.nodes}
-    if not remote_module.install_ceph(hosts_designations_mapping, silent):
+    if not trace_remote_call(remote_module, 'install_ceph', hosts_designations_mapping, silent, apt_proxy, max_in_flight):
         printe('Could not install Ceph on some node(s).')
         return False
-    if not remote_module.install_rados(loc.arrowdir(install_dir), hosts_designations_mapping, arrow_url, force_reinstall, debug, silent, cores):
+    if not trace_remote_call(remote_module, 'install_rados', loc.arrowdir(install_dir), hosts_designations_mapping, arrow_url, force_reinstall, debug, silent, cores, apt_proxy, artifact_dir, incremental, arrow_sha256, max_in_flight):
         printe('Could not install RADOS-Ceph on some node(s).')
         return False
     prints('Installed RADOS-Ceph.')
@@ -34,12 +42,17 @@ def _install_rados(connection, module, reservation, install_dir, arrow_url=defau
 def _installed_ssh(connection, module, keypair=None):
     remote_module = connection.import_module(module)
     privkey_sha256 = hashlib.sha256(bytes(keypair[0])).hexdigest() if keypair else None
-    return remote_module.already_installed(privkey_sha256)
+    return trace_remote_call(remote_module, 'already_installed', privkey_sha256)
 
 
 def _install_ssh(connection, module, reservation, keypair, user, use_sudo=True):
     remote_module = connection.import_module(module)
-    return remote_module.install_ssh_keys([x.hostname for x in reservation.nodes], keypair, user, use_sudo)
+    return trace_remote_call(remote_module, 'install_ssh_keys', [x.hostname for x in reservation.nodes], keypair, user, use_sudo)
+
+
+def _install_ssh_multiplexing(connection, module, reservation, use_sudo=True):
+    remote_module = connection.import_module(module)
+    return trace_remote_call(remote_module, 'install_ssh_multiplexing', [x.hostname for x in reservation.nodes], use_sudo)
 
 
 def _generate_module_ssh(silent=False):
@@ -48,11 +61,12 @@ def _generate_module_ssh(silent=False):
     files = [
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'printer.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'printer.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'executor.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'tracer.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'ssh_install.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'remoto_base.py'),
     ]
-    ModuleGenerator().with_module(fs).with_files(*files).generate(generation_loc, silent)
-    return importer.import_full_path(generation_loc)
+    return ModuleGenerator().with_module(fs).with_files(*files).load(generation_loc, silent=silent, entrypoints=['already_installed', 'install_ssh_keys', 'install_ssh_multiplexing', 'call_traced'], minify=True, compress=True)
 
 
 def _generate_module_rados(silent=False):
@@ -62,12 +76,16 @@ def _generate_module_rados(silent=False):
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'printer.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'printer.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'executor.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'tracer.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'download.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'env.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'apt.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'artifacts.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'distribute.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'rados_install.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'remoto_base.py'),
     ]
-    ModuleGenerator().with_modules(fs, importer).with_files(*files).generate(generation_loc, silent)
-    return importer.import_full_path(generation_loc)
+    return ModuleGenerator().with_modules(fs, importer).with_files(*files).load(generation_loc, silent=silent, entrypoints=['install_apt_cache', 'install_ceph_deploy', 'install_ceph', 'install_rados', 'call_traced'], minify=True, compress=True)
 
 
 def _make_keypair():
@@ -107,7 +125,7 @@ def _check_users(reservation):
 
 
 def install_ssh(reservation, connectionwrappers=None, key_path=None, cluster_keypair=None, silent=False, use_sudo=defaults.use_sudo()):
-    '''Installs ssh keys in the cluster for internal traffic.
+    '''Installs ssh keys in the cluster for internal traffic, and enables ssh connection multiplexing between cluster nodes.
     Warning: Requires that usernames on remote cluster nodes are equivalent.
     Args:
         reservation (`metareserve.Reservation`): Reservation object with all nodes to install RADOS-Ceph on.
@@ -130,13 +148,15 @@ def install_ssh(reservation, connectionwrappers=None, key_path=None, cluster_key
         ssh_kwargs = {'IdentitiesOnly': 'yes', 'User': user, 'StrictHostKeyChecking': 'no'}
         if key_path:
             ssh_kwargs['IdentityFile'] = key_path
-        connectionwrappers = get_wrappers(reservation.nodes, lambda node: node.ip_public, ssh_params=ssh_kwargs, silent=silent)
+        with trace_span('connect'):
+            connectionwrappers = get_wrappers(reservation.nodes, lambda node: node.ip_public, ssh_params=ssh_kwargs, silent=silent)
     else:
         if not all(x.open for x in connectionwrappers):
             raise ValueError('SSH installation failed: At least one connection is already closed.')
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=len(reservation)) as executor:
-        ssh_module = _generate_module_ssh()
+        with trace_span('generate module'):
+            ssh_module = _generate_module_ssh()
 
         futures_ssh_installed = {node: executor.submit(_installed_ssh, wrapper.connection, ssh_module, keypair=cluster_keypair) for node, wrapper in connectionwrappers.items()}
         do_install = False
@@ -154,17 +174,21 @@ def install_ssh(reservation, connectionwrappers=None, key_path=None, cluster_key
                 if not ssh_future.result():
                     printe('Could not setup internal ssh key for node: {}'.format(node))
                     state_ok = False
-            if local_connections:
-                close_wrappers(connectionwrappers)
-            return state_ok
         else:
             prints('SSH keys already installed.')
-            if local_connections:
-                close_wrappers(connectionwrappers)
-            return True
+            state_ok = True
+
+        futures_ssh_multiplexing = {node: executor.submit(_install_ssh_multiplexing, wrapper.connection, ssh_module, reservation, use_sudo=use_sudo) for node, wrapper in connectionwrappers.items()}
+        for node, ssh_future in futures_ssh_multiplexing.items():
+            if not ssh_future.result():
+                printe('Could not setup ssh multiplexing for node: {}'.format(node))
+                state_ok = False
+        if local_connections:
+            close_wrappers(connectionwrappers)
+        return state_ok
 
 
-def install(reservation, install_dir=defaults.install_dir(), key_path=None, admin_id=None, connectionwrapper=None, arrow_url=defaults.arrow_url(), use_sudo=defaults.use_sudo(), force_reinstall=False, debug=False, silent=False, cores=defaults.cores()):
+def install(reservation, install_dir=defaults.install_dir(), key_path=None, admin_id=None, connectionwrapper=None, arrow_url=defaults.arrow_url(), use_sudo=defaults.use_sudo(), force_reinstall=False, debug=False, silent=False, cores=defaults.cores(), apt_proxy=None, apt_cache=False, artifact_dir=None, incremental=False, arrow_sha256=None, max_in_flight=defaults.max_in_flight()):
     '''Installs RADOS-ceph on remote cluster.
     Warning: Requires that usernames on remote cluster nodes are equivalent.
     Warning: Requires passwordless communication between nodes on the local network. Use "install_ssh()" to accomplish this.
@@ -175,11 +199,17 @@ def install(reservation, install_dir=defaults.install_dir(), key_path=None, admi
         admin_id (optional int): Node id that must become the admin. If `None`, the node with lowest public ip value (string comparison) will be picked.
         connectionwrapper (optional RemotoSSHWrapper): If set, uses given connection, instead of building a new one.
         arrow_url (optional str): Download URL for Arrow library to use with RADOS-Ceph.
+        arrow_sha256 (optional str): If set, verifies that the sha256 hexdigest of the archive at `arrow_url` matches given value.
         use_sudo (optional bool): If set, uses sudo during installation. Tries to avoid it otherwise.
-        force_reinstall (optional bool): If set, we always will re-download and install Arrow. Otherwise, we will skip installing if we already have installed Arrow.
+        force_reinstall (optional bool): If set, we always will re-download, compile and install Arrow. Otherwise, we will skip installing if we already have installed Arrow, or restore it from the artifact cache if we built the same source before.
         debug (optional bool): If set, we compile Arrow using debug flags.
         silent (optional bool): If set, does not print so much info.
-        cores (optional int): Number of cores to compile RADOS-arrow with.
+        cores (optional int): Number of cores to compile RADOS-arrow with. If `None`, picks the number of cores of the admin node, limited to 1 core per 2GB of available memory.
+        apt_proxy (optional str): If set, nodes fetch packages through given apt proxy, e.g. 'http://proxyhost:3142'.
+        apt_cache (optional bool): If set, starts an apt cache (apt-cacher-ng) on the admin node, through which all nodes fetch packages. Overrides `apt_proxy`.
+        artifact_dir (optional str): Directory on the admin node to cache Arrow builds in. Defaults to `~/.rados_deploy/artifacts`.
+        incremental (optional bool): If set, compiles Arrow using Ninja and ccache, and keeps its build directory on the admin node between installs. Only changed sources are recompiled.
+        max_in_flight (optional int): Maximum number of commands running at the same time when fanning out to cluster nodes (e.g. ssh connections from the admin node).
 
     Returns:
         `True, admin_node_id` on success, `False, None` otherwise.'''
@@ -196,13 +226,15 @@ def install(reservation, install_dir=defaults.install_dir(), key_path=None, admi
         ssh_kwargs = {'IdentitiesOnly': 'yes', 'User': admin_picked.extra_info['user'], 'StrictHostKeyChecking': 'no'}
         if key_path:
             ssh_kwargs['IdentityFile'] = key_path
-        connectionwrapper = get_wrapper(admin_picked, admin_picked.ip_public, ssh_params=ssh_kwargs, silent=silent)
+        with trace_span('connect'):
+            connectionwrapper = get_wrapper(admin_picked, admin_picked.ip_public, ssh_params=ssh_kwargs, silent=silent)
     else:
         if not connectionwrapper.open:
             raise ValueError('Cannot use already closed connection.')
 
-    rados_module = _generate_module_rados()
-    retval = _install_rados(connectionwrapper.connection, rados_module, reservation, install_dir, arrow_url=arrow_url, force_reinstall=force_reinstall, debug=debug, silent=silent, cores=cores), admin_picked.node_id
+    with trace_span('generate module'):
+        rados_module = _generate_module_rados()
+    retval = _install_rados(connectionwrapper.connection, rados_module, reservation, install_dir, arrow_url=arrow_url, force_reinstall=force_reinstall, debug=debug, silent=silent, cores=cores, apt_proxy=apt_proxy, apt_cache_node=admin_picked if apt_cache else None, artifact_dir=artifact_dir, incremental=incremental, arrow_sha256=arrow_sha256, max_in_flight=max_in_flight), admin_picked.node_id
 
     if local_connections:
         close_wrappers([connectionwrapper])
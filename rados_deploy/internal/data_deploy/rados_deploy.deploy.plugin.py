@@ -1,20 +1,23 @@
 import argparse
 import concurrent.futures
+import heapq
 import itertools
 from multiprocessing import cpu_count
 import os
 import subprocess
-
-import data_deploy.shared.copy
-import data_deploy.shared.link
+import tempfile
+import time
 
 import remoto
 
 import rados_deploy.internal.defaults.data as defaults
+from rados_deploy.internal.remoto.modulegenerator import ModuleGenerator
+from rados_deploy.internal.remoto.modules.apt import apt_install_command
 import rados_deploy.internal.remoto.ssh_wrapper as ssh_wrapper
 import rados_deploy.internal.util.fs as fs
 import rados_deploy.internal.util.location as loc
 from rados_deploy.internal.util.printer import *
+from rados_deploy.internal.util.tracer import trace_remote_call, trace_span
 
 
 '''Deploys data on a running Ceph cluster.'''
@@ -45,84 +48,216 @@ def _pick_admin(reservation, admin=None):
 
 def _ensure_attr(connection):
     '''Installs the 'attr' package, if not available.'''
-    _, _, exitcode = remoto.process.check(connection, 'which setfattr', shell=True)
+    out, err, exitcode = remoto.process.check(connection, apt_install_command(['attr']), shell=True)
     if exitcode != 0:
-        out, err, exitcode = remoto.process.check(connection, 'sudo apt install attr -y', shell=True)
-        if exitcode != 0:
-            printe('Could not install "attr" package (needed for "setfattr" command). Exitcode={}.\nOut={}\nErr={}'.format(exitcode, out, err))
-            return False
+        printe('Could not install "attr" package (needed for "setfattr" command). Exitcode={}.\nOut={}\nErr={}'.format(exitcode, out, err))
+        return False
     return True
 
 
-def _pre_deploy_remote_file(connection, stripe, copies_amount, links_amount, source_file, dest_file):
-    remoto.process.check(connection, 'mkdir -p {}'.format(fs.dirname(dest_file)), shell=True)
-    _, _, exitcode = remoto.process.check(connection, 'touch {}'.format(dest_file), shell=True)
-    if exitcode != 0:
-        printe('Could not touch file at cluster: {}'.format(dest_file))
-        return False
+def _generate_module_deploy(silent=False):
+    '''Generates data deployment module from available sources.'''
+    generation_loc = fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'remoto', 'modules', 'generated', 'deploy_batch.py')
+    files = [
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'util', 'printer.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'remoto', 'modules', 'printer.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'util', 'executor.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'util', 'tracer.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'remoto', 'modules', 'deploy_batch.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'remoto', 'modules', 'rados_ingest.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'remoto', 'modules', 'remoto_base.py'),
+    ]
+    return ModuleGenerator().with_module(fs).with_files(*files).load(generation_loc, allowed_imports=['rados'], silent=silent, entrypoints=['pre_deploy', 'post_deploy', 'ingest_check', 'ingest', 'call_traced'], minify=True, compress=True)
 
-    if copies_amount > 0 and not data_deploy.shared.copy.copy_single(connection, dest_file, copies_amount, silent=False):
-        return False
 
-    if links_amount > 0 and not data_deploy.shared.link.link(connection, expression=data_deploy.shared.copy.copy_expression(dest_file, copies_amount), num_links=links_amount, silent=False):
-        return False
+def _report_failures(status, message):
+    '''Prints failures from a per-file status report, as returned by the remote deploy module.
+    Returns:
+        `True` if no file failed, `False` otherwise.'''
+    failed = {path: reason for path, reason in status.items() if reason != None}
+    if any(failed):
+        printe('{} for {}/{} file(s):\n{}'.format(message, len(failed), len(status), '\n'.join('\t{}: {}'.format(path, reason) for path, reason in sorted(failed.items()))))
+    return not any(failed)
 
-    cmd = '''sudo python3 -c "
-import itertools
-import subprocess
-import concurrent.futures
-from multiprocessing import cpu_count
-with concurrent.futures.ThreadPoolExecutor(max_workers=cpu_count()-1) as executor:
-    futures_setfattr = [executor.submit(subprocess.call, 'setfattr --no-dereference -n ceph.file.layout.object_size -v {2} {{}}'.format(x), shell=True) for x in itertools.chain(['{0}'], ('{0}.copy.{{}}'.format(x) for x in range({1})))]
-    results = [x.result() == 0 for x in futures_setfattr]
-exit(0 if all(results) else 1)
-"
-'''.format(dest_file, copies_amount, stripe*1024*1024)
-    out, error, exitcode = remoto.process.check(connection, cmd, shell=True)
+
+def _shard_files(files, streams):
+    '''Divides files over a number of shards with (roughly) equal total size, using longest-processing-time-first scheduling:
+    Every file, from large to small, is added to the shard with the smallest total size so far.
+    Args:
+        files (list(tuple(str, str, int))): Files to divide, as (root, relative path, size in bytes) tuples.
+        streams (int): Maximum number of shards to make.
+
+    Returns:
+        `list(list(tuple(str, str, int)))` of shards. No shard is empty.'''
+    heap = [(0, idx) for idx in range(min(streams, len(files)))]
+    shards = [[] for _ in heap]
+    for x in sorted(files, key=lambda x: x[2], reverse=True):
+        size, idx = heapq.heappop(heap)
+        shards[idx].append(x)
+        heapq.heappush(heap, (size+x[2], idx))
+    return shards
+
+
+def _transfer_shard(connectionwrapper, node, dest, shard):
+    '''Transfers a shard of files to a node, using 1 rsync command per source root. All rsync commands use the multiplexed ssh connection to the node.
+    Returns:
+        `True` on success, `False` on failure.'''
+    for root, files in itertools.groupby(sorted(shard), key=lambda x: x[0]):
+        with tempfile.NamedTemporaryFile('w') as manifest:
+            manifest.write('\0'.join(x[1] for x in files))
+            manifest.flush()
+            cmd = 'rsync -e "ssh -F {}" -q -aHAXL --inplace --from0 --files-from={} {}/ {}:{}/'.format(connectionwrapper.ssh_config.name, manifest.name, root, node.ip_public, dest)
+            if subprocess.call(cmd, shell=True) != 0:
+                printe('Could not transfer files from {}'.format(root))
+                return False
+    return True
+
+
+def _transfer(connectionwrapper, node, dest, files, streams, silent):
+    '''Transfers files to a node, using a bounded number of parallel rsync streams, balanced by size.
+    Args:
+        files (list(tuple(str, str, int))): Files to transfer, as (root, relative path, size in bytes) tuples. Every file is stored at `dest/relative path`.
+        streams (int): Maximum number of parallel rsync streams.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    def _timed_transfer(idx, shard):
+        start = time.time()
+        with trace_span('transfer stream {}'.format(idx), host=node.ip_public, files=len(shard), bytes=sum(x[2] for x in shard)):
+            ok = _transfer_shard(connectionwrapper, node, dest, shard)
+        if ok and not silent:
+            size = sum(x[2] for x in shard)
+            duration = max(time.time()-start, 0.001)
+            print('Stream {} ({}): {} file(s), {:.1f}MB in {:.1f}s ({:.1f}MB/s)'.format(idx, node.ip_public, len(shard), size/1024/1024, duration, size/1024/1024/duration))
+        return ok
+    shards = _shard_files(files, streams)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(shards))) as executor:
+        futures = [executor.submit(_timed_transfer, idx, shard) for idx, shard in enumerate(shards)]
+        return all([x.result() for x in futures])
+
+
+def _ensure_rados(connection):
+    '''Installs the 'python3-rados' package, if not available.'''
+    out, err, exitcode = remoto.process.check(connection, apt_install_command(['python3-rados']), shell=True)
     if exitcode != 0:
-        printe('Could not stripe file{} at cluster: {}. Is the cluster running?\nReason: Out: {}\n\nError: {}'.format(' (and all {} copies)'.format(copies_amount) if copies_amount > 0 else '', dest_file, '\n'.join(out), '\n'.join(error)))
+        printe('Could not install "python3-rados" package (needed for rados backend). Exitcode={}.\nOut={}\nErr={}'.format(exitcode, out, err))
         return False
     return True
 
 
-def _post_deploy_remote_file(connection, stripe, copies_amount, links_amount, source_file, dest_file):
-    if copies_amount > 0:
-        cmd = '''python3 -c "
-import subprocess
-import concurrent.futures
-from multiprocessing import cpu_count
-with concurrent.futures.ThreadPoolExecutor(max_workers=cpu_count()-1) as executor:
-    futures_rsync = [executor.submit(subprocess.call, 'rsync -q -aHAX --inplace {0} {{}}'.format(x), shell=True) for x in ('{0}.copy.{{}}'.format(x) for x in range({1}))]
-    results = [x.result() == 0 for x in futures_rsync]
-exit(0 if all(results) else 1)
-"
-'''.format(dest_file, copies_amount)
-        _, _, exitcode = remoto.process.check(connection, cmd, shell=True)
+def _batch_files(files, max_bytes):
+    '''Divides files over consecutive batches of at most `max_bytes` bytes. Files larger than `max_bytes` get a batch of their own.
+    Args:
+        files (list(tuple(str, str, int))): Files to divide, as (root, relative path, size in bytes) tuples.
+        max_bytes (int): Maximum total size of a batch, in bytes.
+
+    Returns:
+        `list(list(tuple(str, str, int)))` of batches. No batch is empty.'''
+    batches = []
+    size = 0
+    for x in files:
+        if not batches or size+x[2] > max_bytes:
+            batches.append([])
+            size = 0
+        batches[-1].append(x)
+        size += x[2]
+    return batches
+
+
+def _ingest(connectionwrapper, remote_module, node, dest, files, streams, inflight, staging_size, silent):
+    '''Deploys files using the rados backend: Transfers files to a staging directory on local disk of a node, and writes them from there into the CephFS data pool using librados.
+    Files are staged in batches of at most `staging_size` bytes. While a batch is ingested, the next batch is transferred, and ingested files are removed from the staging directory.
+    This way, a node needs at most 2 batches of local disk space.
+    Args:
+        remote_module: Deploy module, imported on the connection of the node.
+        files (list(tuple(str, str, int))): Files to deploy, as (root, relative path, size in bytes) tuples. Every file is stored at `dest/relative path`.
+        inflight (int): Maximum number of object writes in flight at once.
+        staging_size (int): Maximum size of a batch, in bytes.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    reason = trace_remote_call(remote_module, 'ingest_check', fs.join(dest, files[0][1]))
+    if reason != None:
+        printe('Cannot use rados backend on node {}: {}'.format(node.ip_public, reason))
+        return False
+    staging = '~/.rados_deploy/ingest'
+    batches = _batch_files(files, staging_size)
+    def _stage(idx):
+        _, _, exitcode = remoto.process.check(connectionwrapper.connection, 'mkdir -p {}/{}'.format(staging, idx), shell=True)
         if exitcode != 0:
-            printe('Could not inflate dataset using {} copies of file at cluster: {}. Is there enough space?'.format(copies_amount, dest_file))
+            printe('Could not create staging directory on node {}'.format(node.ip_public))
             return False
-    return True
+        return _transfer(connectionwrapper, node, '{}/{}'.format(staging, idx), batches[idx], streams, silent)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            future_stage = executor.submit(_stage, 0)
+            for idx, batch in enumerate(batches):
+                if not future_stage.result():
+                    return False
+                if idx+1 < len(batches):
+                    future_stage = executor.submit(_stage, idx+1)
+                start = time.time()
+                with trace_span('ingest', host=node.ip_public, batch=idx, files=len(batch), bytes=sum(x[2] for x in batch)):
+                    status = trace_remote_call(remote_module, 'ingest', [('{}/{}/{}'.format(staging, idx, x[1]), fs.join(dest, x[1])) for x in batch], inflight)
+                if not _report_failures(status, 'Could not ingest files from node {}'.format(node.ip_public)):
+                    return False
+                if not silent:
+                    size = sum(x[2] for x in batch)
+                    duration = max(time.time()-start, 0.001)
+                    print('Ingest ({}, batch {}/{}): {} file(s), {:.1f}MB in {:.1f}s ({:.1f}MB/s)'.format(node.ip_public, idx+1, len(batches), len(batch), size/1024/1024, duration, size/1024/1024/duration))
+            return True
+    finally:
+        remoto.process.check(connectionwrapper.connection, 'rm -rf {}'.format(staging), shell=True)
+
 
+def _filter_ingress(ingress, dest):
+    '''Finds out which ingress nodes have CephFS mounted at given destination.
+    Args:
+        ingress (dict(metareserve.Node, RemotoSSHWrapper)): Candidate ingress nodes. Nodes with closed connections are skipped.
+        dest (str): Destination directory on CephFS. Must exist.
 
-def _execute_internal(connectionwrapper, reservation, paths, dest, silent, copy_multiplier, link_multiplier, admin_node, stripe):
+    Returns:
+        `dict(metareserve.Node, RemotoSSHWrapper)` with all ingress nodes having CephFS mounted at `dest`.'''
+    def _mounted(connection):
+        _, _, exitcode = remoto.process.check(connection, 'findmnt -n -T {} -t fuse.ceph-fuse'.format(dest), shell=True)
+        return exitcode == 0
+    ingress = {node: wrapper for node, wrapper in ingress.items() if wrapper.open}
+    if not any(ingress):
+        return dict()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(ingress)) as executor:
+        futures_mounted = {node: executor.submit(_mounted, wrapper.connection) for node, wrapper in ingress.items()}
+        mounted = {node: ingress[node] for node, future in futures_mounted.items() if future.result()}
+    for node in ingress:
+        if not node in mounted:
+            printw('Node {} has no CephFS mounted at {}. Not using it for ingress.'.format(node.ip_public, dest))
+    return mounted
+
+
+def _execute_internal(connectionwrapper, reservation, paths, dest, silent, copy_multiplier, link_multiplier, admin_node, stripe, streams, ingress, backend, inflight, copy_concurrency, staging_size):
     if not connectionwrapper:
         printe('Could not connect to admin: {}'.format(admin_node))
         return False
 
-    if not _ensure_attr(connectionwrapper.connection):
-        return False
+    with trace_span('ensure attr'):
+        if not _ensure_attr(connectionwrapper.connection):
+            return False
 
     max_filesize = stripe * 1024 * 1024
     copies_to_add = max(1, copy_multiplier) - 1
     links_to_add = max(1, link_multiplier) - 1
+    if copies_to_add > 0:
+        with trace_span('ensure rados'):
+            if not _ensure_rados(connectionwrapper.connection):
+                printw('Copies will be made through the CephFS mount instead.')
     with concurrent.futures.ThreadPoolExecutor(max_workers=cpu_count()-1) as executor:
-        files_to_deploy = []
+        files_to_deploy = [] # (root, relative path, size) tuples. Every file is deployed at `dest/relative path`.
         for path in paths:
+            path = os.path.normpath(path)
             if fs.isfile(path):
                 if os.path.getsize(path) > max_filesize:
                     printe('File {} is too large ({} bytes, max allowed is {} bytes)'.format(path, os.path.getsize(path), max_filesize))
                     return False
-                files_to_deploy.append((path, fs.join(dest, fs.basename(path))))
+                files_to_deploy.append((fs.dirname(fs.abspath(path)), fs.basename(path), os.path.getsize(path)))
             elif fs.isdir(path):
                 to_visit = [path]
                 path_len = len(path)
@@ -135,29 +270,36 @@ def _execute_internal(connectionwrapper, reservation, paths, dest, silent, copy_
                         for x in files_too_big:
                             printe('File {} is too large ({} bytes, max allowed is {} bytes)'.format(x, os.path.getsize(x), max_filesize))
                         return False
-                    files_to_deploy += [(x, fs.join(dest, x[path_len+1:])) for x in files]
-        futures_pre_deploy = [executor.submit(_pre_deploy_remote_file, connectionwrapper.connection, stripe, copies_to_add, links_to_add, source_file, dest_file) for (source_file, dest_file) in files_to_deploy]
-        if not all(x.result() for x in futures_pre_deploy):
-            printe('Pre-data deployment error occured.')
-            return False
-
+                    files_to_deploy += [(path, x[path_len+1:], os.path.getsize(x)) for x in files]
+        with trace_span('generate module'):
+            module = _generate_module_deploy(silent=silent)
+            remote_module = connectionwrapper.connection.import_module(module)
+        dest_files = [fs.join(dest, x[1]) for x in files_to_deploy]
+        with trace_span('pre-deploy', files=len(files_to_deploy)):
+            status = trace_remote_call(remote_module, 'pre_deploy', dest_files, copies_to_add, max_filesize, links_to_add)
+            if not _report_failures(status, 'Could not prepare files at cluster'):
+                printe('Pre-data deployment error occured.')
+                return False
+
+        transfer_nodes = _merge_kwargs({admin_node: connectionwrapper}, _filter_ingress(ingress, dest))
         if not silent:
-            print('Transferring data...')
-        fun = lambda path: subprocess.call('rsync -e "ssh -F {}" -q -aHAXL --inplace {} {}:{}'.format(connectionwrapper.ssh_config.name, path, admin_node.ip_public, fs.join(dest, fs.basename(path))), shell=True) == 0
-        futures_rsync = {path: executor.submit(fun, path) for path in paths}
-
-        state_ok = True
-        for path,future in futures_rsync.items():
-            if not silent:
-                print('Waiting on file: {}'.format(path))
-            if not future.result():
-                state_ok = False
-                printe('Could not transfer file: {}'.format(path))
-        if not state_ok:
-            return False
-
-        futures_post_deploy = [executor.submit(_post_deploy_remote_file, connectionwrapper.connection, stripe, copies_to_add, links_to_add, source_file, dest_file) for (source_file, dest_file) in files_to_deploy]
-        if all(x.result() for x in futures_pre_deploy):
+            print('Transferring data{}...'.format(' through {} nodes'.format(len(transfer_nodes)) if len(transfer_nodes) > 1 else ''))
+        with trace_span('transfer', files=len(files_to_deploy), nodes=len(transfer_nodes)):
+            node_shards = _shard_files(files_to_deploy, len(transfer_nodes)) # Every node writes a part of the data to CephFS, balanced by size.
+            if backend == 'rados':
+                futures_rados = [executor.submit(_ensure_rados, wrapper.connection) for wrapper in transfer_nodes.values()]
+                if not all([x.result() for x in futures_rados]):
+                    return False
+                remote_modules = {node: remote_module if node == admin_node else wrapper.connection.import_module(module) for node, wrapper in transfer_nodes.items()}
+                futures_transfer = [executor.submit(_ingest, transfer_nodes[node], remote_modules[node], node, dest, shard, streams, inflight, staging_size, silent) for node, shard in zip(transfer_nodes, node_shards)]
+            else:
+                futures_transfer = [executor.submit(_transfer, transfer_nodes[node], node, dest, shard, streams, silent) for node, shard in zip(transfer_nodes, node_shards)]
+            if not all([x.result() for x in futures_transfer]):
+                return False
+
+        with trace_span('post-deploy', files=len(files_to_deploy)):
+            post_deploy_ok = copies_to_add == 0 or _report_failures(trace_remote_call(remote_module, 'post_deploy', dest_files, copies_to_add, copy_concurrency), 'Could not copy files at cluster')
+        if post_deploy_ok:
             prints('Data deployment success')
             return True
         else:
@@ -176,8 +318,14 @@ def parse(args):
     parser = argparse.ArgumentParser(prog='...')
     parser.add_argument('--admin', metavar='id', dest='admin_id', type=int, default=None, help='ID of the node that will be the primary or admin node.')
     parser.add_argument('--stripe', metavar='amount', type=int, default=defaults.stripe(), help='Striping, in megabytes (default={}MB). Must be a multiple of 4. Make sure that every file is smaller than set stripe size.'.format(defaults.stripe()))
+    parser.add_argument('--multi-ingress', dest='multi_ingress', help='If set, transfers data to all nodes with CephFS mounted, instead of only to the admin node. Ingress bandwidth then grows with cluster size.', action='store_true')
+    parser.add_argument('--backend', metavar='name', choices=['cephfs', 'rados'], default='cephfs', help='Backend to write data with (default=cephfs). "cephfs" writes data through the CephFS mount. "rados" transfers data to local disk of the ingress nodes first (in batches, see "--staging-size"), and writes it directly into the CephFS data pool with librados, bypassing FUSE.')
+    parser.add_argument('--staging-size', metavar='amount', dest='staging_size', type=int, default=defaults.staging_size(), help='Size of the batches staged on local disk of the ingress nodes when using the rados backend, in megabytes (default={}MB). Ingress nodes need local disk space for 2 batches.'.format(defaults.staging_size()))
+    parser.add_argument('--inflight', metavar='amount', type=int, default=defaults.inflight(), help='Maximum number of object writes in flight per ingress node, when using the rados backend (default={}).'.format(defaults.inflight()))
+    parser.add_argument('--copy-concurrency', metavar='amount', dest='copy_concurrency', type=int, default=defaults.copy_concurrency(), help='Maximum number of objects copied at once, when using a copy multiplier (default={}).'.format(defaults.copy_concurrency()))
+    parser.add_argument('--streams', metavar='amount', type=int, default=defaults.streams(), help='Maximum number of parallel rsync streams to transfer data with (default={}). Files are divided over streams by size.'.format(defaults.streams()))
     args = parser.parse_args(args)
-    return True, [], {'admin_id': args.admin_id, 'stripe': args.stripe}
+    return True, [], {'admin_id': args.admin_id, 'stripe': args.stripe, 'streams': args.streams, 'multi_ingress': args.multi_ingress, 'backend': args.backend, 'inflight': args.inflight, 'copy_concurrency': args.copy_concurrency, 'staging_size': args.staging_size}
 
 
 def execute(reservation, key_path, paths, dest, silent, copy_multiplier, link_multiplier, *args, **kwargs):
@@ -205,25 +353,41 @@ def execute(reservation, key_path, paths, dest, silent, copy_multiplier, link_mu
     connectionwrapper = kwargs.get('connectionwrapper')
     admin_id = kwargs.get('admin_id')
     stripe = kwargs.get('stripe') or defaults.stripe()
+    streams = kwargs.get('streams') or defaults.streams()
+    multi_ingress = kwargs.get('multi_ingress', False)
+    backend = kwargs.get('backend') or 'cephfs'
+    inflight = kwargs.get('inflight') or defaults.inflight()
+    copy_concurrency = kwargs.get('copy_concurrency') or defaults.copy_concurrency()
+    staging_size = (kwargs.get('staging_size') or defaults.staging_size()) * 1024 * 1024
 
     if stripe < 4:
         raise ValueError('Stripe size must be equal to or greater than 4MB (and a multiple of 4MB)!')
     if stripe % 4 != 0:
         raise ValueError('Stripe size must be a multiple of 4MB!')
 
-    admin_node, _ = _pick_admin(reservation, admin=admin_id)
+    admin_node, other_nodes = _pick_admin(reservation, admin=admin_id)
+    ssh_kwargs = {'IdentitiesOnly': 'yes', 'StrictHostKeyChecking': 'no'}
+    if key_path:
+        ssh_kwargs['IdentityFile'] = key_path
     use_local_connections = connectionwrapper == None
     if use_local_connections: # We did not get any connections, so we must make them
-        ssh_kwargs = {'IdentitiesOnly': 'yes', 'StrictHostKeyChecking': 'no'}
-        if key_path:
-            ssh_kwargs['IdentityFile'] = key_path
-
         connectionwrapper = ssh_wrapper.get_wrapper(admin_node, admin_node.ip_public, ssh_params=_merge_kwargs(ssh_kwargs, {'User': admin_node.extra_info['user']}), silent=silent)
     else: # We received connections, need to check if they are valid.
         if not connectionwrapper.open:
             raise ValueError('Provided connection is not open.')
 
-    retval = _execute_internal(connectionwrapper, reservation, paths, dest, silent, copy_multiplier, link_multiplier, admin_node, stripe)
-    if not use_local_connections:
-        ssh_wrapper.close_wrappers([connectionwrapper])
+    ingress = dict()
+    if multi_ingress and any(other_nodes):
+        with trace_span('connect'):
+            ingress = ssh_wrapper.get_wrappers(other_nodes, lambda node: node.ip_public, ssh_params=lambda node: _merge_kwargs(ssh_kwargs, {'User': node.extra_info['user']}), silent=silent)
+        for node, wrapper in ingress.items():
+            if not wrapper.open:
+                printw('Could not connect to node {}. Not using it for ingress.'.format(node.ip_public))
+                wrapper.exit()
+        ingress = {node: wrapper for node, wrapper in ingress.items() if wrapper.open}
+
+    retval = _execute_internal(connectionwrapper, reservation, paths, dest, silent, copy_multiplier, link_multiplier, admin_node, stripe, streams, ingress, backend, inflight, copy_concurrency, staging_size)
+    to_close = list(ingress.values())+([connectionwrapper] if use_local_connections else []) # Connections we received are closed by their owner.
+    if any(to_close):
+        ssh_wrapper.close_wrappers(to_close)
     return retval
\ No newline at end of file
@@ -1,2 +1,14 @@
 def stripe():
-    return 64 # 64MB
\ No newline at end of file
+    return 64 # 64MB
+
+def streams():
+    return 4 # Parallel rsync streams used to transfer data.
+
+def inflight():
+    return 16 # Object writes in flight per ingress node, when using the rados backend.
+
+def staging_size():
+    return 4096 # 4GB batches staged on local disk of ingress nodes, when using the rados backend.
+
+def copy_concurrency():
+    return 16 # Objects copied at once, when using a copy multiplier.
\ No newline at end of file
@@ -5,7 +5,10 @@ def arrow_url():
     return 'https://github.com/Sebastiaan-Alvarez-Rodriguez/arrow/archive/refs/heads/master.zip'
 
 def cores():
-    return 16
+    return None # Picks the number of cores based on the number of cores and available memory of the admin node.
+
+def max_in_flight():
+    return 32 # Commands running at the same time when fanning out to cluster nodes.
 
 def retries():
     return 5
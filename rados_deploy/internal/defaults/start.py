@@ -1,6 +1,9 @@
 def mountpoint_path():
     return '/mnt/cephfs'
 
+def max_in_flight():
+    return 32 # Commands running at the same time when fanning out to cluster nodes.
+
 def retries():
     return 10
 
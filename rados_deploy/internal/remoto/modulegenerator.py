@@ -1,48 +1,106 @@
-import distutils.sysconfig as sysconfig
+import ast
+import base64
+import builtins
+import hashlib
+import importlib.machinery
 import itertools
-import re
+import os
 import sys
+import sysconfig
 import types
+import zlib
 
+from rados_deploy.internal.remoto.env import Environment
 import rados_deploy.internal.util.fs as fs
+import rados_deploy.internal.util.importer as importer
 from rados_deploy.internal.util.printer import *
 
 
+_generator_version = '4' # Change this whenever the generated output changes for the same input, to invalidate cached modules.
+_hash_prefix = '# Generation hash: '
+_payload_name = '_generated_payload' # Name of the variable holding the compressed module, see `_compress`.
+
+_loaded_modules = dict() # Maps output path to `(hash, module)` for modules loaded by this process.
+
+
+def _stl_cache_path():
+    '''Returns the path to the on-disk cache of standard-library names for the running interpreter.'''
+    return fs.join(Environment.get_storedir(), 'stl_cache', '{}-{}.txt'.format(sys.implementation.name, '.'.join(str(x) for x in sys.version_info[:3])))
+
+
+def _walk_stl_libs():
+    '''Lists the top-level modules and packages in the standard library directories of the running interpreter. Adds built-in library names.
+    Returns:
+        `set(str)` containing all found top-level standard-library names.'''
+    found = set(sys.builtin_module_names)
+    paths = sysconfig.get_paths()
+    std_libs = {paths['stdlib'], paths['platstdlib']}
+    std_libs.update(set(fs.join(x, 'lib-dynload') for x in std_libs))
+    extension_suffixes = sorted(importlib.machinery.EXTENSION_SUFFIXES, key=len, reverse=True)
+    for std_lib in std_libs:
+        if not fs.isdir(std_lib):
+            continue
+        for x in fs.ls(std_lib):
+            if x in ('site-packages', 'dist-packages'):
+                continue
+            if x.endswith('.py'):
+                found.add(x[:-3])
+            elif fs.isfile(std_lib, x, '__init__.py'):
+                found.add(x)
+            else:
+                suffix = next((y for y in extension_suffixes if x.endswith(y)), None)
+                if suffix:
+                    found.add(x[:-len(suffix)])
+    return found
+
+
 def _generate_stl_libs():
-    '''Generator for stl-names. Does a breadth-first search on the python installation directory. Adds built-in library names.
+    '''Returns the names of all top-level standard-library modules.
+    Uses `sys.stdlib_module_names` where available (Python 3.10+).
+    Otherwise, walks the standard library directories once per interpreter version, and caches the result on disk.
     Returns:
-        `set(str)` containing all known standard-library files.'''
-    ret_list = set()
-    std_lib = sysconfig.get_python_lib(standard_lib=True)
-    std_lib_len = len(std_lib)
+        `set(str)` containing all known top-level standard-library names.'''
+    if hasattr(sys, 'stdlib_module_names'):
+        return set(sys.stdlib_module_names) | set(sys.builtin_module_names)
 
-    found = set()
-    sep = fs.sep()
+    cache_path = _stl_cache_path()
+    if fs.isfile(cache_path):
+        with open(cache_path, 'r') as f:
+            found = set(x.strip() for x in f if x.strip())
+        if any(found):
+            return found
 
-    to_visit = list()
-    to_visit.append(std_lib)
-    while any(to_visit):
-        visit_now = to_visit.pop()
-        to_visit += list(fs.ls(visit_now, only_dirs=True, full_paths=True))
-
-        files = list(fs.ls(visit_now, only_files=True, full_paths=True))
-        found.update(set('.'.join(y[std_lib_len+1:].split(sep))[:-3] for y in files if y[-3:] == '.py' and y[-11:-3] != '__init__'))
-        if any(True for x in files if x[-11:] == '__init__.py') and visit_now != std_lib: #If we found '/path/to/python_lib/oof/a/__init__.py', then assume library 'oof.a' exists.
-            found.add('.'.join(visit_now[std_lib_len+1:].split(sep)))
-    found.update(set(sys.builtin_module_names))
+    found = _walk_stl_libs()
+    try:
+        fs.mkdir(fs.dirname(cache_path), exist_ok=True)
+        tmppath = '{}.{}.tmp'.format(cache_path, os.getpid())
+        with open(tmppath, 'w') as f:
+            f.write('\n'.join(sorted(found)))
+        fs.mv(tmppath, cache_path)
+    except OSError as e:
+        printw('Could not cache standard-library names at "{}": {}'.format(cache_path, e))
     return found
 
 
+_stl_libs = None # Set of top-level standard-library names, computed on first use.
+
+def _stl_names():
+    global _stl_libs
+    if _stl_libs == None:
+        _stl_libs = _generate_stl_libs()
+    return _stl_libs
+
+
 class ModuleGenerator(object):
     '''Object to quickly construct self-contained modules, for use with remoto.
     Warning: We have several constraints for the input modules/files:
         1. When including a module X which internally imports module Y, Y is provided to the generator too. Failing to do so will produce a faulty module.
-        2. When including a module X and a module Y, there are no name conflicts between X and Y.
+        2. When including a module X and a module Y, there are no name conflicts between X and Y. Conflicts are reported, and the definition from the file included last is used.
         3. For all modules X, X does not have statements that import user-provided modules/files using import statements "import A as B", or "from A import a as b".
         4. All uses of user-provided modules/files must be as if the user-provided modules.'''
     def __init__(self):
         self._files = []
-        self._stl_modules_cache = []
+        self._parsed = dict()
 
     def with_module(self, module):
         if not isinstance(module, types.ModuleType):
@@ -69,95 +127,372 @@ class ModuleGenerator(object):
         return self
 
     def _is_regular_python(self, name):
-        if not self._stl_modules_cache:
-            self._stl_modules_cache = list(_generate_stl_libs())
-        return name in self._stl_modules_cache
+        '''Returns `True` if given (possibly dotted) module name belongs to the standard library, `False` otherwise.'''
+        return name.split('.', 1)[0] in _stl_names()
+
+
+    def _parse(self, filepath):
+        '''Parses given file once, caching the result.
+        Returns:
+            `(list(str), ast.Module)`: Source lines (including line endings) and syntax tree of the file.'''
+        if not filepath in self._parsed:
+            with open(filepath, 'r') as f:
+                source = f.read()
+            self._parsed[filepath] = (source.splitlines(keepends=True), ast.parse(source, filename=filepath))
+        return self._parsed[filepath]
+
+
+    def _is_kept_import(self, node, allowed_set):
+        '''Returns `True` if given import node only imports stl modules or explicitly allowed modules, `False` otherwise.'''
+        if isinstance(node, ast.ImportFrom):
+            if node.level > 0 or node.module == None: # Relative imports always refer to user-provided modules.
+                return False
+            names = [node.module]
+        else:
+            names = [x.name for x in node.names]
+        return all(self._is_regular_python(x) or (allowed_set and x in allowed_set) for x in names)
+
+
+    def _is_merged_import(self, node):
+        '''Returns `True` if given import statement imports (from) one of the files we merge. Such imports need no warning, as their contents are merged.'''
+        names = [node.module] if isinstance(node, ast.ImportFrom) and node.module else [y.name for y in node.names]
+        return all(any(fs.abspath(x).endswith(os.sep+y.replace('.', os.sep)+'.py') for x in self._files) for y in names)
 
 
     def _read_imports(self, allowed_imports=None, silent=False):
-        '''Reads imports from all files. Non-stl python libraries are skipped, except those specifically allowed in `allowed_imports`.
+        '''Reads module-level imports from all files. Non-stl python libraries are skipped, except those specifically allowed in `allowed_imports`.
         Args:
             allowed_imports (optional iterable(str)): If set to an iterable, does not remove given import statements.
             silent (optional bool): If set, prints warnings about found non-stl python libraries.
 
         Returns:
-            `(set, set)`: The first set contains all found stl import names using format 'import x', with elements `x`.
-                          The second set contains all found stl import names using format 'from x import y (as z)', with elements `(x, y)` and `(x, y, z)`.'''
-        regex_import = re.compile(r'^ *import +([a-zA-Z\._0-9]+)', re.MULTILINE)
-        regex_from_import = re.compile(r'^ *from +([a-zA-Z\._0-9]+) import +((?:[a-zA-Z\._0-9]+, *)*[a-zA-Z\._0-9]+) *(?:as)? *([a-zA-Z\._0-9]+)?', re.MULTILINE)
+            `(set, set)`: The first set contains all found stl import names using format 'import x (as z)', with elements `(x, z)`.
+                          The second set contains all found stl import names using format 'from x import y (as z)', with elements `(x, y, z)`.
+                          `z` is `None` when there is no 'as' clause.'''
         found_stl_imports = set()
         found_stl_import_froms = set()
 
         allowed_set = set(allowed_imports) if allowed_imports else None
 
         for x in self._files:
-            with open(x, 'r') as f:
-                lines = f.read()
-
-                for match in itertools.chain(regex_import.finditer(lines), regex_from_import.finditer(lines)):
-                    matchtuple = match.groups()
-                    match_importmodule = matchtuple[0]
-
-                    if (not self._is_regular_python(match_importmodule)) and not (allowed_set and match_importmodule in allowed_set):
-                        if not silent:
-                            printw('(file: {}) Found non-regular import "{}".'.format(x, match_importmodule))
+            _, tree = self._parse(x)
+            toplevel = set(id(y) for y in tree.body)
+            for node in ast.walk(tree):
+                if not isinstance(node, (ast.Import, ast.ImportFrom)):
+                    continue
+                if not self._is_kept_import(node, allowed_set):
+                    name = node.module if isinstance(node, ast.ImportFrom) and node.module else ', '.join(y.name for y in node.names)
+                    if not silent and not self._is_merged_import(node):
+                        printw('(file: {}, line {}) Found non-regular import "{}".'.format(x, node.lineno, '.'*getattr(node, 'level', 0)+name))
+                elif id(node) in toplevel: # Nested imports of stl modules remain where they are.
+                    if isinstance(node, ast.ImportFrom):
+                        found_stl_import_froms.update((node.module, y.name, y.asname) for y in node.names)
                     else:
-                        if len(matchtuple) > 1:
-                            found_stl_import_froms.add(matchtuple)
-                        else:
-                            found_stl_imports.add(matchtuple[0])
-        if not any(found_stl_import_froms):
-            raise ValueError('Empty from sequence.')
+                        found_stl_imports.update((y.name, y.asname) for y in node.names)
         return found_stl_imports, found_stl_import_froms
 
 
-    def _read_non_imports(self, filepath):
-        '''Reads given `filepath`, strips lines containing Python import statements (careful with comments, don't use multiline statements with ';'), returns as generator.'''
-        regex_no_import = re.compile(r'^((?!(?:from .+)? *import +.*).)+$', re.MULTILINE)
-        # ^((?!(?:from .+)? *import +(?:.*) *(?:as .*)?).)+$
-        # 
-        with open(filepath, 'r') as f:
-            lines = f.read()
-            return '\n'.join(x.group(0) for x in regex_no_import.finditer(lines))
+    def _read_non_imports(self, filepath, allowed_imports=None):
+        '''Returns the source of given `filepath`, with module-level import statements removed.
+        Nested imports of non-stl (and not allowed) modules are replaced by `pass`, which keeps enclosing blocks valid.
+        Everything else (including comments and strings mentioning "import") is left untouched.'''
+        lines, tree = self._parse(filepath)
+        lines = list(lines)
+        allowed_set = set(allowed_imports) if allowed_imports else None
+
+        toplevel = set(id(x) for x in tree.body)
+        removals = [x for x in ast.walk(tree) if isinstance(x, (ast.Import, ast.ImportFrom)) and (id(x) in toplevel or not self._is_kept_import(x, allowed_set))]
+        for node in sorted(removals, key=lambda x: (x.lineno, x.col_offset), reverse=True):
+            first, last = node.lineno-1, node.end_lineno-1
+            prefix = lines[first].encode('utf-8')[:node.col_offset].decode('utf-8') # Offsets are in utf-8 bytes.
+            suffix = lines[last].encode('utf-8')[node.end_col_offset:].decode('utf-8')
+            replacement = None if id(node) in toplevel else 'pass'
+            if prefix.strip() or suffix.strip(): # Statement shares a line with other statements (separated by ';')
+                lines[first:last+1] = [prefix+'pass'+suffix]
+            elif replacement == None:
+                lines[first:last+1] = []
+            else:
+                lines[first:last+1] = [prefix+replacement+suffix]
+        return ''.join(lines)
+
+
+    def _check_collisions(self, stl_imports, stl_imports_from, silent=False):
+        '''Finds module-level names defined differently by multiple files (or by a file and an import).
+        In the generated module, the last definition wins. Redefined builtins (e.g. the remote printer overriding `print`) are overrides by design, and not reported.
+        Returns:
+            `list(str)` of colliding names.'''
+        definitions = dict() # Maps name to list of (origin, definition dump)
+        for name, asname in stl_imports:
+            if asname:
+                definitions.setdefault(asname, []).append(('import {} as {}'.format(name, asname), 'import {} as {}'.format(name, asname)))
+            else: # 'import a.b' binds 'a', just like 'import a'.
+                definitions.setdefault(name.split('.', 1)[0], []).append(('import {}'.format(name), 'import {}'.format(name.split('.', 1)[0])))
+        for module, name, asname in stl_imports_from:
+            if name != '*':
+                definitions.setdefault(asname if asname else name, []).append(('from {} import {}'.format(module, name), 'from {} import {}'.format(module, name)))
+
+        for x in self._files:
+            _, tree = self._parse(x)
+            for node in tree.body:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    targets = [node.name]
+                elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                    targets = [y.id for y in (node.targets if isinstance(node, ast.Assign) else [node.target]) if isinstance(y, ast.Name)]
+                else:
+                    continue
+                for name in targets:
+                    definitions.setdefault(name, []).append((x, ast.dump(node)))
+
+        collisions = []
+        for name, found in definitions.items():
+            if hasattr(builtins, name):
+                continue
+            if len(set(dump for _, dump in found)) > 1:
+                collisions.append(name)
+                if not silent:
+                    printw('Name "{}" is defined differently by: {}. The last definition, from "{}", takes effect.'.format(name, ', '.join(origin for origin, _ in found), found[-1][0]))
+        return collisions
 
 
-    def generate(self, outputpath, allowed_imports=None, silent=False):
+    def _hash(self, allowed_imports=None, options=None):
+        '''Computes a hash over everything that determines the generated output: input paths and contents, allowed imports, generation options and the generator version.'''
+        sha = hashlib.sha256()
+        sha.update(_generator_version.encode('utf-8'))
+        sha.update(repr(sorted(allowed_imports) if allowed_imports else None).encode('utf-8'))
+        sha.update(repr(options).encode('utf-8'))
+        for x in self._files:
+            sha.update(x.encode('utf-8'))
+            with open(x, 'rb') as f:
+                sha.update(hashlib.sha256(f.read()).digest())
+        return sha.hexdigest()
+
+
+    @staticmethod
+    def _read_hash(outputpath):
+        '''Reads the generation hash stored in the header of a generated module. Returns `None` if there is no (readable) hash.'''
+        if not fs.isfile(outputpath):
+            return None
+        with open(outputpath, 'r') as f:
+            for line in itertools.islice(f, 10):
+                if line.startswith(_hash_prefix):
+                    return line[len(_hash_prefix):].strip()
+        return None
+
+
+    def generate(self, outputpath, allowed_imports=None, silent=False, entrypoints=None, minify=False, compress=False):
         '''Generates the final, non-stl dependency-free module to be used with Remoto remote module execution. 
         Captures all import commands and ensures they are present only once for the entire module.
+        If `outputpath` holds a module generated from the exact same input, generation is skipped.
         Warning: Removes all non-stl import statements.
         Args:
             outputpath (str): Location to store module, including output filename. Creates every directory  that does not exist.
             allowed_imports (optional iterable(str)): If set to an iterable, does not remove given import statements.
-            silent (optional bool): If set, skips printing warnings when non-standard imports are encountered.'''
+            silent (optional bool): If set, skips printing warnings when non-standard imports are encountered.
+            entrypoints (optional iterable(str)): If set, removes all module-level functions and classes that cannot be reached from the given function names, or from module-level statements.
+                                                  Warning: Names only referenced from strings (e.g. using `eval`) cannot be detected, and must be passed as entrypoints.
+            minify (optional bool): If set, strips comments and docstrings (except entrypoint docstrings, which remoto reads). Requires Python 3.9+, ignored otherwise.
+            compress (optional bool): If set, stores the module zlib-compressed, wrapped in a small bootstrap that decompresses and executes it.
+
+        Returns:
+            `True` if a module was (re)generated, `False` if the module at `outputpath` was up-to-date.'''
+        entrypoints = sorted(set(entrypoints)) if entrypoints else None
+        generation_hash = self._hash(allowed_imports=allowed_imports, options=(entrypoints, minify, compress))
+        if ModuleGenerator._read_hash(outputpath) == generation_hash:
+            return False
+
         dest_dir = fs.dirname(outputpath)
         if not fs.isdir(dest_dir):
             fs.mkdir(dest_dir, exist_ok=True)
 
 
         stl_imports, stl_imports_from = self._read_imports(allowed_imports=allowed_imports, silent=silent)
-        with open(outputpath, 'w') as f:
+        self._check_collisions(stl_imports, stl_imports_from, silent=silent)
+
+        body = '\n'+'\n'.join('import {} as {}'.format(*names) if names[1] != None else 'import {}'.format(names[0]) for names in sorted(stl_imports, key=str))
+        body += '\n'
+        body += '\n'.join('from {} import {} as {}'.format(*names) if names[2] != None else 'from {} import {}'.format(*names[:2]) for names in sorted(stl_imports_from, key=str))
+        for x in self._files:
+            body += '''
+################################################################################
+# Created from file {}
+'''.format(x)
+            body += self._read_non_imports(x, allowed_imports=allowed_imports)
+            body += '''
+################################################################################
+
+'''
+        if entrypoints:
+            body = _prune(body, entrypoints, silent=silent)
+        if minify:
+            body = _minify(body, entrypoints, silent=silent)
+        if compress:
+            body = _compress(body)
+
+        tmppath = '{}.{}.tmp'.format(outputpath, generation_hash[:16]) # Written next to the output and moved in place, so readers never see a partially written module.
+        with open(tmppath, 'w') as f:
             header = '''
 
 ################################################################################
+{}{}
 # Generated by the meta modulegenerator
 # Processed {} files/modules:
 {}
 ################################################################################
 
-'''.format(len(self._files), '\n'.join('#    {}'.format(x) for x in self._files))
+'''.format(_hash_prefix, generation_hash, len(self._files), '\n'.join('#    {}'.format(x) for x in self._files))
             f.write(header)
-            importstring = '\n'+'\n'.join('import {}'.format(name) for name in stl_imports)
-            importstring += '\n'
-            importstring += '\n'.join('from {} import {} as {}'.format(*names) if len(names) == 3 and names[2] != None else 'from {} import {}'.format(*names) for names in stl_imports_from)
-            f.write(importstring)
-            for x in self._files:
-                content = self._read_non_imports(x)
-                f.write('''
-################################################################################
-# Created from file {}
-'''.format(x))
-                f.write(content)
-                f.write('''
-################################################################################
+            f.write(body)
+        fs.mv(tmppath, outputpath)
+        return True
+
+
+    def load(self, outputpath, allowed_imports=None, silent=False, entrypoints=None, minify=False, compress=False):
+        '''Generates the module if needed (see `generate`), and returns it for use with `remoto.Connection.import_module`.
+        A freshly generated module is imported, which validates it locally.
+        An up-to-date module is not executed locally: Remoto only needs its source and the names it defines, which we read from the file.
+        Args:
+            outputpath (str): Location to store module, including output filename.
+            allowed_imports (optional iterable(str)): If set to an iterable, does not remove given import statements.
+            silent (optional bool): If set, skips printing warnings when non-standard imports are encountered.
+            entrypoints (optional iterable(str)): Names of functions called remotely. See `generate`.
+            minify (optional bool): If set, strips comments and docstrings. See `generate`.
+            compress (optional bool): If set, stores the module zlib-compressed. See `generate`.
+
+        Returns:
+            Module to pass to `remoto.Connection.import_module`.'''
+        if self.generate(outputpath, allowed_imports=allowed_imports, silent=silent, entrypoints=entrypoints, minify=minify, compress=compress):
+            module = importer.import_full_path(outputpath)
+        else:
+            generation_hash = ModuleGenerator._read_hash(outputpath)
+            cached = _loaded_modules.get(outputpath)
+            if cached != None and cached[0] == generation_hash:
+                return cached[1]
+            module = _remote_module_stub(outputpath)
+        _loaded_modules[outputpath] = (ModuleGenerator._read_hash(outputpath), module)
+        return module
+
+
+def _definition_names(node):
+    '''Returns the module-level names defined by given statement, for functions and classes. Returns an empty list for other statements.'''
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    return []
+
+
+def _referenced_names(node):
+    '''Returns all names read anywhere in given node (including decorators, default arguments and nested functions).'''
+    return set(x.id for x in ast.walk(node) if isinstance(x, ast.Name))
+
+
+def _prune(source, entrypoints, silent=False):
+    '''Removes module-level functions and classes which cannot be reached from the entrypoints or from module-level statements.
+    Reachability is determined on the call graph, using every name read in a definition as an edge.
+    Args:
+        source (str): Merged module source.
+        entrypoints (iterable(str)): Names of functions which are called remotely.
+        silent (optional bool): If set, does not print which entrypoints are missing.
+
+    Returns:
+        `str`: Pruned module source.'''
+    tree = ast.parse(source)
+    definitions = dict() # Maps name to all module-level definitions of that name
+    to_visit = set(entrypoints)
+    for node in tree.body:
+        names = _definition_names(node)
+        if any(names):
+            for name in names:
+                definitions.setdefault(name, []).append(node)
+        else: # Statements other than definitions always execute, and keep everything they use.
+            to_visit.update(_referenced_names(node))
+
+    if not silent:
+        for name in entrypoints:
+            if not name in definitions:
+                printw('Entrypoint "{}" is not defined in the generated module.'.format(name))
+
+    reachable = set()
+    while any(to_visit):
+        name = to_visit.pop()
+        if name in reachable:
+            continue
+        reachable.add(name)
+        for node in definitions.get(name, []):
+            to_visit.update(_referenced_names(node) - reachable)
+
+    lines = source.splitlines(keepends=True)
+    removals = [node for node in tree.body if any(_definition_names(node)) and not any(x in reachable for x in _definition_names(node))]
+    for node in sorted(removals, key=lambda x: x.lineno, reverse=True):
+        first = min([node.lineno]+[x.lineno for x in getattr(node, 'decorator_list', [])])-1
+        lines[first:node.end_lineno] = []
+    return ''.join(lines)
+
+
+def _is_string_expr(node):
+    '''Returns `True` if given syntax tree node is a bare string statement, e.g. a docstring.'''
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+def _minify(source, entrypoints=None, silent=False):
+    '''Removes comments and docstrings from given source. Docstrings of entrypoints are kept, because remoto reads them.
+    After merging, the module docstring of every merged file is a bare string somewhere in the module body, so all module-level strings are removed.
+    Returns:
+        `str`: Minified source, or the original source if this Python version cannot write syntax trees back to source (Python <3.9).'''
+    if not hasattr(ast, 'unparse'):
+        if not silent:
+            printw('Cannot minify generated modules on Python {}.{}. Python 3.9+ is required.'.format(*sys.version_info[:2]))
+        return source
+    keep_docs = set(entrypoints) if entrypoints else set()
+    tree = ast.parse(source)
+    tree.body = [x for x in tree.body if not _is_string_expr(x)] or [ast.Pass()]
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if getattr(node, 'name', None) in keep_docs:
+            continue
+        if any(node.body) and _is_string_expr(node.body[0]):
+            node.body = node.body[1:] if len(node.body) > 1 else [ast.Pass()]
+    return ast.unparse(tree)+'\n'
+
+
+def _compress(source):
+    '''Wraps given source in a bootstrap, which decompresses and executes the zlib-compressed original in the global namespace of the module.'''
+    payload = base64.b64encode(zlib.compress(source.encode('utf-8'), 9)).decode('ascii')
+    return '''
+import base64
+import zlib
+{} = '{}'
+exec(compile(zlib.decompress(base64.b64decode({})).decode('utf-8'), '<generated>', 'exec'))
+'''.format(_payload_name, payload, _payload_name)
+
+
+def _decompress(tree):
+    '''Returns the original source of a module made with `_compress`, or `None` if given syntax tree is not from such a module.'''
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(x, ast.Name) and x.id == _payload_name for x in node.targets) and isinstance(node.value, ast.Constant):
+            return zlib.decompress(base64.b64decode(node.value.value)).decode('utf-8')
+    return None
+
+
+def _remote_module_stub(path):
+    '''Builds a module object for a generated module, without executing it.
+    Remoto reads the source of the module from `__file__`, and checks the module has the called function (and reads its docstring) before sending the call.
+    The returned module therefore has placeholders (with the original docstrings) for all top-level functions and classes.'''
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read(), filename=path)
+    source = _decompress(tree)
+    if source != None:
+        tree = ast.parse(source, filename=path)
+    module = types.ModuleType('.'.join(path.split(fs.sep())))
+    module.__file__ = path
+
+    def make_placeholder(name, doc):
+        def placeholder(*args, **kwargs):
+            raise RuntimeError('"{}" from generated module "{}" can only be executed remotely.'.format(name, path))
+        placeholder.__name__ = name
+        placeholder.__doc__ = doc if doc != None else ''
+        return placeholder
 
-''')
\ No newline at end of file
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            setattr(module, node.name, make_placeholder(node.name, ast.get_docstring(node)))
+    return module
\ No newline at end of file
@@ -0,0 +1,98 @@
+import shlex
+import subprocess
+
+from rados_deploy.internal.util.executor import Executor, ExecutorPool
+from rados_deploy.internal.util.printer import *
+
+
+'''Utility functions to install apt packages quickly.
+Installed packages are detected with `dpkg-query` first, so nodes which already have all packages skip apt entirely.
+Missing packages of a node are installed in a single apt transaction. The (slow) `apt-get update` only runs when installing from the current package lists fails.
+Optionally, all nodes fetch packages through an apt proxy (e.g. apt-cacher-ng on the admin node), so each package is downloaded from the internet only once.
+Requires:
+    Executor, ExecutorPool (executor)'''
+
+_apt_cache_port = 3142 # Default port of apt-cacher-ng.
+
+
+def apt_cache_url(hostname):
+    '''Returns the apt proxy url for an apt-cacher-ng instance (see `install_apt_cache`) running on given host.'''
+    return 'http://{}:{}'.format(hostname, _apt_cache_port)
+
+
+def apt_install_command(packages, proxy=None):
+    '''Returns a shell command installing all given packages which are not installed yet.
+    Args:
+        packages (iterable(str)): Packages to install.
+        proxy (optional str): If set, fetches packages through given apt proxy, e.g. 'http://admin:3142'.
+
+    Returns:
+        `str` command. The command exits with 0 when all packages are installed afterwards.'''
+    packages = sorted(set(packages))
+    options = '-o Acquire::http::Proxy={}'.format(shlex.quote(proxy)) if proxy else ''
+    install = 'sudo DEBIAN_FRONTEND=noninteractive apt-get install -y -q {} $missing'.format(options)
+    return ' '.join([
+        'missing="";',
+        'for pkg in {}; do dpkg-query -W -f=\'${{Status}}\' $pkg 2>/dev/null | grep -q "ok installed" || missing="$missing $pkg"; done;'.format(' '.join(shlex.quote(x) for x in packages)),
+        '[ -z "$missing" ] && exit 0;',
+        '{0} || (sudo apt-get update -q {1} && {0})'.format(install, options),
+    ])
+
+
+def apt_installed_command(packages):
+    '''Returns a shell command which exits with 0 if all given packages are installed, and with 1 otherwise.'''
+    return 'for pkg in {}; do dpkg-query -W -f=\'${{Status}}\' $pkg 2>/dev/null | grep -q "ok installed" || exit 1; done; exit 0'.format(' '.join(shlex.quote(x) for x in sorted(set(packages))))
+
+
+def apt_missing_hosts(hosts_packages):
+    '''Checks in parallel, using ssh, which hosts miss at least one of their packages.
+    Args:
+        hosts_packages (dict(str, iterable(str))): Maps hostnames to the packages they must have.
+
+    Returns:
+        `list(str)` of hostnames missing packages. Hosts we could not check are considered to miss packages.'''
+    executors = {host: Executor('ssh {} {}'.format(host, shlex.quote(apt_installed_command(packages))), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for host, packages in hosts_packages.items() if any(packages)}
+    pool = ExecutorPool()
+    pool.run_all(list(executors.values()))
+    pool.wait_all(stop_on_error=False)
+    return [host for host, executor in executors.items() if executor.returncode != 0]
+
+
+def apt_install(packages, proxy=None, silent=False):
+    '''Installs given packages on this machine, skipping packages which are already installed.
+    Args:
+        packages (iterable(str)): Packages to install.
+        proxy (optional str): If set, fetches packages through given apt proxy.
+        silent (optional bool): If set, suppresses apt output.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL} if silent else {'shell': True}
+    return subprocess.call(apt_install_command(packages, proxy=proxy), **kwargs) == 0
+
+
+def apt_install_hosts(hosts_packages, proxy=None, silent=False):
+    '''Installs packages on multiple hosts in parallel, using ssh. Every host executes a single apt transaction.
+    Args:
+        hosts_packages (dict(str, iterable(str))): Maps hostnames to the packages to install on them.
+        proxy (optional str): If set, fetches packages through given apt proxy.
+        silent (optional bool): If set, suppresses apt output.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL} if silent else {'shell': True}
+    executors = [Executor('ssh {} {}'.format(host, shlex.quote(apt_install_command(packages, proxy=proxy))), **kwargs) for host, packages in hosts_packages.items() if any(packages)]
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    return pool.wait_all(print_on_error=True)
+
+
+def install_apt_cache(silent=False):
+    '''Installs and starts apt-cacher-ng on this machine. Other nodes can use it as apt proxy, using `apt_cache_url`.
+    Returns:
+        `True` on success, `False` on failure.'''
+    if not apt_install(['apt-cacher-ng'], silent=silent):
+        printe('Could not install apt-cacher-ng.')
+        return False
+    kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL} if silent else {'shell': True}
+    return subprocess.call('sudo systemctl enable --now apt-cacher-ng', **kwargs) == 0
\ No newline at end of file
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+
+from rados_deploy.internal.util.printer import *
+
+
+'''Utility functions to cache build artifacts, keyed by the content of their sources and their build flags.
+An artifact consists of a build output directory and all files installed by `make install`, which are listed in the 'install_manifest.txt' written by CMake.
+Restoring an artifact takes seconds, where building takes a long time.
+Requires:
+    Environment (env)'''
+
+
+def artifact_default_dir():
+    '''Returns the default artifact cache directory: `~/.rados_deploy/artifacts`.'''
+    return join(Environment.get_storedir(), 'artifacts')
+
+
+def artifact_key(archive, flags):
+    '''Computes the cache key for an artifact.
+    Args:
+        archive (str): Path to source archive.
+        flags (iterable(str)): Build flags used to build the source.
+
+    Returns:
+        `str` key, sha256 hexdigest of the archive content and the flags.'''
+    sha = hashlib.sha256()
+    with open(archive, 'rb') as f:
+        for block in iter(lambda: f.read(1024*1024), b''):
+            sha.update(block)
+    sha.update(json.dumps(list(flags)).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def artifact_exists(artifact_dir, key):
+    '''Returns `True` if an artifact with given key exists in given cache directory, `False` otherwise.'''
+    return isfile(join(artifact_dir, key, 'build.tar.gz')) and isfile(join(artifact_dir, key, 'install.tar.gz'))
+
+
+def artifact_store(artifact_dir, key, build_dir, manifest, silent=False):
+    '''Stores an artifact in the cache. Existing artifacts with the same key are replaced.
+    Args:
+        artifact_dir (str): Cache directory.
+        key (str): Key of artifact, as returned by `artifact_key`.
+        build_dir (str): Directory with build output to store. Symlinks are followed.
+        manifest (str): Path to CMake install manifest, listing absolute paths of all installed files.
+        silent (optional bool): If set, does not print errors.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    mkdir(artifact_dir, exist_ok=True)
+    tmpdir = tempfile.mkdtemp(dir=artifact_dir, prefix='.tmp-') # Stored on the same filesystem, so the finished artifact can be moved in place atomically.
+    kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL}
+    try:
+        if subprocess.call('tar -czhf {} -C {} .'.format(shlex.quote(join(tmpdir, 'build.tar.gz')), shlex.quote(build_dir)), **kwargs) != 0:
+            if not silent:
+                printw('Could not store build artifact {}: Could not archive "{}".'.format(key, build_dir))
+            return False
+        # Installed files are archived relative to '/', to restore them with 'tar -C /'.
+        if subprocess.call('sed "s|^/||" {} | tar -czf {} -C / -T -'.format(shlex.quote(manifest), shlex.quote(join(tmpdir, 'install.tar.gz'))), **kwargs) != 0:
+            if not silent:
+                printw('Could not store build artifact {}: Could not archive installed files from "{}".'.format(key, manifest))
+            return False
+        rm(join(artifact_dir, key), ignore_errors=True)
+        os.rename(tmpdir, join(artifact_dir, key))
+        return True
+    finally:
+        rm(tmpdir, ignore_errors=True)
+
+
+def artifact_restore(artifact_dir, key, build_dir, silent=False):
+    '''Restores an artifact from the cache: Places the build output in given build directory, and (re)installs all installed files.
+    Args:
+        artifact_dir (str): Cache directory.
+        key (str): Key of artifact, as returned by `artifact_key`.
+        build_dir (str): Directory to place build output in. Existing content is removed.
+        silent (optional bool): If set, does not print errors.
+
+    Returns:
+        `True` on success, `False` if no artifact exists for given key, or on failure.'''
+    if not artifact_exists(artifact_dir, key):
+        return False
+    kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL}
+    rm(build_dir, ignore_errors=True)
+    mkdir(build_dir, exist_ok=True)
+    if subprocess.call('tar -xzf {} -C {}'.format(shlex.quote(join(artifact_dir, key, 'build.tar.gz')), shlex.quote(build_dir)), **kwargs) != 0:
+        if not silent:
+            printw('Could not restore build artifact {}: Could not extract build output.'.format(key))
+        return False
+    if subprocess.call('sudo tar -xzf {} -C /'.format(shlex.quote(join(artifact_dir, key, 'install.tar.gz'))), **kwargs) != 0:
+        if not silent:
+            printw('Could not restore build artifact {}: Could not install files.'.format(key))
+        return False
+    return True
\ No newline at end of file
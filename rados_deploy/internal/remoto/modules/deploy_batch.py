@@ -0,0 +1,128 @@
+import concurrent.futures
+import os
+import shutil
+import subprocess
+
+
+'''Remote helper for data deployment, handling the metadata operations for all files in bulk on the admin node.
+Receiving the full file manifest at once avoids a remote round-trip for every operation on every file.'''
+
+_setfattr_batch = 512 # Number of paths to pass to 1 setfattr command.
+
+
+def _copy_paths(dest_file, copies_amount):
+    '''Returns paths to a file and all its copies.'''
+    return [dest_file]+['{}.copy.{}'.format(dest_file, x) for x in range(copies_amount)]
+
+
+def _create_files(dest_file, copies_amount):
+    '''Creates a (empty) file and its copies, and their parent directory.
+    Returns:
+        `None` on success, a failure reason otherwise.'''
+    try:
+        os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+        for x in _copy_paths(dest_file, copies_amount):
+            with open(x, 'a'):
+                pass
+        return None
+    except OSError as e:
+        return 'Could not create file: {}'.format(e)
+
+
+def _link_paths(path, links_amount):
+    '''Returns paths to all hardlinks of a file.'''
+    return ['{}.link.{}'.format(path, x) for x in range(links_amount)]
+
+
+def _create_links(dest_file, copies_amount, links_amount):
+    '''Creates hardlinks to a file and its copies. Existing hardlinks are kept.
+    Returns:
+        `None` on success, a failure reason otherwise.'''
+    try:
+        for x in _copy_paths(dest_file, copies_amount):
+            for link in _link_paths(x, links_amount):
+                if not os.path.exists(link):
+                    os.link(x, link)
+        return None
+    except OSError as e:
+        return 'Could not create hardlink: {}'.format(e)
+
+
+def _setfattr(paths, object_size):
+    '''Sets the CephFS object size of given paths, using 1 command.
+    Returns:
+        `True` on success, `False` on failure.'''
+    cmd = ['sudo', 'setfattr', '--no-dereference', '-n', 'ceph.file.layout.object_size', '-v', str(object_size)]+list(paths)
+    try:
+        return subprocess.call(cmd, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) == 0
+    except OSError:
+        return False
+
+
+def _stripe_files(dest_files, copies_amount, object_size, executor):
+    '''Sets the CephFS object size of given files and their copies, in batches.
+    Returns:
+        `dict(str, str)` mapping files we could not stripe to a failure reason.'''
+    batch_size = max(1, _setfattr_batch // (copies_amount+1))
+    batches = [dest_files[x:x+batch_size] for x in range(0, len(dest_files), batch_size)]
+    futures = {executor.submit(_setfattr, [path for x in batch for path in _copy_paths(x, copies_amount)], object_size): batch for batch in batches}
+    failed = [x for future, batch in futures.items() if not future.result() for x in batch]
+    # A failing batch does not tell which files failed, so we retry those files one by one.
+    futures = {x: executor.submit(_setfattr, _copy_paths(x, copies_amount), object_size) for x in failed}
+    return {x: 'Could not set object size{}. Is the cluster running?'.format(' (for file and all {} copies)'.format(copies_amount) if copies_amount > 0 else '') for x, future in futures.items() if not future.result()}
+
+
+def pre_deploy(dest_files, copies_amount, object_size, links_amount=0):
+    '''Prepares files for deployment: Creates all (empty) files, their copies and parent directories, sets their CephFS object size, and creates their hardlinks.
+    Args:
+        dest_files (list(str)): Paths to files on CephFS.
+        copies_amount (int): Number of copies to create for every file. Copies of file 'x' are named 'x.copy.0', 'x.copy.1', etc.
+        object_size (int): CephFS object size to set, in bytes.
+        links_amount (optional int): Number of hardlinks to create for every file and copy. Hardlinks of file 'x' are named 'x.link.0', 'x.link.1', etc.
+
+    Returns:
+        `dict(str, str)` mapping every file to `None` on success, or to a failure reason on failure.'''
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 1)-1)) as executor:
+        status = dict(zip(dest_files, executor.map(lambda x: _create_files(x, copies_amount), dest_files)))
+        status.update(_stripe_files([x for x in dest_files if status[x] == None], copies_amount, object_size, executor))
+        if links_amount > 0:
+            linkable = [x for x in dest_files if status[x] == None]
+            status.update(zip(linkable, executor.map(lambda x: _create_links(x, copies_amount, links_amount), linkable)))
+    return status
+
+
+def _copy_file(source, dest, buffer_size=16*1024*1024):
+    '''Copies the content of a file into an existing file through the CephFS mount, truncating it.'''
+    with open(source, 'rb') as fsrc, open(dest, 'r+b') as fdst:
+        os.ftruncate(fdst.fileno(), 0)
+        shutil.copyfileobj(fsrc, fdst, buffer_size)
+
+
+def post_deploy(dest_files, copies_amount, concurrency=16):
+    '''Fills the copies of deployed files with the data of the original files.
+    All copies of all files are made at once, by copying RADOS objects (see `copy_objects`).
+    When the python3-rados package is not available, falls back to copying through the CephFS mount.
+    Args:
+        dest_files (list(str)): Paths to files on CephFS.
+        copies_amount (int): Number of copies of every file.
+        concurrency (optional int): Maximum number of objects (or files, when falling back) copied at once.
+
+    Returns:
+        `dict(str, str)` mapping every file to `None` on success, or to a failure reason on failure.'''
+    pairs = [(x, copy) for x in dest_files for copy in _copy_paths(x, copies_amount)[1:]]
+    try:
+        copied = copy_objects(pairs, concurrency)
+    except ImportError: # copy_objects imports rados before copying anything.
+        def _fill_copy(pair):
+            try:
+                _copy_file(*pair)
+                return None
+            except OSError as e:
+                return 'Could not copy file: {}'.format(e)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            copied = dict(zip([copy for _, copy in pairs], executor.map(_fill_copy, pairs)))
+    status = {x: None for x in dest_files}
+    for source, copy in pairs:
+        if copied[copy] != None and status[source] == None:
+            status[source] = 'Could not inflate dataset using {} copies of file: {}'.format(copies_amount, copied[copy])
+    return status
\ No newline at end of file
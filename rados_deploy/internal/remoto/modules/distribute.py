@@ -0,0 +1,120 @@
+import hashlib
+import shlex
+import subprocess
+import tempfile
+
+from rados_deploy.internal.util.executor import Executor, ExecutorPool
+from rados_deploy.internal.util.printer import *
+
+
+'''Utility functions to broadcast a file from this node to many cluster nodes.
+Instead of sending the file to every node from this node, nodes which received the file relay it to other nodes.
+Every round, each node holding the file sends it to 1 node without the file, so the number of holders doubles each round.
+This way, N nodes receive the file in ceil(log2(N+1)) rounds, and this node sends the file only ceil(log2(N+1)) times.
+Files which nodes already have can be detected by comparing checksums (see `remote_checksums`), so only differing files have to be sent.
+Warning: Requires that cluster nodes can connect to each other using ssh (see `install_ssh`).
+Requires:
+    Executor, ExecutorPool (executor)'''
+
+
+def _relay_command(src, dst, source, dest):
+    '''Returns a shell command to send a file to a node.
+    Args:
+        src (str or None): Hostname of node to send from. If `None`, sends from this node.
+        dst (str): Hostname of node to send to.
+        source (str): Path to file on this node. Only used when sending from this node.
+        dest (str): Path to file on other nodes. Relative paths are relative to the home directory.
+
+    Returns:
+        `str` command.'''
+    parent = dest.rsplit('/', 1)[0] if '/' in dest else '.'
+    send = 'ssh {0} {1} && scp -q {2} {0}:{3}'.format(dst, shlex.quote('mkdir -p {}'.format(parent)), shlex.quote(source if src == None else dest), shlex.quote(dest))
+    return send if src == None else 'ssh {} {}'.format(src, shlex.quote(send))
+
+
+def distribution_rounds(hosts):
+    '''Computes the relay schedule to broadcast a file from this node to given hosts.
+    Args:
+        hosts (list(str)): Hostnames of nodes to send to.
+
+    Returns:
+        `list(list(tuple(str or None, str)))`: For each round, the (sender, receiver) pairs sending in that round. Sender `None` is this node.'''
+    holders = [None]
+    pending = list(hosts)
+    rounds = []
+    while pending:
+        pairs = list(zip(holders, pending))
+        rounds.append(pairs)
+        holders += [dst for _, dst in pairs]
+        pending = pending[len(pairs):]
+    return rounds
+
+
+def distribute(source, hosts, dest, silent=False):
+    '''Broadcasts a file from this node to given hosts, using a binary tree relay.
+    Args:
+        source (str): Path to file to send.
+        hosts (list(str)): Hostnames of nodes to send to.
+        dest (str): Path to store file at on all hosts. Relative paths are relative to the home directory.
+        silent (optional bool): If set, does not print progress.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    rounds = distribution_rounds(hosts)
+    kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL}
+    for idx, pairs in enumerate(rounds):
+        if not silent:
+            print('Distributing {} (round {}/{}, {} node(s))'.format(source, idx+1, len(rounds), len(pairs)))
+        executors = [Executor(_relay_command(src, dst, source, dest), **kwargs) for src, dst in pairs]
+        pool = ExecutorPool()
+        pool.run_all(executors)
+        if not pool.wait_all(print_on_error=True):
+            printe('Could not distribute {} to all nodes.'.format(source))
+            return False
+    return True
+
+
+def execute_all(hosts, command, silent=False):
+    '''Executes given shell command on all given hosts in parallel, using ssh.
+    Returns:
+        `True` on success, `False` on failure.'''
+    kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL} if silent else {'shell': True}
+    executors = [Executor('ssh {} {}'.format(x, shlex.quote(command)), **kwargs) for x in hosts]
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    return pool.wait_all(print_on_error=True)
+
+
+def checksum(path):
+    '''Returns the sha256 hexdigest of the content of given file. Symlinks are followed.'''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024*1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def remote_checksums(hosts, paths):
+    '''Computes sha256 checksums of files on given hosts in parallel, using 1 ssh command per host. Commands run in an `ExecutorPool`, so at most `max_in_flight` hosts are checked at the same time.
+    Args:
+        hosts (list(str)): Hostnames of nodes to check.
+        paths (iterable(str)): Absolute paths of files to compute checksums for.
+
+    Returns:
+        `dict(str, dict(str, str))` mapping every hostname to a dict, mapping paths to checksums. Files which do not exist are not included.
+        Hosts we could not check map to an empty dict.'''
+    command = 'sha256sum {} 2>/dev/null; true'.format(' '.join(shlex.quote(x) for x in paths))
+    outputs = {x: tempfile.TemporaryFile() for x in hosts}
+    try:
+        pool = ExecutorPool()
+        pool.run_all([Executor('ssh {} {}'.format(x, shlex.quote(command)), shell=True, stdout=outputs[x], stderr=subprocess.DEVNULL) for x in hosts])
+        returncodes = pool.wait_all(stop_on_error=False, return_returncodes=True)
+        checksums = dict()
+        for x, returncode in zip(hosts, returncodes):
+            outputs[x].seek(0)
+            out = outputs[x].read().decode('utf-8') if returncode == 0 else ''
+            checksums[x] = {line.split(None, 1)[1].strip(): line.split(None, 1)[0] for line in out.splitlines() if len(line.split(None, 1)) == 2}
+        return checksums
+    finally:
+        for x in outputs.values():
+            x.close()
\ No newline at end of file
@@ -5,6 +5,7 @@ import remoto.process
 
 '''Utility functions to interact with CephFS.
 Requires:
+    apt
     config
     rados_util'''
 def stop_cephfs(connection, path='/mnt/cephfs', silent=False):
@@ -12,9 +13,19 @@ def stop_cephfs(connection, path='/mnt/cephfs', silent=False):
     remoto.process.check(connection, 'sudo fusermount -uz {}'.format(path), shell=True)
 
 
+def install_cephfs_client(connection, silent=False):
+    '''Installs the CephFS client (ceph-fuse) on remote machine, if not installed yet. Does not require a running cluster.
+    Returns:
+        `True` on success, `False` on failure.'''
+    _, _, exitcode = remoto.process.check(connection, apt_install_command(['ceph-fuse']), shell=True)
+    return exitcode == 0
+
+
 def start_cephfs(node, connection, ceph_deploypath, path='/mnt/cephfs', use_client_cache=True, retries=5, silent=False):
     '''Starts cephFS on /mnt/cephfs.
     Warning: This function fails when cephfs is already mounted.
+    Warning: The CephFS client must be installed first, using `install_cephfs_client`.
+    Note: Mounting succeeds at once when the cluster has an active MDS (see `mds_condition` in health). Failing attempts are retried with exponential backoff.
     Args:
         node (metareserve.Node): Node to start CephFS on.
         connection (remoto.Connection): Connection to use for deploying.
@@ -28,9 +39,6 @@ def start_cephfs(node, connection, ceph_deploypath, path='/mnt/cephfs', use_clie
         `True` on success, `False` on failure.'''
     remoto.process.check(connection, 'sudo mkdir -p {}'.format(path), shell=True)
     remoto.process.check(connection, 'sudo mkdir -p /etc/ceph'.format(path), shell=True)
-    _, _, exitcode = remoto.process.check(connection, 'sudo apt update -y && sudo apt install ceph-fuse -y', shell=True)
-    if exitcode != 0:
-        return False
 
     if not send_config_with_keys([node], ceph_deploypath, silent):
         return False
@@ -42,6 +50,7 @@ def start_cephfs(node, connection, ceph_deploypath, path='/mnt/cephfs', use_clie
     cmd = 'ceph-fuse'
 
     import time
+    interval = 0.1
     for x in range(retries):
         _, _, exitcode = remoto.process.check(connection, 'sudo {} {}'.format(cmd, path), shell=True)
         if exitcode == 0:
@@ -50,7 +59,8 @@ def start_cephfs(node, connection, ceph_deploypath, path='/mnt/cephfs', use_clie
             break
         else:
             printw('[{}] Executing ceph-fuse... (attempt {}/{})'.format(node.hostname, x+1, retries))
-        time.sleep(1)
+        time.sleep(interval)
+        interval = min(interval*2, 5)
     if not state_ok:
         return False
     return remoto.process.check(connection, 'sudo chown -R {} {}'.format(node.extra_info['user'], path), shell=True)[2] == 0
\ No newline at end of file
@@ -0,0 +1,77 @@
+import time
+
+
+'''Utility functions to wait until the cluster reaches a required state.
+Conditions are checked by polling `ceph status`, with exponential backoff, until all hold or a deadline passes.
+This way, the next phase starts the moment the cluster is ready for it.
+Requires:
+    state (rados)'''
+
+_health_timeout = 600 # Default maximum number of seconds to wait for a condition.
+_health_min_interval = 0.1
+_health_max_interval = 5
+
+
+def quorum_condition(monitors):
+    '''Returns a condition which holds when all given monitors are in quorum.'''
+    names = set(x.hostname.split('.')[0] for x in monitors)
+    return ('{} monitor(s) in quorum'.format(len(names)), lambda status: names.issubset(set(status.get('quorum_names', []))))
+
+
+def _osdmap(status):
+    osdmap = status.get('osdmap', {})
+    return osdmap.get('osdmap', osdmap) # Older Ceph versions nest the osdmap in another 'osdmap' key.
+
+
+def osds_condition(num_osds):
+    '''Returns a condition which holds when at least `num_osds` OSDs are up and in.'''
+    return ('{} OSD(s) up and in'.format(num_osds), lambda status: _osdmap(status).get('num_up_osds', 0) >= num_osds and _osdmap(status).get('num_in_osds', 0) >= num_osds)
+
+
+def pgs_condition(num_pgs, clean=False):
+    '''Returns a condition which holds when there are at least `num_pgs` placement groups, and all placement groups are active.
+    Args:
+        num_pgs (int): Minimal number of placement groups, e.g. the number of placement groups of just created pools. Until the pgmap includes new pools, it reports fewer placement groups.
+        clean (optional bool): If set, placement groups must be clean as well. Note: Placement groups never become clean when there are fewer OSD hosts than the pool size.
+
+    Returns:
+        condition, to pass to `wait_for`.'''
+    required = {'active', 'clean'} if clean else {'active'}
+    def check(status):
+        pgmap = status.get('pgmap', {})
+        ready = sum(x.get('count', 0) for x in pgmap.get('pgs_by_state', []) if required.issubset(x.get('state_name', '').split('+'))) # States may have more flags, e.g. 'active+clean+scrubbing'.
+        return pgmap.get('num_pgs', 0) >= num_pgs and ready == pgmap.get('num_pgs', 0)
+    return ('at least {} placement group(s), all {}'.format(num_pgs, '+'.join(sorted(required))), check)
+
+
+def mds_condition():
+    '''Returns a condition which holds when a metadata server is active.'''
+    return ('an active MDS', lambda status: any(x.get('status') == 'up:active' for x in status.get('fsmap', {}).get('by_rank', [])))
+
+
+def wait_for(conditions, timeout=_health_timeout, silent=False):
+    '''Waits until all given conditions hold.
+    Args:
+        conditions (list(tuple(str, callable))): Conditions, as returned by e.g. `quorum_condition`. Callables take parsed `ceph status` output, and return `True` when the condition holds.
+        timeout (optional int): Maximum number of seconds to wait.
+        silent (optional bool): If set, prints less output.
+
+    Returns:
+        `True` when all conditions hold, `False` if they did not hold before the deadline.'''
+    deadline = time.time() + timeout
+    interval = _health_min_interval
+    unmet = [x[0] for x in conditions]
+    while True:
+        status = ceph_json('status', True, timeout=max(1, min(30, int(deadline-time.time()))))
+        if status != None:
+            unmet = [name for name, check in conditions if not check(status)]
+            if not any(unmet):
+                if not silent:
+                    prints('Cluster ready: {}'.format(', '.join(x[0] for x in conditions)))
+                return True
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            printe('Cluster not ready after {} seconds. Waited for: {}'.format(timeout, ', '.join(unmet)))
+            return False
+        time.sleep(min(interval, remaining))
+        interval = min(interval*2, _health_max_interval)
@@ -5,7 +5,7 @@ import remoto.process
 
 '''Utility functions to control managers.
 Requires:
-    Executor (executor)
+    Executor, ExecutorPool (executor)
     rados_util'''
 
 def start_managers(managers, ceph_deploypath, silent):
@@ -22,5 +22,6 @@ def stop_manager(manager, connection, silent):
 def restart_managers(managers, silent):
     '''Restarts managers. An essential feature for when you modify configs and need to reload for changes to take effect.'''
     executors = [Executor('ssh {} "sudo systemctl restart ceph-mgr.target"'.format(x.hostname), **get_subprocess_kwargs(silent)) for x in managers]
-    Executor.run_all(executors)
-    return Executor.wait_all(executors, print_on_error=True)
\ No newline at end of file
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    return pool.wait_all(print_on_error=True)
\ No newline at end of file
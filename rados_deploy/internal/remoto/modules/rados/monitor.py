@@ -5,7 +5,7 @@ import remoto.process
 
 '''Utility functions to control monitors.
 Requires:
-    Executor (executor)
+    Executor, ExecutorPool (executor)
     rados_util'''
 
 def create_monitors(monitors, ceph_deploypath, silent):
@@ -28,5 +28,6 @@ def stop_monitor(monitor, connection, silent):
 def restart_monitors(monitors, silent):
     '''Restarts monitors. An essential feature for when you modify configs and need to reload for changes to take effect.'''
     executors = [Executor('ssh {} "sudo systemctl restart ceph-mon.target"'.format(x.hostname), **get_subprocess_kwargs(silent)) for x in monitors]
-    Executor.run_all(executors)
-    return Executor.wait_all(executors, print_on_error=True)
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    return pool.wait_all(print_on_error=True)
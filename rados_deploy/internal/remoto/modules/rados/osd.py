@@ -1,4 +1,5 @@
 import concurrent.futures
+import json
 import subprocess
 import uuid
 
@@ -6,72 +7,88 @@ import remoto.process
 
 '''Utility functions to control osds.
 Requires:
-    Executor (executor)
+    Executor, ExecutorPool (executor)
     rados_util'''
 
+def _list_osd_ids(silent):
+    '''Asks the cluster which OSD ids currently exist.
+    Returns:
+        list of OSD ids (int) on success, `None` if the cluster could not be queried.'''
+    try:
+        out = subprocess.check_output('sudo ceph --connect-timeout 30 osd ls --format json', shell=True, stderr=subprocess.DEVNULL)
+        return [int(x) for x in json.loads(out.decode('utf-8'))]
+    except (subprocess.CalledProcessError, ValueError) as e:
+        if not silent:
+            printw('Could not list existing OSDs: {}'.format(e))
+        return None
+
+
+def _remove_osds(osd_ids, silent):
+    '''Marks given OSDs down and out, and removes them from the crush map, the auth database and the osdmap.
+    All commands are sent to a single `ceph` CLI session, instead of starting the CLI (and performing a monitor handshake) per command.
+    The exit code of such a session does not reflect failures of individual commands, so we list the existing OSDs afterwards to verify they are gone.
+    Returns:
+        `True` on success, `False` if the cluster could not be queried or some OSDs remain.'''
+    if not osd_ids:
+        return True
+    ids = ' '.join(str(x) for x in osd_ids)
+    commands = ['osd down {}'.format(ids), 'osd out {}'.format(ids)]
+    commands += ['osd crush rm osd.{}'.format(x) for x in osd_ids]
+    commands += ['auth del osd.{}'.format(x) for x in osd_ids]
+    commands.append('osd rm {}'.format(ids))
+    if not silent:
+        print('Removing {} OSD(s) from the cluster.'.format(len(osd_ids)))
+    subprocess.run('sudo ceph --connect-timeout 30', input='\n'.join(commands)+'\n', universal_newlines=True, shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    remaining = _list_osd_ids(silent)
+    if remaining == None:
+        printe('Could not verify removal of {} OSD(s): Cannot list existing OSDs.'.format(len(osd_ids)))
+        return False
+    remaining = [x for x in osd_ids if x in remaining]
+    if remaining:
+        printe('Could not remove OSD(s): {}'.format(', '.join('osd.{}'.format(x) for x in remaining)))
+        return False
+    return True
+
+
+def _stop_and_remove_osds(osds, silent):
+    '''Stops all OSD daemons on given nodes, and removes all OSDs registered in the cluster.
+    Returns:
+        `True` if all registered OSDs were removed, `False` otherwise.'''
+    # stopping osds
+    executors = [Executor('ssh {} "sudo systemctl stop ceph-osd.target"'.format(x.hostname), **get_subprocess_kwargs(silent)) for x in osds]
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    pool.wait_all(stop_on_error=False, print_on_error=True)
+
+    # removing osds
+    osd_ids = _list_osd_ids(silent)
+    if osd_ids == None:
+        printe('Could not list existing OSDs. Old OSDs are not removed.')
+        return False
+    return _remove_osds(osd_ids, silent)
+
+
 def stop_osds_memstore(osds, silent):
     '''Completely stops and removes all old running OSDs. Does not return anything.
     Warning: First, CephFS must be stopped, and seconfly, the Ceph pools must removed, before calling this function.'''
+    _stop_and_remove_osds(osds, silent)
 
 
-    # stopping osds
-    executors = [Executor('ssh {} "sudo systemctl stop ceph-osd.target"'.format(x.hostname), **get_subprocess_kwargs(silent)) for x in osds]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=True)
-
-    # removing osds
-    executors = [Executor('sudo ceph osd down osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds))]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-    executors = [Executor('sudo ceph osd out osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds))]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-    executors = [Executor('sudo ceph osd rm osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds))]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-
-    # remove from crush
-    executors = [Executor('sudo ceph osd crush rm osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds))]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-
-    # remove from auth
-    executors = [Executor('sudo ceph auth del osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds))]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
+def _device_paths(osd):
+    '''Returns the list of devices to use for bluestore on given node. The "device_path" extra info may contain a comma-separated list of devices.'''
+    return [x.strip() for x in osd.extra_info['device_path'].split(',') if any(x.strip())]
 
 
 def stop_osds_bluestore(osds, silent):
-    # stopping osds
-    executors = [Executor('ssh {} "sudo systemctl stop ceph-osd.target"'.format(x.hostname), **get_subprocess_kwargs(silent)) for x in osds]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=True)
-
-     # removing osds
-    executors = [Executor('sudo ceph osd down osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds)+20)]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-    executors = [Executor('sudo ceph osd out osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds)+20)]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-    executors = [Executor('sudo ceph osd rm osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds)+20)]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-
-    # remove from crush
-    executors = [Executor('sudo ceph osd crush rm osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds)+20)]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-
-    # remove from auth
-    executors = [Executor('sudo ceph auth del osd.{}'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in range(len(osds)+20)]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
-
-    # Stopping bluestore
-    executors = [Executor('ssh {} "sudo ceph-volume lvm zap {} --destroy"'.format(x.hostname, x.extra_info['device_path']), **get_subprocess_kwargs(silent)) for x in osds]
-    Executor.run_all(executors)
-    Executor.wait_all(executors, stop_on_error=False, print_on_error=False)
+    '''Completely stops and removes all old running OSDs, and destroys the data on their devices. Does not return anything.
+    Warning: First, CephFS must be stopped, and seconfly, the Ceph pools must removed, before calling this function.'''
+    _stop_and_remove_osds(osds, silent)
+
+    # Stopping bluestore. Zapping destroys the LVM volumes on each device as well.
+    executors = [Executor('ssh {} "sudo ceph-volume lvm zap --destroy {}"'.format(x.hostname, ' '.join(_device_paths(x))), **get_subprocess_kwargs(silent)) for x in osds]
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    pool.wait_all(stop_on_error=False, print_on_error=False)
 
 
 def _remoto_check_call(connection, cmd, **kwargs):
@@ -130,24 +147,38 @@ def start_osd_memstore(osd, connection, num_osds, silent):
         return all(x.result() for x in futures)
 
 
-def start_osd_bluestore(ceph_deploypath, osd, num_osds, silent):
-    '''Starts a Ceph OSD for bluestore clusters.
-    Requires that a key "device_path" is set in the extra_info of the node, which points to a device that will serve as data storage location.
+def start_osd_bluestore(osd, connection, num_osds, silent):
+    '''Starts all Ceph OSDs of a node, for bluestore clusters.
+    Creates all OSDs with a single `ceph-volume lvm batch` call, executed on the node itself.
+    Each device is split into equally-sized LVM volumes, one per OSD.
+    Requires that a key "device_path" is set in the extra_info of the node, which points to the device(s) that will serve as data storage location.
+    Multiple devices are given as a comma-separated list, e.g. "/dev/nvme0n1,/dev/nvme1n1".
     Args:
-        ceph_deploypath (str): Absolute path to ceph_deploy.
-        osd (metareserve.Node): Node to start OSD daemon on.
-        num_osds (int): Amount of OSD daemons to spawn on local device.
+        osd (metareserve.Node): Node to start OSD daemons on.
+        connection (remoto.Connection): Connection to given `osd`.
+        num_osds (int): Amount of OSD daemons to spawn on the node. Must be a multiple of the number of devices.
         silent: If set, suppresses debug output.
 
     Returns:
         `True` on success, `False` on failure.'''
-    executors = [Executor('{} -q osd create --data {} {}'.format(ceph_deploypath, osd.extra_info['device_path'], osd.hostname), **get_subprocess_kwargs(silent)) for x in range(num_osds)]
-    Executor.run_all(executors)
-    return Executor.wait_all(executors, print_on_error=True)
+    devices = _device_paths(osd)
+    if len(devices) == 0 or num_osds % len(devices) != 0:
+        printe('[{}] Cannot divide {} OSD(s) equally over {} device(s): {}'.format(osd.hostname, num_osds, len(devices), ', '.join(devices)))
+        return False
+
+    osds_per_device = num_osds // len(devices)
+    if not silent:
+        print('[{}] Creating {} OSD(s) on each of: {}'.format(osd.hostname, osds_per_device, ', '.join(devices)))
+    out, err, code = remoto.process.check(connection, 'sudo ceph-volume lvm batch --yes --bluestore --osds-per-device {} {}'.format(osds_per_device, ' '.join(devices)), shell=True)
+    if code != 0:
+        printe('[{}] Could not create OSDs (exitcode={}).\nOut={}\nErr={}'.format(osd.hostname, code, '\n'.join(out), '\n'.join(err)))
+        return False
+    return True
 
 
 def restart_osds(osds, silent):
     '''Restarts managers. An essential feature for when you modify configs and need to reload for changes to take effect.'''
     executors = [Executor('ssh {} "sudo systemctl restart ceph-osd.target"'.format(x.hostname), **get_subprocess_kwargs(silent)) for x in osds]
-    Executor.run_all(executors)
-    return Executor.wait_all(executors, print_on_error=True)
\ No newline at end of file
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    return pool.wait_all(print_on_error=True)
\ No newline at end of file
@@ -0,0 +1,101 @@
+import json
+import subprocess
+
+import remoto.process
+
+
+'''Utility functions to inspect the state of a running cluster.
+Requires:
+    rados_util'''
+
+def ceph_json(command, silent, timeout=30):
+    '''Executes a ceph command on the admin node, with JSON output.
+    Args:
+        command (str): Ceph command to execute, e.g. 'status'.
+        silent (bool): If set, does not print errors.
+        timeout (optional int): Maximum number of seconds to wait for a connection with the monitors.
+
+    Returns:
+        parsed output on success, `None` on failure.'''
+    try:
+        out = subprocess.check_output('sudo ceph --connect-timeout {} {} --format json'.format(timeout, command), shell=True, stderr=subprocess.DEVNULL)
+        return json.loads(out.decode('utf-8'))
+    except (subprocess.CalledProcessError, ValueError) as e:
+        if not silent:
+            printw('Could not query cluster state ("ceph {}"): {}'.format(command, e))
+        return None
+
+
+def get_cluster_state(silent):
+    '''Queries the current cluster state.
+    Returns:
+        `dict` with keys 'status', 'osd_tree', 'fs_ls', containing parsed `ceph status`, `ceph osd tree`, and `ceph fs ls` output. `None` if the cluster could not be queried.'''
+    state = {'status': ceph_json('status', silent), 'osd_tree': ceph_json('osd tree', silent), 'fs_ls': ceph_json('fs ls', silent)}
+    return state if all(x != None for x in state.values()) else None
+
+
+def get_pool_pg_num(pool, silent):
+    '''Returns the number of placement groups of given pool, or `None` if it could not be queried.'''
+    out = ceph_json('osd pool get {} pg_num'.format(pool), silent)
+    return out.get('pg_num') if out else None
+
+
+def _short_hostname(node):
+    '''Ceph names daemons after the short hostname of the node they run on.'''
+    return node.hostname.split('.')[0]
+
+
+def cluster_matches(state, monitors, managers, mdss, osd_counts, silent):
+    '''Checks whether a running cluster has the requested topology, with all daemons up.
+    Args:
+        state (dict): Cluster state, as returned by `get_cluster_state`.
+        monitors (list(metareserve.Node)): Nodes which must run a monitor.
+        managers (list(metareserve.Node)): Nodes which must run a manager.
+        mdss (list(metareserve.Node)): Nodes which must run a metadata server.
+        osd_counts (dict(metareserve.Node, int)): Maps nodes to the number of OSDs they must run.
+        silent (bool): If set, does not print why the cluster does not match.
+
+    Returns:
+        `True` if the cluster matches, `False` otherwise.'''
+    status = state['status']
+    reasons = []
+
+    quorum = set(status.get('quorum_names', []))
+    if quorum != set(_short_hostname(x) for x in monitors):
+        reasons.append('monitor quorum is {}, expected {}'.format(sorted(quorum), sorted(_short_hostname(x) for x in monitors)))
+
+    mgrmap = status.get('mgrmap', {})
+    num_managers = (1 if mgrmap.get('available') else 0) + mgrmap.get('num_standbys', len(mgrmap.get('standbys', [])))
+    if num_managers != len(managers):
+        reasons.append('found {} available manager(s), expected {}'.format(num_managers, len(managers)))
+
+    fsmap = status.get('fsmap', {})
+    num_mdss = fsmap.get('up', 0) + fsmap.get('up:standby', 0)
+    if num_mdss != len(mdss) or not any(x.get('status') == 'up:active' for x in fsmap.get('by_rank', [])):
+        reasons.append('found {} running MDS(s), expected {} with at least 1 active'.format(num_mdss, len(mdss)))
+
+    tree_nodes = {x['id']: x for x in state['osd_tree'].get('nodes', [])}
+    found_osds = dict()
+    for x in tree_nodes.values():
+        if x.get('type') == 'host':
+            found_osds[x['name']] = [tree_nodes[y] for y in x.get('children', []) if y in tree_nodes]
+    for node, amount in osd_counts.items():
+        osds = found_osds.get(_short_hostname(node), [])
+        healthy = [x for x in osds if x.get('status') == 'up' and x.get('reweight', 0) > 0]
+        if len(osds) != amount or len(healthy) != amount:
+            reasons.append('node {} has {} OSD(s) ({} up and in), expected {}'.format(node.hostname, len(osds), len(healthy), amount))
+    if sum(len(x) for x in found_osds.values()) != sum(osd_counts.values()):
+        reasons.append('cluster has {} OSD(s), expected {}'.format(sum(len(x) for x in found_osds.values()), sum(osd_counts.values())))
+
+    if not any(x.get('name') == 'cephfs' and x.get('metadata_pool') == 'cephfs_metadata' and 'cephfs_data' in x.get('data_pools', []) for x in state['fs_ls']):
+        reasons.append('no CephFS named "cephfs" on pools cephfs_metadata and cephfs_data')
+
+    if any(reasons) and not silent:
+        printw('Running cluster does not match requested cluster:\n{}'.format('\n'.join('\t{}'.format(x) for x in reasons)))
+    return not any(reasons)
+
+
+def is_mounted(connection, path):
+    '''Returns `True` if CephFS is mounted at given path on remote machine, `False` otherwise.'''
+    _, _, exitcode = remoto.process.check(connection, 'grep -qs " {} fuse.ceph-fuse " /proc/mounts'.format(path.rstrip('/')), shell=True)
+    return exitcode == 0
\ No newline at end of file
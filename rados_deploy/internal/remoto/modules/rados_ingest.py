@@ -0,0 +1,224 @@
+import concurrent.futures
+import os
+import subprocess
+import threading
+
+
+'''Remote helper to write deployed files straight into the CephFS data pool with librados, instead of writing their contents through the CephFS (FUSE) mount.
+Files are created and sized through the mount, so the MDS knows about them. Then, their contents are written as RADOS objects, named and laid out exactly as a CephFS client would:
+Object number 'x' of a file with inode number 'ino' is named '<ino in hex>.<x as 8-digit hex>', and file bytes are spread over objects following the file layout.
+Warning: Requires the python3-rados package, a readable '/etc/ceph/ceph.client.admin.keyring', and that ceph-fuse reports real inode numbers (the default, 'client_use_faked_inos=false').
+         Use `ingest_check` to verify these requirements before writing any objects.'''
+
+_min_ino = 1 << 40 # The MDS allocates inode numbers of files and directories from this number on. Only the root directory has a lower (real) inode number.
+
+
+def _read_layout(path):
+    '''Reads the CephFS layout of a file.
+    Returns:
+        `(stripe_unit, stripe_count, object_size, pool)`.'''
+    def _get(name):
+        return os.getxattr(path, 'ceph.file.layout.{}'.format(name)).decode('utf-8').strip()
+    return int(_get('stripe_unit')), int(_get('stripe_count')), int(_get('object_size')), _get('pool')
+
+
+def object_name(ino, object_no):
+    '''Returns the name of a RADOS object holding file data, as used by CephFS.'''
+    return '{:x}.{:08x}'.format(ino, object_no)
+
+
+def object_extents(size, stripe_unit, stripe_count, object_size):
+    '''Maps the bytes of a file to RADOS objects, following the CephFS striping strategy:
+    Stripe units are dealt round-robin over `stripe_count` objects. When these objects are full, the next `stripe_count` objects are used.
+    Args:
+        size (int): File size in bytes.
+        stripe_unit (int): Stripe unit in bytes.
+        stripe_count (int): Number of objects to stripe over.
+        object_size (int): Object size in bytes. Must be a multiple of `stripe_unit`.
+
+    Returns:
+        `dict(int, list(tuple(int, int, int)))` mapping object numbers to `(file offset, object offset, length)` extents.'''
+    units_per_object = object_size // stripe_unit
+    extents = dict()
+    for block in range(-(-size // stripe_unit)):
+        stripe_no, stripe_pos = divmod(block, stripe_count)
+        object_no = (stripe_no // units_per_object)*stripe_count + stripe_pos
+        file_offset = block*stripe_unit
+        extents.setdefault(object_no, []).append((file_offset, (stripe_no % units_per_object)*stripe_unit, min(stripe_unit, size-file_offset)))
+    return extents
+
+
+def ingest_check(probe, conffile='/etc/ceph/ceph.conf', keyring='/etc/ceph/ceph.client.admin.keyring'):
+    '''Checks whether this node can write files into CephFS using librados: The python3-rados package must be available, the keyring must be readable,
+    and ceph-fuse must report real inode numbers, because RADOS object names are derived from them.
+    Args:
+        probe (str): Existing file on CephFS, to verify reported inode numbers with.
+        conffile (optional str): Ceph configuration file to connect with.
+        keyring (optional str): Keyring to connect with.
+
+    Returns:
+        `None` if all requirements are met, a failure reason otherwise.'''
+    try:
+        import rados
+    except ImportError:
+        return 'Package python3-rados is not installed.'
+    if not os.access(keyring, os.R_OK):
+        return 'Keyring {} is not readable. Is the cluster started?'.format(keyring)
+    try:
+        out = subprocess.check_output(['ceph-conf', '-c', conffile, '-n', 'client.admin', '--lookup', 'client_use_faked_inos'], stderr=subprocess.DEVNULL)
+        if out.decode('utf-8').strip().lower() in ('true', '1'):
+            return 'ceph-fuse reports faked inode numbers (client_use_faked_inos=true in {}).'.format(conffile)
+    except (subprocess.CalledProcessError, OSError): # Option not set, or no ceph-conf available.
+        pass
+    try:
+        if os.stat(probe).st_ino < _min_ino:
+            return 'ceph-fuse reports faked inode numbers (found inode number {} for {}).'.format(os.stat(probe).st_ino, probe)
+    except OSError as e:
+        return 'Could not stat {}: {}'.format(probe, e)
+    try:
+        cluster = rados.Rados(conffile=conffile)
+        cluster.connect()
+        cluster.shutdown()
+    except rados.Error as e:
+        return 'Could not connect to cluster: {}'.format(e)
+    return None
+
+
+def _prepare(dest_file, size):
+    '''Sets the size of an (empty) file on CephFS, and flushes it to the MDS.
+    Returns:
+        `int` inode number of the file.'''
+    with open(dest_file, 'r+b') as f:
+        if os.fstat(f.fileno()).st_ino < _min_ino:
+            raise ValueError('ceph-fuse reports faked inode number {}'.format(os.fstat(f.fileno()).st_ino))
+        found = os.fstat(f.fileno()).st_size
+        if found != 0 and found != size: # Shrinking a file makes the MDS trim objects in the background, which could race with our writes.
+            raise ValueError('File already exists with different size ({} bytes, expected {} bytes)'.format(found, size))
+        os.ftruncate(f.fileno(), size)
+        os.fsync(f.fileno())
+        return os.fstat(f.fileno()).st_ino
+
+
+def ingest(files, inflight=16, conffile='/etc/ceph/ceph.conf'):
+    '''Writes files into CephFS, by writing their contents directly as RADOS objects, using asynchronous writes.
+    Args:
+        files (list(tuple(str, str))): `(source, destination)` pairs. Sources are files on this node (a leading '~' is expanded). Destinations are (empty) files on CephFS, e.g. created by `pre_deploy`.
+                                       Sources of successfully ingested files are removed.
+        inflight (optional int): Maximum number of object writes in flight at once. Every write holds 1 object in memory.
+        conffile (optional str): Ceph configuration file to connect with.
+
+    Returns:
+        `dict(str, str)` mapping every destination to `None` on success, or to a failure reason on failure.'''
+    import rados
+    status = {dest: None for _, dest in files}
+    try:
+        cluster = rados.Rados(conffile=conffile)
+        cluster.connect()
+    except rados.Error as e:
+        return {dest: 'Could not connect to cluster: {}'.format(e) for dest in status}
+
+    slots = threading.BoundedSemaphore(max(1, inflight))
+    lock = threading.Lock()
+    def _on_complete(dest, completion):
+        if completion.get_return_value() < 0:
+            with lock:
+                status[dest] = 'Could not write object (error {})'.format(completion.get_return_value())
+        slots.release()
+
+    ioctxs = dict()
+    try:
+        for source, dest in files:
+            try:
+                source = os.path.expanduser(source)
+                size = os.path.getsize(source)
+                stripe_unit, stripe_count, object_size, pool = _read_layout(dest)
+                ino = _prepare(dest, size)
+                if not pool in ioctxs:
+                    ioctxs[pool] = cluster.open_ioctx(pool)
+                with open(source, 'rb') as f:
+                    for object_no, extents in sorted(object_extents(size, stripe_unit, stripe_count, object_size).items()):
+                        data = bytearray(max(x[1]+x[2] for x in extents))
+                        for file_offset, object_offset, length in extents:
+                            f.seek(file_offset)
+                            data[object_offset:object_offset+length] = f.read(length)
+                        slots.acquire()
+                        try:
+                            ioctxs[pool].aio_write_full(object_name(ino, object_no), bytes(data), oncomplete=lambda completion, dest=dest: _on_complete(dest, completion))
+                        except rados.Error:
+                            slots.release()
+                            raise
+            except (OSError, ValueError, rados.Error) as e:
+                with lock:
+                    status[dest] = 'Could not ingest file: {}'.format(e)
+        for _ in range(max(1, inflight)): # Waits until all writes completed.
+            slots.acquire()
+    finally:
+        for x in ioctxs.values():
+            x.close()
+        cluster.shutdown()
+    for source, dest in files:
+        if status[dest] == None:
+            try:
+                os.remove(os.path.expanduser(source))
+            except OSError:
+                pass
+    return status
+
+
+def copy_objects(pairs, concurrency=16, conffile='/etc/ceph/ceph.conf'):
+    '''Copies files on CephFS into other (empty) files on CephFS, by copying their RADOS objects.
+    Every object is read and written by this node using librados, so no data passes through the CephFS (FUSE) mount.
+    Note: The python librados bindings do not provide the OSD-side copy-from operation, so object data does pass through this node.
+    Args:
+        pairs (list(tuple(str, str))): `(source, destination)` pairs of files on CephFS. Sources and destinations must have equal layouts.
+        concurrency (optional int): Maximum number of objects copied at once. Every copy holds 1 object in memory.
+        conffile (optional str): Ceph configuration file to connect with.
+
+    Returns:
+        `dict(str, str)` mapping every destination to `None` on success, or to a failure reason on failure.'''
+    import rados
+    status = {dest: None for _, dest in pairs}
+    try:
+        cluster = rados.Rados(conffile=conffile)
+        cluster.connect()
+    except rados.Error as e:
+        return {dest: 'Could not connect to cluster: {}'.format(e) for dest in status}
+
+    ioctxs = dict()
+    def _copy_object(pool, object_size, source_name, dest_name):
+        try:
+            data = ioctxs[pool].read(source_name, object_size)
+        except rados.ObjectNotFound: # Sparse file, nothing to copy.
+            return None
+        ioctxs[pool].write_full(dest_name, data)
+        return None
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = dict()
+            for source, dest in pairs:
+                try:
+                    layout = _read_layout(source)
+                    if _read_layout(dest) != layout:
+                        raise ValueError('Layout of {} differs from layout of {}'.format(dest, source))
+                    stripe_unit, stripe_count, object_size, pool = layout
+                    with open(source, 'rb') as f: # Opening the file makes clients which wrote it flush their data to RADOS.
+                        os.fsync(f.fileno())
+                        stat = os.fstat(f.fileno())
+                    ino = _prepare(dest, stat.st_size)
+                    if not pool in ioctxs:
+                        ioctxs[pool] = cluster.open_ioctx(pool)
+                    for object_no in object_extents(stat.st_size, stripe_unit, stripe_count, object_size):
+                        futures[executor.submit(_copy_object, pool, object_size, object_name(stat.st_ino, object_no), object_name(ino, object_no))] = dest
+                except (OSError, ValueError, rados.Error) as e:
+                    status[dest] = 'Could not copy file: {}'.format(e)
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except rados.Error as e:
+                    status[futures[future]] = 'Could not copy object: {}'.format(e)
+    finally:
+        for x in ioctxs.values():
+            x.close()
+        cluster.shutdown()
+    return status
\ No newline at end of file
@@ -1,34 +1,26 @@
+import filecmp
+import json
 import os
+import shutil
 import subprocess
 import tempfile
-import urllib.request
 
 
+_ceph_packages = {'MON': 'ceph-mon', 'MGR': 'ceph-mgr', 'OSD': 'ceph-osd', 'MDS': 'ceph-mds'} # Package installed by ceph-deploy for each designation.
+_client_packages = ['ceph-fuse', 'attr'] # Packages required on all cluster nodes to mount and stripe CephFS.
+_arrow_cmake_flags = ['-DARROW_PARQUET=ON', '-DARROW_DATASET=ON', '-DARROW_JNI=ON', '-DARROW_ORC=ON', '-DARROW_CSV=ON', '-DARROW_CLS=ON']
+_incremental_packages = ['ninja-build', 'ccache'] # Additional packages required to compile RADOS-arrow incrementally.
+_rados_packages = ['libradospp-dev', 'rados-objclass-dev', 'openjdk-8-jdk-headless', 'openjdk-11-jdk-headless', 'libboost-all-dev', 'automake', 'bison', 'flex', 'g++', 'libevent-dev', 'libssl-dev', 'libtool', 'make', 'pkg-config', 'maven', 'cmake', 'thrift-compiler']
+
 def _get_ceph_deploy(location, silent=False, retries=5):
     url = 'https://github.com/ceph/ceph-deploy/archive/refs/heads/master.zip'
-    with tempfile.TemporaryDirectory() as tmpdir: # We use a tempfile to store the downloaded archive.
-        archiveloc = join(tmpdir, 'ceph-deploy.zip')
-        if not silent:
-            print('Fetching ceph-deploy from {}'.format(url))
-        for x in range(retries):
-            try:
-                try:
-                    rm(archiveloc)
-                except Exception as e:
-                    pass
-                urllib.request.urlretrieve(url, archiveloc)
-                break
-            except Exception as e:
-                if x == 0:
-                    printw('Could not download ceph-deploy. Retrying...')
-                elif x == retries-1:
-                    printe('Could not download ceph-deploy: {}'.format(e))
-                    return False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        extractloc = join(tmpdir, 'extracted')
+        mkdir(extractloc, exist_ok=True)
+        if not download_unpack(url, extractloc, retries=retries, silent=silent):
+            printe('Could not fetch ceph-deploy.')
+            return False
         try:
-            extractloc = join(tmpdir, 'extracted')
-            mkdir(extractloc, exist_ok=True)
-            unpack(archiveloc, extractloc)
-
             extracted_dir = next(ls(extractloc, only_dirs=True, full_paths=True)) # find out what the extracted directory is called. There will be only 1 extracted directory.
             rm(location, ignore_errors=True)
             mkdir(location)
@@ -40,25 +32,15 @@ def _get_ceph_deploy(location, silent=False, retries=5):
             return False
 
 
-def _get_rados_dev(location, arrow_url, silent=False, retries=5):
-    with tempfile.TemporaryDirectory() as tmpdir: # We use a tempfile to store the downloaded archive.
-        archiveloc = join(tmpdir, 'rados-arrow.zip')
-        if not silent:
-            print('Fetching RADOS-arrow from {}'.format(arrow_url))
-        for x in range(retries):
-            try:
-                try:
-                    rm(archiveloc)
-                except Exception as e:
-                    pass
-                urllib.request.urlretrieve(arrow_url, archiveloc)
-                break
-            except Exception as e:
-                if x == 0:
-                    printw('Could not download RADOS-arrow. Retrying...')
-                elif x == retries-1:
-                    printe('Could not download RADOS-arrow: {}'.format(e))
-                    return False
+def _download_rados_dev(arrow_url, archiveloc, sha256=None, silent=False, retries=5):
+    if not download(arrow_url, archiveloc, sha256=sha256, segments=4, retries=retries, silent=silent):
+        printe('Could not download RADOS-arrow.')
+        return False
+    return True
+
+
+def _extract_rados_dev(archiveloc, location):
+    with tempfile.TemporaryDirectory() as tmpdir:
         try:
             extractloc = join(tmpdir, 'extracted')
             mkdir(extractloc, exist_ok=True)
@@ -75,6 +57,133 @@ def _get_rados_dev(location, arrow_url, silent=False, retries=5):
             return False
 
 
+def _update_rados_dev(archiveloc, location):
+    '''Updates the RADOS-arrow source at given location with the content of given archive, preserving all other files (e.g. build output).
+    Only files with changed content are overwritten. Other files keep their modification time, so build tools only recompile what depends on changed files.'''
+    with tempfile.TemporaryDirectory() as tmpdir:
+        extractloc = join(tmpdir, 'source')
+        if not _extract_rados_dev(archiveloc, extractloc):
+            return False
+        try:
+            for root, dirs, files in os.walk(extractloc):
+                dest_root = join(location, os.path.relpath(root, extractloc))
+                mkdir(dest_root, exist_ok=True)
+                for name in files:
+                    src, dest = join(root, name), join(dest_root, name)
+                    if os.path.islink(src) or os.path.islink(dest) or not isfile(dest) or not filecmp.cmp(src, dest, shallow=False):
+                        rm(dest, ignore_errors=True)
+                        shutil.copy(src, dest, follow_symlinks=False)
+            return True
+        except OSError as e:
+            printe('Could not update RADOS-arrow source at {}: {}'.format(location, e))
+            return False
+
+
+def _build_rados_dev_incremental(location, cmake_flags, cores, kwargs):
+    '''Compiles and installs RADOS-arrow using Ninja and ccache, reusing the build state of earlier builds at given location.'''
+    cwd = '{}/cpp'.format(location)
+    if subprocess.call('sudo chown -R $(id -u):$(id -g) {}'.format(location), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) != 0: # Builds without Ninja are made by root.
+        printe('Could not take ownership of {}'.format(location))
+        return False
+    cachefile = join(cwd, 'CMakeCache.txt')
+    if isfile(cachefile):
+        with open(cachefile, 'r') as f:
+            if not 'CMAKE_GENERATOR:INTERNAL=Ninja' in f.read(): # CMake refuses to switch generators for an existing build.
+                rm(cachefile)
+                rm(join(cwd, 'CMakeFiles'), ignore_errors=True)
+    cmake_cmd = 'cmake -G Ninja . {} -DCMAKE_C_COMPILER_LAUNCHER=ccache -DCMAKE_CXX_COMPILER_LAUNCHER=ccache'.format(' '.join(cmake_flags))
+    if subprocess.call(cmake_cmd+' 1>&2', cwd=cwd, **kwargs) != 0:
+        return False
+    if subprocess.call('ninja -j{} 1>&2'.format(cores), cwd=cwd, **kwargs) != 0:
+        return False
+    return subprocess.call('sudo ninja install 1>&2', cwd=cwd, **kwargs) == 0
+
+
+def _default_cores(memory_per_core=2*1024**3):
+    '''Picks a number of cores to compile with, based on the number of cores and the available memory of this machine.
+    Args:
+        memory_per_core (optional int): Memory in bytes to reserve for each compilation job. Compiling Arrow translation units takes up to about 2GB.
+
+    Returns:
+        `int` number of cores, at least 1.'''
+    cores = os.cpu_count() or 1
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            meminfo = {line.split(':')[0]: line.split(':')[1].strip() for line in f if ':' in line}
+        available = int(meminfo['MemAvailable'].split()[0])*1024
+        return max(1, min(cores, available // memory_per_core))
+    except (OSError, KeyError, ValueError):
+        return cores
+
+
+def _library_manifest(build_dir):
+    '''Computes which libraries must be installed on cluster nodes, and where.
+    Returns:
+        `dict(str, tuple(str, str))` mapping installation paths to (library filename, sha256 checksum) tuples.'''
+    manifest = dict()
+    for name in sorted(ls(build_dir)):
+        if name.startswith('libcls'):
+            manifest[join('/usr/lib/rados-classes', name)] = (name, checksum(join(build_dir, name)))
+        elif name.startswith(('libarrow', 'libparquet')):
+            manifest[join('/usr/lib', name)] = (name, checksum(join(build_dir, name)))
+    return manifest
+
+
+def _sync_libraries(build_dir, hosts, silent=False):
+    '''Installs the Arrow and CLS libraries on given hosts. Only libraries which are missing or differ from the installed libraries are sent.
+    Every host reports its installed libraries in 1 round-trip. Then, all libraries needed by at least 1 host are packed in 1 archive, which is broadcast to hosts needing libraries.
+    Returns:
+        `True` on success, `False` on failure.'''
+    manifest = _library_manifest(build_dir)
+    installed = remote_checksums(hosts, manifest.keys())
+    needed = {host: [path for path, (_, sha) in manifest.items() if installed[host].get(path) != sha] for host in hosts}
+    if not silent:
+        for host, paths in needed.items():
+            if any(paths):
+                print('Node {}: {}/{} Arrow libraries missing or outdated.'.format(host, len(paths), len(manifest)))
+            else:
+                print('Node {}: Arrow libraries up-to-date.'.format(host))
+    update_hosts = [host for host, paths in needed.items() if any(paths)]
+    if not any(update_hosts):
+        return True
+
+    paths = sorted(set(path for host in update_hosts for path in needed[host]))
+    names = [manifest[x][0] for x in paths]
+    with tempfile.TemporaryDirectory() as tmpdir: # We pack all required libraries in 1 archive, which is broadcast to all nodes needing libraries.
+        archiveloc = join(tmpdir, 'arrow-libs.tar.gz')
+        if subprocess.call('tar -czhf {} {}'.format(archiveloc, ' '.join(names)), cwd=build_dir, shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) != 0:
+            printe('Could not pack Arrow libraries.')
+            return False
+        if not distribute(archiveloc, update_hosts, '.arrow-libs/arrow-libs.tar.gz', silent=silent):
+            printe('Could not send Arrow libraries to all nodes.')
+            return False
+
+    install_cmds = ['cd ~/.arrow-libs', 'tar -xzf arrow-libs.tar.gz', 'sudo mkdir -p /usr/lib/rados-classes/']
+    install_cmds += ['sudo cp {} {}'.format(' '.join(manifest[x][0] for x in paths if dirname(x) == destdir), destdir) for destdir in sorted(set(dirname(x) for x in paths))]
+    if not execute_all(update_hosts, ' && '.join(install_cmds), silent=silent):
+        printe('Could not copy libraries to destinations on all nodes.')
+        return False
+    if not silent:
+        prints('Installed {} Arrow libraries on {}/{} node(s).'.format(len(paths), len(update_hosts), len(hosts)))
+    return True
+
+
+def _read_build_info(location):
+    '''Reads information about the RADOS-arrow build at given location, as written by `_write_build_info`.
+    Returns:
+        `dict` with keys 'arrow_url', 'flags', 'key'. Empty `dict` if there is no build information.'''
+    try:
+        with open(join(location, '.rados_deploy_build'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def _write_build_info(location, arrow_url, flags, key):
+    with open(join(location, '.rados_deploy_build'), 'w') as f:
+        json.dump({'arrow_url': arrow_url, 'flags': flags, 'key': key}, f)
+
+
 def install_ceph_deploy(location, silent=False):
     '''Install ceph-deploy on the admin node. Warning: Assumes `git` is installed and available.
     Warning: This only has to be executed on 1 node, which will be designated the `ceph admin node`.
@@ -98,7 +207,7 @@ def install_ceph_deploy(location, silent=False):
     return subprocess.call('pip3 install . --user', cwd=location, **kwargs) == 0
 
 
-def install_ceph(hosts_designations_mapping, silent=False):
+def install_ceph(hosts_designations_mapping, silent=False, apt_proxy=None, max_in_flight=None):
     '''Installs required ceph daemons on all nodes. Requires updated package manager.
     Warning: This only has to be executed on 1 node, which will be designated the `ceph admin node`.
     Warning: Expects to find a 'designations' extra-info key, with as value a comma-separated string for each node in the reservation, listing its designations. 
@@ -110,29 +219,37 @@ def install_ceph(hosts_designations_mapping, silent=False):
         hosts_designations_mapping (dict(str, list(str))): Dict with key=hostname and value=list of hostname's `Designations` as strings.
         hosts_user_mapping (dict(str, str)): Dict with key=hostname and val=username for host.
         silent (optional bool): If set, does not print compilation progress, output, etc. Otherwise, all output will be available.
+        apt_proxy (optional str): If set, nodes fetch additional packages through given apt proxy.
+        max_in_flight (optional int): Maximum number of commands running at the same time in each fan-out to the cluster nodes. If `None`, uses the default of `ExecutorPool`.
     
     Returns:
         `True` on success, `False` on failure.'''
+    set_max_in_flight(max_in_flight)
     ceph_deploypath = join(os.path.expanduser('~/'), '.local', 'bin', 'ceph-deploy')
 
     kwargs = {'shell': True, 'stderr': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL}
 
-    if subprocess.call('sudo apt update -y', **kwargs) != 0:
-        return False
-    if subprocess.call('{} install --common localhost'.format(ceph_deploypath), **kwargs) != 0:
+    # ceph-deploy updates package lists itself, and is skipped entirely when all packages are installed already.
+    if subprocess.call(apt_installed_command(['ceph-common']), **kwargs) != 0 and subprocess.call('{} install --common localhost'.format(ceph_deploypath), **kwargs) != 0:
         return False
 
+    hosts_packages = {hostname: ['ceph-common']+[_ceph_packages[x] for x in designations] for hostname, designations in hosts_designations_mapping.items() if any(designations)} # If no designation given for node X, we skip installation of Ceph for X.
+    missing_hosts = apt_missing_hosts(hosts_packages)
+    if not silent and len(missing_hosts) < len(hosts_packages):
+        print('Ceph already installed on {}/{} node(s).'.format(len(hosts_packages)-len(missing_hosts), len(hosts_packages)))
+
     executors = []
-    for hostname, designations in hosts_designations_mapping.items():
-        if not any(designations): # If no designation given for node X, we skip installation of Ceph for X.
-            continue
-        designation_out = '--'+' --'.join([x.lower() for x in set(designations)])
+    for hostname in missing_hosts:
+        designation_out = '--'+' --'.join([x.lower() for x in set(hosts_designations_mapping[hostname])])
         executors.append(Executor('{} --overwrite-conf install --release octopus {} {}'.format(ceph_deploypath, designation_out, hostname), shell=True))
-    Executor.run_all(executors)
-    return Executor.wait_all(executors, print_on_error=True)
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    if not pool.wait_all(print_on_error=True):
+        return False
+    return apt_install_hosts({x: _client_packages for x in hosts_packages}, proxy=apt_proxy, silent=silent)
 
 
-def install_rados(location, hosts_designations_mapping, arrow_url, force_reinstall=False, debug=False, silent=False, cores=16):
+def install_rados(location, hosts_designations_mapping, arrow_url, force_reinstall=False, debug=False, silent=False, cores=None, apt_proxy=None, artifact_dir=None, incremental=False, arrow_sha256=None, max_in_flight=None):
     '''Installs RADOS-arrow, which we need for bridging with Arrow. This function should be executed from the admin node. 
     Warning: This only has to be executed on 1 node, which will be designated the `ceph admin node`.
     Warning: Assumes apt package manager.
@@ -140,63 +257,83 @@ def install_rados(location, hosts_designations_mapping, arrow_url, force_reinsta
         location (str): Location to install RADOS-arrow in. Ceph-deploy root will be`location/ceph-deploy`.
         hosts_designations_mapping (dict(str, list(str))): Dict with key=hostname and value=list of hostname's `Designations` as strings.
         arrow_url (str): Download URL for Arrow library to use with RADOS-Ceph.
-        force_reinstall (optional bool): If set, we always will re-download and install Arrow. Otherwise, we will skip installing if we already have installed Arrow.
+        force_reinstall (optional bool): If set, we always will re-download, compile and install Arrow. Otherwise, we will skip installing if we already have installed Arrow from given `arrow_url`.
+                                         If the installed Arrow originates from a different URL, the source is downloaded again. If its content and build flags match the installed Arrow, we skip installing as well.
+                                         Otherwise, we restore a previous build from the artifact cache when available, and compile only when there is no cached build.
         debug (optional bool): If set, we compile Arrow using debug flags.
         silent (optional bool): If set, does not print compilation progress, output, etc. Otherwise, all output will be available.
-        cores (optional int): Number of cores to use for compiling (default=4). 
+        cores (optional int): Number of cores to use for compiling. If `None`, picks the number of cores of this machine, limited to 1 core per 2GB of available memory.
                               Note: Do not set this to a higher value than the number of available cores, as it would only lead to slowdowns.
                                     If set too high, it may happen that RAM consumption is much too high, leading to kernel panic and termination of critical processes.
+        apt_proxy (optional str): If set, fetches required packages through given apt proxy.
+        artifact_dir (optional str): Directory to cache Arrow builds in, keyed by the sha256 of the source archive and the build flags. Defaults to `~/.rados_deploy/artifacts`.
+        incremental (optional bool): If set, compiles using Ninja and ccache, and keeps the source and build directory between installs.
+                                     Updating the source only overwrites changed files, so only changed translation units are recompiled.
+                                     Builds are never restored from the artifact cache in this mode, but are still stored in it.
+        arrow_sha256 (optional str): If set, verifies that the sha256 hexdigest of the Arrow archive downloaded from `arrow_url` matches given value.
+        max_in_flight (optional int): Maximum number of commands running at the same time in each fan-out to the cluster nodes. If `None`, uses the default of `ExecutorPool`.
     Returns:
         `True` on success, `False` on failure.'''
+    set_max_in_flight(max_in_flight)
     kwargs = {'shell': True}
     if silent:
         kwargs['stderr'] = subprocess.DEVNULL
         kwargs['stdout'] = subprocess.DEVNULL
 
-    if force_reinstall or not (exists('{}/cpp/build/latest'.format(location)) and any(ls('{}/cpp/build/latest'.format(location)))):
-        if subprocess.call('sudo rm -rf {}'.format(location), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) != 0:
-            printe('Could not remove all files at {}'.format(location))
-            return False
+    cmake_flags = _arrow_cmake_flags + (['-DCMAKE_BUILD_TYPE=Debug'] if debug else [])
+    artifact_dir = os.path.expanduser(artifact_dir) if artifact_dir else artifact_default_dir()
+    build_dir = '{}/cpp/build/latest'.format(location)
+    build_info = _read_build_info(location)
+    installed = exists(build_dir) and any(ls(build_dir))
+    if force_reinstall or not installed or (any(build_info) and (build_info['arrow_url'] != arrow_url or build_info['flags'] != cmake_flags)):
         if not silent:
             print('Installing required libraries for RADOS-Ceph.\nPatience...')
-        cmd = 'sudo apt install libradospp-dev rados-objclass-dev openjdk-8-jdk-headless openjdk-11-jdk-headless libboost-all-dev automake bison flex g++ libevent-dev libssl-dev libtool make pkg-config maven cmake thrift-compiler -y'
-        if subprocess.call(cmd, shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) != 0:
-            printe('Failed to install all required libraries. Command used: {}'.format(cmd))
+        packages = _rados_packages+_incremental_packages if incremental else _rados_packages
+        if not apt_install(packages, proxy=apt_proxy, silent=True):
+            printe('Failed to install all required libraries: {}'.format(' '.join(packages)))
             return False
+        if not cores:
+            cores = _default_cores()
+            if not silent:
+                print('Compiling with {} cores.'.format(cores))
         if not silent:
             prints('Installed required libraries.')
-        if (not isdir(location)) and not _get_rados_dev(location, arrow_url, silent=silent, retries=5):
-            return False
-        cmake_cmd = 'cmake . -DARROW_PARQUET=ON -DARROW_DATASET=ON -DARROW_JNI=ON -DARROW_ORC=ON -DARROW_CSV=ON -DARROW_CLS=ON'
-        if debug:
-            cmake_cmd += ' -DCMAKE_BUILD_TYPE=Debug'
-        if subprocess.call(cmake_cmd+' 1>&2', cwd='{}/cpp'.format(location), **kwargs) != 0:
-            return False
-        if subprocess.call('sudo make install -j{} 1>&2'.format(cores), cwd='{}/cpp'.format(location), **kwargs) != 0:
-            return False
+        with tempfile.TemporaryDirectory() as tmpdir: # We use a tempfile to store the downloaded archive.
+            archiveloc = join(tmpdir, 'rados-arrow.zip')
+            if not _download_rados_dev(arrow_url, archiveloc, sha256=arrow_sha256, silent=silent, retries=5):
+                return False
+            key = artifact_key(archiveloc, cmake_flags)
+            if installed and not force_reinstall and build_info.get('key') == key:
+                if not silent:
+                    print('RADOS-arrow source and build flags did not change. Skipping compilation.')
+            elif incremental:
+                if not _update_rados_dev(archiveloc, location):
+                    return False
+                if not _build_rados_dev_incremental(location, cmake_flags, cores, kwargs):
+                    return False
+                if not artifact_store(artifact_dir, key, build_dir, '{}/cpp/install_manifest.txt'.format(location), silent=silent):
+                    printw('Could not store RADOS-arrow build in artifact cache.')
+            else:
+                if subprocess.call('sudo rm -rf {}'.format(location), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) != 0:
+                    printe('Could not remove all files at {}'.format(location))
+                    return False
+                if (not force_reinstall) and artifact_restore(artifact_dir, key, build_dir, silent=silent):
+                    if not silent:
+                        prints('Restored RADOS-arrow build from artifact cache ({}).'.format(key))
+                else:
+                    if not _extract_rados_dev(archiveloc, location):
+                        return False
+                    if subprocess.call('cmake . {} 1>&2'.format(' '.join(cmake_flags)), cwd='{}/cpp'.format(location), **kwargs) != 0:
+                        return False
+                    if subprocess.call('sudo make install -j{} 1>&2'.format(cores), cwd='{}/cpp'.format(location), **kwargs) != 0:
+                        return False
+                    if not artifact_store(artifact_dir, key, build_dir, '{}/cpp/install_manifest.txt'.format(location), silent=silent):
+                        printw('Could not store RADOS-arrow build in artifact cache. Next installation will compile again.')
+            _write_build_info(location, arrow_url, cmake_flags, key)
 
     hosts = [key for key, value in hosts_designations_mapping.items() if any(value)] # Only nodes joining the ceph cluster will receive the libraries
 
-    executors = [Executor('ssh {} "mkdir -p ~/.arrow-libs/ && sudo mkdir -p /usr/lib/rados-classes/"'.format(x), shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL) for x in hosts]
-    Executor.run_all(executors)
-    if not Executor.wait_all(executors, print_on_error=True):
-        printe('Could not create required directories on all nodes.')
-        return False
-    executors = [Executor('scp {}/cpp/build/latest/libcls* {}:~/.arrow-libs/'.format(location, x), **kwargs) for x in hosts]
-    executors += [Executor('scp {}/cpp/build/latest/libarrow* {}:~/.arrow-libs/'.format(location, x), **kwargs) for x in hosts]
-    executors += [Executor('scp {}/cpp/build/latest/libparquet* {}:~/.arrow-libs/'.format(location, x), **kwargs) for x in hosts]
-    Executor.run_all(executors)
-    if not Executor.wait_all(executors, print_on_error=True):
-        printe('Could not scp Arrow libraries to all nodes.')
-        return False
-
-    executors = [Executor('ssh {} "sudo cp ~/.arrow-libs/libcls* /usr/lib/rados-classes/"'.format(x), **kwargs) for x in hosts]
-    executors += [Executor('ssh {} "sudo cp ~/.arrow-libs/libarrow* /usr/lib/"'.format(x), **kwargs) for x in hosts]
-    executors += [Executor('ssh {} "sudo cp ~/.arrow-libs/libparquet* /usr/lib/"'.format(x), **kwargs) for x in hosts]
-    
-    Executor.run_all(executors)
-    if not Executor.wait_all(executors, print_on_error=True):
-        printe('Could not copy libraries to destinations on all nodes.')
+    if not _sync_libraries(build_dir, hosts, silent=silent):
         return False
 
     env = Environment()
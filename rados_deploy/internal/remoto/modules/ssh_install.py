@@ -76,4 +76,38 @@ Host {0}
         f.write(keypair[1])
     os.chmod('{}/.ssh/rados_deploy.rsa'.format(home), 0o600)
 
+    return subprocess.call('sudo cp {}/.ssh/config /root/.ssh/'.format(home), shell=True) == 0 if use_sudo else True
+
+
+def install_ssh_multiplexing(hosts, use_sudo=True):
+    '''Enables connection multiplexing for given hosts in the SSH config of this node, so the many `ssh`/`scp` calls between cluster nodes reuse one authenticated connection per host.
+    Independent of `install_ssh_keys`, so nodes with already installed keys get multiplexing as well. Hosts which already have multiplexing enabled are skipped.
+    Warning: This has to be executed on each node node.
+    Args:
+        hosts (list(str)): List of hostnames forming the cluster.
+        use_sudo (optional bool): If set, also installs the SSH config for the root user.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    home = os.path.expanduser('~/')
+    marker = '# rados-deploy multiplexing: '
+
+    mkdir('{}/.ssh'.format(home), exist_ok=True)
+    if isfile('{}/.ssh/config'.format(home)):
+        with open('{}/.ssh/config'.format(home)) as f:
+            hosts_multiplexed = [line[len(marker):].strip().lower() for line in f.readlines() if line.startswith(marker)]
+    else:
+        hosts_multiplexed = []
+
+    config = ''.join('''
+{0}{1}
+Host {1}
+    ControlMaster auto
+    ControlPath ~/.ssh/rados-deploy-%C
+    ControlPersist 600
+'''.format(marker, x) for x in sorted(hosts) if not x.lower() in hosts_multiplexed)
+    if not config:
+        return True
+    with open('{}/.ssh/config'.format(home), 'a') as f:
+        f.write(config)
     return subprocess.call('sudo cp {}/.ssh/config /root/.ssh/'.format(home), shell=True) == 0 if use_sudo else True
\ No newline at end of file
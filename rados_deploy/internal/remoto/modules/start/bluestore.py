@@ -1,5 +1,17 @@
 import subprocess
-import concurrent.futures
+
+
+def config_rules(osd_op_threads, osd_pool_size, osd_max_obj_size, use_client_cache):
+    '''Returns the ceph.conf rules we set, as a `dict` mapping option names to values. See `update_config` for arguments.'''
+    rules = {
+        'fuse disable pagecache': 'false' if use_client_cache else 'true',
+        'mon allow pool delete': 'true',
+        'osd class load list': '*',
+        'osd op threads': str(osd_op_threads),
+        'osd pool default size': str(osd_pool_size),
+        'osd_max_object_size': str(osd_max_obj_size),
+    }
+    return rules
 
 
 def update_config(nodes, ceph_deploypath, osd_op_threads, osd_pool_size, osd_max_obj_size, use_client_cache, silent):
@@ -18,14 +30,7 @@ def update_config(nodes, ceph_deploypath, osd_op_threads, osd_pool_size, osd_max
         `True` on success, `False` on failure.'''
     path = join(os.path.expanduser('~/'), 'ceph.conf')
 
-    rules = {
-        'fuse disable pagecache': 'false' if use_client_cache else 'true',
-        'mon allow pool delete': 'true',
-        'osd class load list': '*',
-        'osd op threads': str(osd_op_threads),
-        'osd pool default size': str(osd_pool_size),
-        'osd_max_object_size': str(osd_max_obj_size),
-    }
+    rules = config_rules(osd_op_threads, osd_pool_size, osd_max_obj_size, use_client_cache)
 
     import configparser
     parser = configparser.ConfigParser()
@@ -65,8 +70,9 @@ def update_config(nodes, ceph_deploypath, osd_op_threads, osd_pool_size, osd_max
 def copy_osd_keys(osds, silent):
     '''Copies osd keyrings from admin homedir to each OSD homedir.''' 
     executors = [Executor('scp ~/ceph.bootstrap-osd.keyring {}:~/'.format(x.hostname), **get_subprocess_kwargs(silent)) for x in osds]
-    Executor.run_all(executors)
-    return Executor.wait_all(executors, print_on_error=True)
+    pool = ExecutorPool()
+    pool.run_all(executors)
+    return pool.wait_all(print_on_error=True)
 
 
 def install_osd_key(connection, silent):
@@ -106,7 +112,7 @@ def _merge_kwargs(x, y):
     return z
 
 
-def start_rados_bluestore(reservation_str, mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, silent, retries):
+def start_rados_bluestore(reservation_str, mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, silent, retries, reconcile=False, max_in_flight=None):
     '''Starts a Ceph cluster with RADOS-Arrow support.
     Args:
         reservation_str (str): String representation of a `metareserve.reservation.Reservation`. 
@@ -121,9 +127,13 @@ def start_rados_bluestore(reservation_str, mountpoint_path, osd_op_threads, osd_
         use_client_cache (bool): Toggles using cephFS I/O cache.
         silent (bool): If set, prints are less verbose.
         retries (int): Number of retries for potentially failing operations.
+        reconcile (optional bool): If set, and a cluster with the same daemons is already running, only applies config changes and (re)mounts CephFS where needed.
+                                   Otherwise, or when this fails, (re)builds the cluster from scratch.
+        max_in_flight (optional int): Maximum number of commands running at the same time in each fan-out to the cluster nodes. If `None`, uses the default of `ExecutorPool`.
 
     Returns:
         `True` on success, `False` on failure.'''
+    set_max_in_flight(max_in_flight)
     reservation = Reservation.from_string(reservation_str)
 
     ceph_nodes = [x for x in reservation.nodes if 'designations' in x.extra_info and any(x.extra_info['designations'])]
@@ -158,114 +168,98 @@ def start_rados_bluestore(reservation_str, mountpoint_path, osd_op_threads, osd_
         printe('Could not find private key for internal cluster comms at "{}". Run the "install" command of this program.'.format(keyfile))
         return False
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(reservation)) as executor:
-        ssh_kwargs = {'IdentitiesOnly': 'yes', 'StrictHostKeyChecking': 'no', 'IdentityFile': keyfile}
+    ssh_kwargs = {'IdentitiesOnly': 'yes', 'StrictHostKeyChecking': 'no', 'IdentityFile': keyfile}
+
+    connectionwrappers = get_wrappers(reservation.nodes, lambda node: node.ip_public, ssh_params=lambda node: _merge_kwargs(ssh_kwargs, {'User': node.extra_info['user']}), silent=silent)
 
-        connectionwrappers = get_wrappers(reservation.nodes, lambda node: node.ip_public, ssh_params=lambda node: _merge_kwargs(ssh_kwargs, {'User': node.extra_info['user']}), silent=silent)
+    if any(True for x in connectionwrappers.values() if not x):
+        printe('Could not connect to some nodes.')
+        close_wrappers(connectionwrappers)
+        return False
 
-        if any(True for x in connectionwrappers.values() if not x):
-            printe('Could not connect to some nodes.')
+    if reconcile:
+        if not silent:
+            print('Reconciling running cluster...')
+        with trace_span('reconcile'):
+            reconciled = reconcile_rados(reservation, connectionwrappers, ceph_deploypath, monitors, managers, mdss, osds, StorageType.BLUESTORE, config_rules(osd_op_threads, osd_pool_size, osd_max_obj_size, use_client_cache), lambda: update_config(ceph_nodes, ceph_deploypath, osd_op_threads, osd_pool_size, osd_max_obj_size, use_client_cache, silent), mountpoint_path, placement_groups, use_client_cache, retries, silent)
+        if reconciled:
             close_wrappers(connectionwrappers)
-            return False
+            if not silent:
+                prints('Ceph cluster ready!')
+            return True
+        printw('Could not reconcile running cluster. Rebuilding cluster from scratch...')
 
-        # Begin starting procedure
+    # Begin starting procedure. Every step starts as soon as all steps it depends on are finished.
+    graph = TaskGraph()
+
+    def _start_monitors():
         if not silent:
             print('Starting monitors...')
-        if not (create_monitors(monitors, ceph_deploypath, silent) and start_monitors(ceph_deploypath, silent) and send_config_with_keys(set(monitors).union(set(managers)), ceph_deploypath, silent)):
-            close_wrappers(connectionwrappers)
+        if not (create_monitors(monitors, ceph_deploypath, silent) and start_monitors(ceph_deploypath, silent) and wait_for([quorum_condition(monitors)], silent=silent) and send_config_with_keys(set(monitors).union(set(managers)), ceph_deploypath, silent)):
             return False
         if not silent:
             prints('Started monitors')
-            print('Stopping managers...')
-
-        # Managers are halted and recreated to ensure no side-effects occur when calling this function multiple times.
-        futures_stop_managers = [executor.submit(stop_manager, x, connectionwrappers[x].connection, silent) for x in managers]
-        for x in futures_stop_managers:
-            x.result()
-
+        return True
+    graph.add('monitors', _start_monitors)
+
+    # Managers, MDSs and mountpoints are halted and recreated to ensure no side-effects occur when calling this function multiple times.
+    for x in managers:
+        graph.add('stop_manager[{}]'.format(x.hostname), stop_manager, args=(x, connectionwrappers[x].connection, silent), required=False)
+    for x in mdss:
+        graph.add('stop_mds[{}]'.format(x.hostname), stop_mds, args=(x, connectionwrappers[x].connection, silent), required=False)
+    for x in reservation.nodes:
+        graph.add('stop_cephfs[{}]'.format(x.hostname), stop_cephfs, args=(connectionwrappers[x].connection, mountpoint_path, silent), required=False)
+        graph.add('install_cephfs_client[{}]'.format(x.hostname), install_cephfs_client, args=(connectionwrappers[x].connection, silent))
+
+    def _start_managers():
         if not silent:
-            prints('Stopped managers')
             print('Starting managers...')
         if not start_managers(managers, ceph_deploypath, silent):
-            close_wrappers(connectionwrappers)
             return False
         if not silent:
             prints('Started managers')
-            print('Editing configs...')
-        if not (update_config(ceph_nodes, ceph_deploypath, osd_op_threads, osd_pool_size, osd_max_obj_size, use_client_cache, silent) and restart_monitors(monitors, silent)):
-            return False
-        if not silent:
-            prints('Edited configs')
-            print('Deploying OSD keys...')
-        if not copy_osd_keys(osds, silent):
-            close_wrappers(connectionwrappers)
-            return False
+        return True
+    graph.add('managers', _start_managers, after=['monitors']+['stop_manager[{}]'.format(x.hostname) for x in managers])
 
-        futures_install_osd_keys = [executor.submit(install_osd_key, connectionwrappers[x].connection, silent) for x in osds]
-        if not all(x.result() for x in futures_install_osd_keys):
-            close_wrappers(connectionwrappers)
-            return False
-
-        if not silent:
-            prints('Deployed OSD keys')
-            print('Stopping old OSDs...')
-        
-        futures_stop_cephfs = [executor.submit(stop_cephfs, connectionwrappers[x].connection, mountpoint_path, silent) for x in reservation.nodes]
-        for x in futures_stop_cephfs:
-            x.result()
-
-        destroy_pools(silent) # Must destroy old pools
-        stop_osds_bluestore(osds, silent) # OSDs are halted to ensure no side-effects occur when calling this function multiple times.
-        if not silent:
-            prints('Stopped old OSDs')
-            print('Booting OSDs...')
-
-        futures_start_osds = []
-        for x in osds:
-            num_osds = len([1 for y in x.extra_info['designations'].split(',') if y == Designation.OSD.name.lower()])
-            futures_start_osds.append(executor.submit(start_osd_bluestore, ceph_deploypath, x, num_osds, silent))
-        if not all(x.result() for x in futures_start_osds):
-            close_wrappers(connectionwrappers)
-            return False
-
-        if not silent:
-            prints('Booted OSDs')
-            print('Stopping old MDSs...')
-        
-        futures_stop_mdss = [executor.submit(stop_mds, x, connectionwrappers[x].connection, silent) for x in mdss]
-        for x in futures_stop_mdss:
-            x.result()
-
-        if not silent:
-            prints('Stopped old MDSs')
-            print('Starting mdss...')
-        if not start_mdss(mdss, ceph_deploypath, silent):
-            close_wrappers(connectionwrappers)
-            return False
+    def _update_config():
         if not silent:
-            prints('Started MDSs')
-            print('Starting CephFS...')
-        if not create_pools(placement_groups, silent):
-            close_wrappers(connectionwrappers)
-            return False
-
-        futures_stop_cephfs = [executor.submit(stop_cephfs, connectionwrappers[x].connection, mountpoint_path, silent) for x in reservation.nodes]
-        for x in futures_stop_cephfs:
-            x.result()
-
-        futures_start_cephfs = [executor.submit(start_cephfs, x, connectionwrappers[x].connection, ceph_deploypath, path=mountpoint_path, use_client_cache=use_client_cache, retries=retries, silent=silent) for x in reservation.nodes]    
-        if not all(x.result() for x in futures_start_cephfs):
-            printe('Not all nodes could setup mountpoints.')
-            close_wrappers(connectionwrappers)
-            return False
-
-        futures_chown_files = [executor.submit(chown_key_conf, connectionwrapper.connection, node.extra_info['user']) for node, connectionwrapper in connectionwrappers.items()]
-        if not all(x.result() for x in futures_chown_files):
-            printe('Could not chown ceph.conf and client keyring on every node')
-            close_wrappers(connectionwrappers)
+            print('Editing configs...')
+        if not (update_config(ceph_nodes, ceph_deploypath, osd_op_threads, osd_pool_size, osd_max_obj_size, use_client_cache, silent) and restart_monitors(monitors, silent) and wait_for([quorum_condition(monitors)], silent=silent)):
             return False
-
         if not silent:
-            prints('Ceph cluster ready!')
-        close_wrappers(connectionwrappers)
-        return True
\ No newline at end of file
+            prints('Edited configs')
+        return True
+    graph.add('config', _update_config, after=['managers']) # 'ceph-deploy mgr create' pushes configs as well, so we wait for it.
+
+    graph.add('copy_osd_keys', copy_osd_keys, args=(osds, silent), after=['monitors'])
+    for x in osds:
+        graph.add('install_osd_key[{}]'.format(x.hostname), install_osd_key, args=(connectionwrappers[x].connection, silent), after=['copy_osd_keys'])
+
+    # Old pools must be destroyed after CephFS is unmounted everywhere, and before old OSDs are removed.
+    graph.add('destroy_pools', destroy_pools, args=(silent,), after=['monitors']+['stop_cephfs[{}]'.format(x.hostname) for x in reservation.nodes], required=False)
+    graph.add('stop_osds', stop_osds_bluestore, args=(osds, silent), after=['destroy_pools'], required=False) # OSDs are halted to ensure no side-effects occur when calling this function multiple times.
+    for x in osds:
+        num_osds = len([1 for y in x.extra_info['designations'].split(',') if y == Designation.OSD.name.lower()])
+        graph.add('start_osd[{}]'.format(x.hostname), start_osd_bluestore, args=(x, connectionwrappers[x].connection, num_osds, silent), after=['stop_osds', 'config', 'install_osd_key[{}]'.format(x.hostname)])
+
+    graph.add('mdss', start_mdss, args=(mdss, ceph_deploypath, silent), after=['config', 'destroy_pools']+['stop_mds[{}]'.format(x.hostname) for x in mdss])
+    # Each phase waits until the cluster is ready for it, instead of assuming it is.
+    graph.add('osds_ready', wait_for, args=([osds_condition(counted_total_osds)],), kwargs={'silent': silent}, after=['start_osd[{}]'.format(x.hostname) for x in osds])
+    graph.add('pools', create_pools, args=(placement_groups, silent), after=['osds_ready'])
+    # Waits until the pgmap includes the new pools. Only the data pool has a fixed number of placement groups, as the autoscaler may change the metadata pool.
+    graph.add('pgs_ready', wait_for, args=([pgs_condition(placement_groups+1)],), kwargs={'silent': silent}, after=['pools'])
+    graph.add('mds_ready', wait_for, args=([mds_condition()],), kwargs={'silent': silent}, after=['pools', 'mdss'])
+
+    for x in reservation.nodes:
+        graph.add('start_cephfs[{}]'.format(x.hostname), start_cephfs, args=(x, connectionwrappers[x].connection, ceph_deploypath), kwargs={'path': mountpoint_path, 'use_client_cache': use_client_cache, 'retries': retries, 'silent': silent},
+            after=['pgs_ready', 'mds_ready', 'config', 'stop_cephfs[{}]'.format(x.hostname), 'install_cephfs_client[{}]'.format(x.hostname)])
+        graph.add('chown_key_conf[{}]'.format(x.hostname), chown_key_conf, args=(connectionwrappers[x].connection, x.extra_info['user']), after=['start_cephfs[{}]'.format(x.hostname)])
+
+    state_ok = graph.run()
+    close_wrappers(connectionwrappers)
+    if not state_ok:
+        printe('Could not start Ceph cluster.')
+        return False
+    if not silent:
+        prints('Ceph cluster ready!')
+    return True
\ No newline at end of file
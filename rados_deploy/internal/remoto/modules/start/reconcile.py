@@ -0,0 +1,93 @@
+import concurrent.futures
+import subprocess
+
+
+'''Brings a running cluster to the requested state by applying only the differences, instead of rebuilding it.
+Requires:
+    cephfs, health, manager, mds, monitor, osd, state (rados)
+    shared (start)'''
+
+_rebuild_rules = ['osd objectstore', 'memstore device bytes'] # Changing these options requires recreating all OSDs.
+_pool_rules = ['osd pool default size'] # Changing these options only requires changing existing pools.
+_client_rules = ['fuse disable pagecache', 'fuse_disable_pagecache'] # Changing these options only requires remounting CephFS.
+
+
+def _reconcile_mount(node, connection, ceph_deploypath, mountpoint_path, use_client_cache, retries, remount, silent):
+    '''Ensures CephFS is mounted on a (!)single(!) node, and that the node user owns the config and client keyring.'''
+    if remount or not is_mounted(connection, mountpoint_path):
+        if not silent:
+            print('[{}] Mounting CephFS...'.format(node.hostname))
+        stop_cephfs(connection, mountpoint_path, silent)
+        if not (install_cephfs_client(connection, silent) and start_cephfs(node, connection, ceph_deploypath, path=mountpoint_path, use_client_cache=use_client_cache, retries=retries, silent=silent)):
+            return False
+    return chown_key_conf(connection, node.extra_info['user'])
+
+
+def reconcile_rados(reservation, connectionwrappers, ceph_deploypath, monitors, managers, mdss, osds, storage_type, rules, update_config_func, mountpoint_path, placement_groups, use_client_cache, retries, silent):
+    '''Compares the running cluster with the requested cluster. If both have the same daemons, pushes only the changed config rules and restarts only the affected daemons.
+    Args:
+        reservation (metareserve.Reservation): Reservation containing all cluster nodes.
+        connectionwrappers (dict(metareserve.Node, RemotoSSHWrapper)): Connections to all nodes.
+        ceph_deploypath (str): Path to `ceph-deploy` executable.
+        monitors, managers, mdss, osds (list(metareserve.Node)): Nodes with the respective designations.
+        storage_type (rados_deploy.StorageType): Storage type of the requested cluster.
+        rules (dict): Requested ceph.conf rules.
+        update_config_func (callable): Function writing and distributing the requested config. Takes no arguments, returns `True` on success, `False` on failure.
+        mountpoint_path (str): Path to mount CephFS to on all nodes.
+        placement_groups (int): Requested amount of placement groups.
+        use_client_cache (bool): Toggles using CephFS I/O cache.
+        retries (int): Number of retries for potentially failing operations.
+        silent (bool): If set, prints less output.
+
+    Returns:
+        `True` if the running cluster now matches the requested cluster, `False` if the cluster must be rebuilt from scratch.'''
+    state = get_cluster_state(silent)
+    if not state:
+        return False
+
+    osd_counts = {x: len([1 for y in x.extra_info['designations'].split(',') if y == Designation.OSD.name.lower()]) for x in osds}
+    if not cluster_matches(state, monitors, managers, mdss, osd_counts, silent):
+        return False
+
+    delta = config_delta(join(os.path.expanduser('~/'), 'ceph.conf'), rules, storage_type)
+    if delta == None:
+        if not silent:
+            printw('Running cluster has no config for "{}".'.format(storage_type.name.lower()))
+        return False
+    if any(x in delta for x in _rebuild_rules):
+        if not silent:
+            printw('Changed rules require recreating all OSDs: {}'.format(', '.join(x for x in delta if x in _rebuild_rules)))
+        return False
+
+    if any(delta):
+        if not silent:
+            print('Applying changed rules: {}'.format(', '.join('{}={}'.format(k, v) for k, v in delta.items())))
+        if not (update_config_func() and restart_monitors(monitors, silent) and wait_for([quorum_condition(monitors)], silent=silent)):
+            return False
+        if any(x.startswith('osd') for x in delta if not x in _pool_rules) and not (restart_osds(osds, silent) and wait_for([osds_condition(sum(osd_counts.values()))], silent=silent)):
+            return False
+        for key in _pool_rules:
+            if key in delta:
+                for pool in ['cephfs_data', 'cephfs_metadata']:
+                    if subprocess.call('sudo ceph osd pool set {} size {}'.format(pool, delta[key]), **get_subprocess_kwargs(silent)) != 0:
+                        return False
+    elif not silent:
+        print('Config is up to date.')
+
+    pgs_changed = get_pool_pg_num('cephfs_data', silent) != placement_groups
+    if pgs_changed:
+        if not silent:
+            print('Setting placement groups to {}'.format(placement_groups))
+        if subprocess.call('sudo ceph osd pool set cephfs_data pg_num {}'.format(placement_groups), **get_subprocess_kwargs(silent)) != 0:
+            return False
+
+    if not wait_for([pgs_condition(placement_groups+1, clean=pgs_changed), mds_condition()], silent=silent): # After changing pg_num, waits until data is moved to the new placement groups.
+        return False
+
+    remount = any(x in delta for x in _client_rules)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(reservation)) as executor:
+        futures_mount = [executor.submit(_reconcile_mount, x, connectionwrappers[x].connection, ceph_deploypath, mountpoint_path, use_client_cache, retries, remount, silent) for x in reservation.nodes]
+        if not all(x.result() for x in futures_mount):
+            printe('Not all nodes could setup mountpoints.')
+            return False
+    return True
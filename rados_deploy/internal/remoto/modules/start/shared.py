@@ -9,4 +9,25 @@ def determine_config_type(config_parser):
     if 'memstore device bytes' in config_parser['global']:
         return StorageType.MEMSTORE
     else:
-        return StorageType.BLUESTORE
\ No newline at end of file
+        return StorageType.BLUESTORE
+
+
+def config_delta(path, rules, storage_type):
+    '''Compares an existing ceph.conf with given rules.
+    Args:
+        path (str): Path to ceph.conf.
+        rules (dict): Rules the config must contain, mapping option names to values.
+        storage_type (rados_deploy.StorageType): Storage type the config must be for.
+
+    Returns:
+        `dict` mapping every option with a missing or different value to its new value. `None` if there is no config for given storage type at given path.'''
+    if not isfile(path):
+        return None
+
+    import configparser
+    parser = configparser.ConfigParser()
+    parser.optionxform=str
+    parser.read(path)
+    if not 'global' in parser or determine_config_type(parser) != storage_type:
+        return None
+    return {key: val for key, val in rules.items() if parser['global'].get(key) != val}
\ No newline at end of file
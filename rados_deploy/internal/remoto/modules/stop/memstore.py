@@ -17,7 +17,7 @@ def _merge_kwargs(x, y):
     return z
 
 
-def stop_rados_memstore(reservation_str, mountpoint_path, silent):
+def stop_rados_memstore(reservation_str, mountpoint_path, silent, max_in_flight=None):
     '''Stops a Ceph cluster.
     Args:
         reservation_str (str): String representation of a `metareserve.reservation.Reservation`. 
@@ -26,9 +26,11 @@ def stop_rados_memstore(reservation_str, mountpoint_path, silent):
                                The specified daemons will be halted.
         mountpoint_path (str): Path to mount CephFS to on ALL nodes.
         silent (bool): If set, prints are less verbose.
+        max_in_flight (optional int): Maximum number of commands running at the same time in each fan-out to the cluster nodes. If `None`, uses the default of `ExecutorPool`.
 
     Returns:
         `True` on success, `False` otherwise.'''
+    set_max_in_flight(max_in_flight)
     reservation = Reservation.from_string(reservation_str)
 
     ceph_nodes = [x for x in reservation.nodes if 'designations' in x.extra_info and any(x.extra_info['designations'])]
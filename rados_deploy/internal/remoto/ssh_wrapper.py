@@ -1,5 +1,7 @@
 import concurrent.futures
+import os
 import tempfile
+import threading
 import uuid
 
 from rados_deploy.thirdparty.sshconf import *
@@ -10,12 +12,22 @@ import remoto
 from rados_deploy.internal.util.printer import *
 
 
+_control_persist = '600' # Seconds an idle ssh master connection stays alive after its last client disconnects.
+
+_pool = dict() # Maps (hostname, frozen ssh_params) to shared, open `RemotoSSHWrapper`.
+_pool_lock = threading.Lock()
+
+
 class RemotoSSHWrapper(object):
-    '''Simple wrapper containing a remoto connection and the file it is using as ssh config.'''
-    def __init__(self, connection, ssh_config=None):
+    '''Simple wrapper containing a remoto connection and the file it is using as ssh config.
+    Wrappers obtained through `get_wrapper` are shared between callers asking for the same host with the same ssh parameters. Each `exit()` releases one reference.
+    The connection closes once the last reference is released.'''
+    def __init__(self, connection, ssh_config=None, pool_key=None):
         self._connection = connection
         self._ssh_config = ssh_config
         self._open = True
+        self._pool_key = pool_key
+        self._references = 1
 
     def __enter__(self):
         return self
@@ -44,6 +56,13 @@ class RemotoSSHWrapper(object):
 
 
     def exit(self):
+        if self._pool_key != None:
+            with _pool_lock:
+                self._references -= 1
+                if self._references > 0:
+                    return
+                if _pool.get(self._pool_key) is self:
+                    del _pool[self._pool_key]
         if self._connection:
             self._connection.exit()
         if self._ssh_config:
@@ -51,8 +70,17 @@ class RemotoSSHWrapper(object):
         self._open = False
 
 
+def _control_path():
+    '''Returns the ssh `ControlPath` to use for multiplexed connections. Creates the (user-private) directory holding the control sockets if needed.'''
+    control_dir = os.path.join(tempfile.gettempdir(), 'rados-deploy-ssh-{}'.format(os.getuid()))
+    os.makedirs(control_dir, mode=0o700, exist_ok=True)
+    return os.path.join(control_dir, '%C') # %C is a hash of local host, remote host, port and user, which keeps socket paths short.
+
+
 def _build_ssh_config(hostname, ssh_params):
     '''Writes a temporary ssh config with provided parameters.
+    Connection multiplexing (`ControlMaster`, `ControlPath`, `ControlPersist`) is enabled, unless given `ssh_params` set these options themselves.
+    This way, every ssh-based program using the config (remoto, ssh, scp, rsync) shares one authenticated connection per host.
     Warning: Returned value must be closed properly.
     Args:
         hostname (str): Hostname to register.
@@ -64,6 +92,10 @@ def _build_ssh_config(hostname, ssh_params):
         ssh_params = ssh_params(node)
     if not isinstance(ssh_params, dict):
         raise ValueError('ssh_params must be a dict, mapping ssh options to values. E.g: {{"IdentityFile": "/some/key.rsa", "IdentitiesOnly": "yes", "Port": 22}}')
+    ssh_params = dict(ssh_params)
+    ssh_params.setdefault('ControlMaster', 'auto')
+    ssh_params.setdefault('ControlPath', _control_path())
+    ssh_params.setdefault('ControlPersist', _control_persist)
     conf = empty_ssh_config_file()
     conf.add(hostname, **ssh_params)
     tmpfile = tempfile.NamedTemporaryFile()
@@ -98,7 +130,7 @@ def _build_conn(hostname, loggername, silent, ssh_configpath=None):
 
 
 def get_wrapper(node, hostname, ssh_params=None, loggername=None, silent=False):
-    '''Gets a connection wrapper.
+    '''Gets a connection wrapper. If an open wrapper for the same hostname, user and key exists, that wrapper is shared instead of opening a new connection.
     Warning: The `RemotoSSHWrapper` objects created here must be properly closed. A "with" clause is supported to close all wrappers on function exit.
     Args:
         node (metareserve.Node): Node to build connection for.
@@ -121,9 +153,31 @@ def get_wrapper(node, hostname, ssh_params=None, loggername=None, silent=False):
     if callable(ssh_params):
         ssh_params = ssh_params(node)
 
+    pool_key = (hostname, tuple(sorted((str(k), str(v)) for k, v in ssh_params.items())) if isinstance(ssh_params, dict) else None) # Callers with different ssh options get different connections.
+    with _pool_lock:
+        wrapper = _pool.get(pool_key)
+        if wrapper != None and wrapper.open:
+            wrapper._references += 1
+            return wrapper
+
     ssh_config = _build_ssh_config(hostname, ssh_params) if ssh_params else None
     conn = _build_conn(hostname, loggername, silent, ssh_configpath=ssh_config.name if ssh_config else None)
-    return RemotoSSHWrapper(conn, ssh_config=ssh_config)
+    if conn == None:
+        return RemotoSSHWrapper(conn, ssh_config=ssh_config)
+
+    wrapper = RemotoSSHWrapper(conn, ssh_config=ssh_config, pool_key=pool_key)
+    with _pool_lock:
+        existing = _pool.get(pool_key)
+        if existing != None and existing.open: # Another thread opened a connection for the same key in the meantime.
+            existing._references += 1
+        else:
+            _pool[pool_key] = wrapper
+            existing = None
+    if existing != None:
+        wrapper._pool_key = None
+        wrapper.exit()
+        return existing
+    return wrapper
 
 
 def get_wrappers(nodes, hostnames, ssh_params=None, loggername=None, parallel=True, silent=False):
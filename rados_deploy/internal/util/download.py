@@ -0,0 +1,185 @@
+import concurrent.futures
+import hashlib
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from rados_deploy.internal.util.fs import unpack
+from rados_deploy.internal.util.printer import *
+
+
+'''Utility functions to download (large) files over unreliable connections.
+Downloads are streamed to disk in chunks. When a connection breaks, we resume from the last received byte using HTTP range requests, instead of starting over.
+When the server supports range requests and reports the file size, the file can be fetched using multiple parallel range segments.
+Servers without range support are handled as well: Then, a broken download restarts from the beginning.'''
+
+_download_chunk = 1024*1024 # Number of bytes to read from a connection at once.
+
+
+def _download_backoff(attempt):
+    '''Returns the number of seconds to wait before given retry attempt.'''
+    return min(0.5*(2**attempt), 10)
+
+
+def _download_probe(url, timeout):
+    '''Finds out the size of the file at given url, and whether the server supports range requests, using a HEAD request.
+    Returns:
+        `(size, ranges)`: `size` is the number of bytes, or `None` if unknown. `ranges` is `True` if the server supports range requests.'''
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method='HEAD'), timeout=timeout) as response:
+            length = response.headers.get('Content-Length')
+            return (int(length) if length and length.isdigit() else None), response.headers.get('Accept-Ranges', '').strip().lower() == 'bytes'
+    except urllib.error.HTTPError as e:
+        if e.code in (405, 501): # Server does not support HEAD requests. We find out when downloading.
+            return None, False
+        raise
+
+
+def _download_range(url, path, start, end, retries, timeout):
+    '''Downloads bytes `[start, end]` (inclusive) of the file at given url into the same position of the file at given path.
+    When the connection breaks, continues from the last received byte.
+    Returns:
+        `None` on success, the last encountered exception on failure.'''
+    position = start
+    error = None
+    for attempt in range(retries):
+        if attempt > 0:
+            time.sleep(_download_backoff(attempt))
+        try:
+            request = urllib.request.Request(url, headers={'Range': 'bytes={}-{}'.format(position, end)})
+            with urllib.request.urlopen(request, timeout=timeout) as response, open(path, 'r+b') as f:
+                if response.status != 206:
+                    raise IOError('Server ignored range request (status {})'.format(response.status))
+                f.seek(position)
+                while position <= end:
+                    data = response.read(min(_download_chunk, end-position+1))
+                    if not data:
+                        break
+                    f.write(data)
+                    position += len(data)
+            if position > end:
+                return None
+            error = IOError('Connection closed after {}/{} bytes'.format(position-start, end-start+1))
+        except OSError as e: # Includes urllib errors.
+            error = e
+    return error
+
+
+def _download_stream(url, path, size, ranges, retries, timeout):
+    '''Downloads the file at given url into given path using 1 connection. If the server supports range requests, continues from the last received byte when the connection breaks, including bytes of an earlier, incomplete download at given path.
+    Returns:
+        `None` on success, the last encountered exception on failure.'''
+    error = None
+    for attempt in range(retries):
+        if attempt > 0:
+            time.sleep(_download_backoff(attempt))
+        position = os.path.getsize(path) if ranges and os.path.isfile(path) else 0
+        if size != None and position == size:
+            return None
+        if size != None and position > size: # File at path is not an earlier download of this url.
+            position = 0
+        try:
+            headers = {'Range': 'bytes={}-'.format(position)} if position > 0 else dict()
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+                resumed = position > 0 and response.status == 206
+                with open(path, 'ab' if resumed else 'wb') as f:
+                    while True:
+                        data = response.read(_download_chunk)
+                        if not data:
+                            break
+                        f.write(data)
+            if size == None or os.path.getsize(path) == size:
+                return None
+            error = IOError('Connection closed after {}/{} bytes'.format(os.path.getsize(path), size))
+        except OSError as e:
+            error = e
+    return error
+
+
+def file_sha256(path):
+    '''Returns the sha256 hexdigest of the file at given path.'''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_download_chunk), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def download(url, path, sha256=None, segments=1, retries=5, timeout=30, silent=False):
+    '''Downloads a file, resuming broken connections.
+    Args:
+        url (str): URL to download.
+        path (str): Path to store the file at. If an incomplete download exists at this path, it is resumed (when the server supports range requests).
+        sha256 (optional str): If set, verifies that the sha256 hexdigest of the downloaded file matches given value.
+        segments (optional int): Number of parallel connections to download with. Only used when the server supports range requests and reports the file size.
+        retries (optional int): Number of attempts per connection.
+        timeout (optional int): Timeout in seconds for connecting and for each read.
+        silent (optional bool): If set, does not print progress.
+
+    Returns:
+        `True` on success, `False` on failure. On checksum mismatch, the downloaded file is removed.'''
+    size, ranges = None, False
+    for attempt in range(retries):
+        try:
+            size, ranges = _download_probe(url, timeout)
+            break
+        except OSError as e:
+            if attempt == retries-1:
+                printe('Could not connect to {}: {}'.format(url, e))
+                return False
+            time.sleep(_download_backoff(attempt+1))
+
+    if not silent:
+        print('Fetching {} ({}{})'.format(url, '{} bytes'.format(size) if size != None else 'unknown size', ', {} segments'.format(segments) if ranges and size and segments > 1 else ''))
+    if ranges and size and segments > 1:
+        with open(path, 'wb') as f: # Preallocates the file, so segments can write at their own offsets.
+            f.truncate(size)
+        segment_size = -(-size // segments)
+        bounds = [(x, min(x+segment_size, size)-1) for x in range(0, size, segment_size)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+            futures = [executor.submit(_download_range, url, path, start, end, retries, timeout) for start, end in bounds]
+            errors = [x.result() for x in futures]
+        error = next((x for x in errors if x != None), None)
+    else:
+        error = _download_stream(url, path, size, ranges, retries, timeout)
+    if error != None:
+        printe('Could not download {}: {}'.format(url, error))
+        return False
+
+    if sha256:
+        found = file_sha256(path)
+        if found != sha256.lower():
+            printe('Checksum mismatch for {}: expected sha256 {}, found {}.'.format(url, sha256, found))
+            os.remove(path)
+            return False
+    return True
+
+
+def download_unpack(url, extract_dir, sha256=None, segments=1, retries=5, timeout=30, silent=False):
+    '''Downloads an archive and extracts it in given directory. The archive is stored in a temporary directory, which is removed afterwards.
+    Args:
+        url (str): URL of archive to download. The archive format is derived from the filename in the url, e.g. '.zip', '.tar.gz'. Unknown formats are handled as zip.
+        extract_dir (str): Directory to extract archive in.
+        sha256 (optional str): If set, verifies that the sha256 hexdigest of the downloaded archive matches given value.
+        segments (optional int): Number of parallel connections to download with.
+        retries (optional int): Number of attempts per connection.
+        timeout (optional int): Timeout in seconds for connecting and for each read.
+        silent (optional bool): If set, does not print progress.
+
+    Returns:
+        `True` on success, `False` on failure.'''
+    name = url.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+    if not name.endswith(('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')):
+        name = 'archive.zip'
+    with tempfile.TemporaryDirectory() as tmpdir:
+        archiveloc = os.path.join(tmpdir, name)
+        if not download(url, archiveloc, sha256=sha256, segments=segments, retries=retries, timeout=timeout, silent=silent):
+            return False
+        try:
+            unpack(archiveloc, extract_dir)
+            return True
+        except Exception as e:
+            printe('Could not extract {}: {}'.format(url, e))
+            return False
\ No newline at end of file
@@ -1,6 +1,9 @@
 import subprocess
+import heapq
 import os
+import queue
 import threading
+import time
 
 class Executor(object):
     '''Object to run subprocess commands in a separate thread. This way, Python can continue operating while interacting  with subprocesses.'''
@@ -11,6 +14,10 @@ class Executor(object):
         self.thread = None
         self.process = None
         self.kwargs = kwargs
+        self.start_time = None
+        self.end_time = None
+        self._lock = threading.Lock()
+        self._listeners = []
 
     def run(self):
         '''Run command. Returns immediately after booting a thread'''
@@ -22,31 +29,73 @@ class Executor(object):
             self.kwargs = kwargs
 
         def target(**kwargs):
-            self.process = subprocess.Popen(self.cmd, **kwargs)
-            self.process.communicate()
-            self.stopped = True
+            try:
+                self.process = subprocess.Popen(self.cmd, **kwargs)
+                self.process.communicate()
+            finally:
+                self._finish()
 
+        self.start_time = time.time()
         self.thread = threading.Thread(target=target, kwargs=self.kwargs)
-        self.thread.start()
         self.started = True
+        self.thread.start()
 
     def run_direct(self):
         '''Run command on current thread, waiting until it completes.
         Note: Some commands never return, which will make this function non-returning.'''
-        self.process = subprocess.Popen(self.cmd, **self.kwargs)
+        self.start_time = time.time()
         self.started = True
-        self.process.communicate()
-        self.stopped = True
+        try:
+            self.process = subprocess.Popen(self.cmd, **self.kwargs)
+            self.process.communicate()
+        finally:
+            self._finish()
         return self.process.returncode
 
     def wait(self):
         '''Block until this executor is done.'''
         if not self.started:
             raise RuntimeError('Executor with command "{}" not yet started, cannot wait'.format(self.cmd))
-        if self.stopped:
-            return self.process.returncode
-        self.thread.join()
-        return self.process.returncode
+        if not self.stopped:
+            self.thread.join()
+        return self.returncode
+
+
+    @property
+    def returncode(self):
+        '''Returncode of the finished process, `None` if it is still running, or `1` if the process could not be spawned.'''
+        if not self.stopped:
+            return None
+        return self.process.returncode if self.process != None else 1
+
+
+    @property
+    def duration(self):
+        '''Wall time in seconds this executor ran (or has been running so far), `None` if it never started.'''
+        if self.start_time == None:
+            return None
+        return (self.end_time if self.end_time != None else time.time()) - self.start_time
+
+
+    def _finish(self):
+        '''Marks this executor as done and notifies everyone waiting for its completion.'''
+        with self._lock:
+            self.end_time = time.time()
+            self.stopped = True
+            listeners = self._listeners
+            self._listeners = []
+        for callback in listeners:
+            callback(self)
+
+
+    def add_done_callback(self, callback):
+        '''Registers `callback(executor)`, called from the executor thread as soon as the command finishes.
+        If the command already finished, the callback is called immediately.'''
+        with self._lock:
+            if not self.stopped:
+                self._listeners.append(callback)
+                return
+        callback(self)
 
 
     def stop(self):
@@ -54,15 +103,17 @@ class Executor(object):
         if self.started and not self.stopped:
             if self.thread.is_alive():
                 #If command fails, or when stopping directly after starting
-                for x in range(5):
+                for x in range(5000):
                     if self.process == None:
-                        time.sleep(1)
+                        time.sleep(0.001)
                     else:
                         break
                 if self.process != None:
-                    self.process.terminate()
+                    try:
+                        self.process.terminate()
+                    except ProcessLookupError:
+                        pass
                 self.thread.join()
-                self.stopped = True
         return self.process.returncode if self.process != None else 1
 
 
@@ -71,7 +122,9 @@ class Executor(object):
         self.stop()
         self.started = False
         self.stopped = False
-        self.run(**self.kwargs)
+        self.start_time = None
+        self.end_time = None
+        self.run()
 
 
     def get_pid(self):
@@ -91,34 +144,62 @@ class Executor(object):
             print('Experienced errors:')
             for idx, x in enumerate(returncodes):
                 if x != 0:
-                    print('\treturncode: {} - command: {}'.format(x, executors[idx].cmd))
+                    print('\treturncode: {} - time: {} - command: {}'.format(x, Executor.__format_duration(executors[idx].duration), executors[idx].cmd))
 
     @staticmethod
-    def wait_all(executors, stop_on_error=True, return_returncodes=False, print_on_error=False):
+    def __print_timings(executors):
+        print('Command timings (completion order):')
+        for x in sorted(executors, key=lambda x: x.end_time if x.end_time != None else float('inf')):
+            print('\t{} - returncode: {} - command: {}'.format(Executor.__format_duration(x.duration), x.returncode, x.cmd))
+
+    @staticmethod
+    def __format_duration(duration):
+        return '{:.3f}s'.format(duration) if duration != None else '-'
+
+    @staticmethod
+    def wait_all(executors, stop_on_error=True, return_returncodes=False, print_on_error=False, print_timings=False):
         '''Waits for all executors before returning control.
+        Executors are reaped in completion order: the first executor to finish is handled first, regardless of its position in `executors`.
         Args:
             stop_on_error: If set, immediately kills all remaining executors when encountering an error. Otherwise, we continue executing the other executors.
             return_returncodes: If set, returns the process returncodes. Otherwise, returns regular `True`/`False` (see below).
             print_on_error: If set, prints the command(s) responsible for errors. Otherwise, this function is silent.
+            print_timings: If set, prints the wall time of every command once all executors are done.
 
         Returns:
-            `True` if all processes sucessfully executed, `False` otherwise.'''
-        returncodes = []
-        status = True
+            `True` if all processes sucessfully executed, `False` otherwise.
+            If `return_returncodes` is set, returns the returncodes instead, in the order of `executors`.'''
+        executors = list(executors)
         for x in executors:
-            returncode = x.wait()
-            returncodes.append(returncode)
+            if not x.started:
+                raise RuntimeError('Executor with command "{}" not yet started, cannot wait'.format(x.cmd))
+        return Executor._wait_completion_order(executors, stop_on_error, return_returncodes, print_on_error, print_timings, Executor.stop_all)
+
+    @staticmethod
+    def _wait_completion_order(executors, stop_on_error, return_returncodes, print_on_error, print_timings, stop_func):
+        '''Implementation of `wait_all`. Waits on a shared completion queue, filled by the executor threads as they finish.
+        Args:
+            stop_func (callable): Function called with all executors to stop the remaining ones when `stop_on_error` triggers.'''
+        completed = queue.Queue()
+        for idx, x in enumerate(executors):
+            x.add_done_callback(lambda executor, idx=idx: completed.put(idx))
+
+        returncodes = [None for x in executors]
+        status = True
+        for _ in range(len(executors)):
+            idx = completed.get()
+            returncode = executors[idx].wait()
+            returncodes[idx] = returncode
             if returncode != 0:
+                status = False
                 if stop_on_error: # We had an error during execution and must stop all now
-                    Executor.stop_all(executors) # Stop all other executors
-                    if print_on_error:
-                        Executor.__print_errors(returncodes, executors)
-                    return returncodes if return_returncodes else False
-                else:
-                    status = False
+                    stop_func(executors) # Stop all other executors
+                    returncodes = [x.returncode if x.returncode != None else 1 for x in executors]
+                    break
         if print_on_error and not status:
             Executor.__print_errors(returncodes, executors)
-            
+        if print_timings:
+            Executor.__print_timings(executors)
         return returncodes if return_returncodes else status
 
     @staticmethod
@@ -130,8 +211,107 @@ class Executor(object):
 
         Returns:
             nothing by default. If `as_generator` is  set, returns the exit status code for each executor.'''
+        if as_generator:
+            return (x.stop() for x in executors)
+        executors = list(executors)
+        for x in executors: # Signal everything first, so no executor waits on the termination of another.
+            if x.started and not x.stopped and x.process != None:
+                try:
+                    x.process.terminate()
+                except ProcessLookupError:
+                    pass
         for x in executors:
-            if as_generator:
-                yield x.stop()
+            x.stop()
+
+
+_max_in_flight = 32 # Default maximum number of commands an `ExecutorPool` runs at the same time.
+
+
+def set_max_in_flight(amount):
+    '''Sets the default maximum number of commands in flight for `ExecutorPool`s made afterwards. Does nothing when `amount` is `None`.'''
+    global _max_in_flight
+    if amount == None:
+        return
+    if amount < 1:
+        raise ValueError('ExecutorPool needs at least 1 executor in flight, got {}'.format(amount))
+    _max_in_flight = amount
+
+
+class ExecutorPool(object):
+    '''Runs `Executor`s with a bounded number of commands in flight. Submitted executors wait in an admission queue until a slot frees up.
+    Useful to fan out commands to many hosts without exhausting file descriptors or sshd `MaxStartups` slots on the receiving end.'''
+    def __init__(self, max_in_flight=None, priority=False):
+        '''Args:
+            max_in_flight (optional int): Maximum number of commands running at the same time. If `None`, uses the default set by `set_max_in_flight` (32, unless changed).
+            priority (optional bool): If set, admits waiting executors by lowest `priority` value first. Otherwise, admits in submission (FIFO) order.'''
+        if max_in_flight == None:
+            max_in_flight = _max_in_flight
+        if max_in_flight < 1:
+            raise ValueError('ExecutorPool needs at least 1 executor in flight, got {}'.format(max_in_flight))
+        self.max_in_flight = max_in_flight
+        self.priority = priority
+        self._lock = threading.RLock()
+        self._pending = []
+        self._counter = 0
+        self._in_flight = 0
+        self._submitted = []
+
+    def submit(self, executor, priority=0):
+        '''Submits an executor. It starts immediately if a slot is free, otherwise when one frees up.
+        Args:
+            executor (Executor): Executor to run. Must not have been started.
+            priority (optional int): Admission priority. Lower values are admitted first. Only used when the pool was made with `priority=True`.'''
+        if executor.started:
+            raise RuntimeError('Executor with command "{}" already started, cannot submit to pool'.format(executor.cmd))
+        with self._lock:
+            self._submitted.append(executor)
+            if self._in_flight < self.max_in_flight:
+                self._start(executor)
+            elif self.priority:
+                heapq.heappush(self._pending, (priority, self._counter, executor))
             else:
-                x.stop()
+                self._pending.append((priority, self._counter, executor))
+            self._counter += 1
+
+    def run_all(self, executors, priority=0):
+        '''Submits all given executors, with the same priority.'''
+        for x in executors:
+            self.submit(x, priority=priority)
+
+    def _start(self, executor):
+        # Must be called while holding `self._lock`.
+        self._in_flight += 1
+        executor.add_done_callback(self._on_done)
+        executor.run()
+
+    def _on_done(self, executor):
+        with self._lock:
+            self._in_flight -= 1
+            if self._pending:
+                if self.priority:
+                    _, _, executor = heapq.heappop(self._pending)
+                else:
+                    _, _, executor = self._pending.pop(0)
+                self._start(executor)
+
+    def wait_all(self, stop_on_error=True, return_returncodes=False, print_on_error=False, print_timings=False):
+        '''Waits for all executors submitted since the last `wait_all` call, in completion order. Semantics are the same as `Executor.wait_all`.
+        When stopping on error, executors still waiting for admission are never started, and count as failed (returncode 1).
+
+        Returns:
+            `True` if all processes sucessfully executed, `False` otherwise.
+            If `return_returncodes` is set, returns the returncodes instead, in submission order.'''
+        with self._lock:
+            executors = self._submitted
+            self._submitted = []
+        return Executor._wait_completion_order(executors, stop_on_error, return_returncodes, print_on_error, print_timings, lambda executors: self.stop_all(executors))
+
+    def stop_all(self, executors=None):
+        '''Drops all executors waiting for admission, and stops all running executors.
+        Args:
+            executors (optional iterable(Executor)): Executors to stop. If not given, stops all executors submitted since the last `wait_all` call.'''
+        with self._lock:
+            self._pending = []
+            if executors == None:
+                executors = list(self._submitted)
+        Executor.stop_all(executors)
@@ -127,18 +127,34 @@ def touch(path, *args):
     open(path, 'w').close()
 
 
-def unpack(filename, extract_dir):
+def _unpack_member(zip, info, target, buffer_size):
+    '''Extracts a single zip member to given target, copying `buffer_size` bytes at a time. Permissions stored in the archive are applied to the open file.'''
+    with zip.open(info) as source, open(target, 'wb') as f:
+        attr = info.external_attr >> 16
+        if attr != 0:
+            os.fchmod(f.fileno(), attr)
+        shutil.copyfileobj(source, f, buffer_size)
+
+
+def unpack(filename, extract_dir, workers=None, buffer_size=1024*1024):
+    '''Extracts an archive. Zip archives are extracted in a streaming fashion, preserving file permissions: Memory usage does not depend on the size of archive members.
+    Args:
+        filename (str): Path to archive.
+        extract_dir (str): Directory to extract archive in.
+        workers (optional int): Number of threads extracting zip members in parallel. If `None`, uses multiple threads only for archives of at least 64MB (uncompressed).
+        buffer_size (optional int): Number of bytes each thread copies at once.'''
     if not filename.endswith('.zip'):
         shutil.unpack_archive(filename, extract_dir)
         return
 
-    # Below code is taken from the shutil implementation: https://github.com/python/cpython/blob/78b2abca8e96b43f56ab1b9ad673aaa6bbe7e790/Lib/shutil.py#L1152-L1181
+    # Below code is based on the shutil implementation: https://github.com/python/cpython/blob/78b2abca8e96b43f56ab1b9ad673aaa6bbe7e790/Lib/shutil.py#L1152-L1181
     # All credits for this code to them. We changed it to work with our zipfile object, which maintains file permissions. Also, we substituted a function to make directories with our own.
     import zipfile  # late import for breaking circular dependency
     if not zipfile.is_zipfile(filename):
         raise shutil.ReadError("%s is not a zip file" % filename)
     zip = _ZipFileWithpermissions(filename)
     try:
+        members = []
         for info in zip.infolist():
             name = info.filename
             # don't extract absolute paths or ones with .. in them
@@ -149,17 +165,19 @@ def unpack(filename, extract_dir):
                 continue
             mkdir(dirname(target), exist_ok=True)
             if not name.endswith('/'):
-                # file
-                data = zip.read(info.filename)
-                f = open(target, 'wb')
-                try:
-                    f.write(data)
-                finally:
-                    f.close()
-                    del data
-                attr = info.external_attr >> 16
-                if attr != 0:
-                    os.chmod(target, attr)
+                members.append((info, target))
+
+        if workers == None:
+            workers = min(8, os.cpu_count() or 1) if sum(info.file_size for info, _ in members) >= 64*1024*1024 else 1
+        if workers <= 1 or len(members) <= 1:
+            for info, target in members:
+                _unpack_member(zip, info, target, buffer_size)
+        else:
+            import concurrent.futures
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor: # ZipFile supports reading multiple members concurrently, and decompression releases the GIL.
+                futures = [executor.submit(_unpack_member, zip, info, target, buffer_size) for info, target in members]
+                for x in futures:
+                    x.result()
     finally:
         zip.close()
 
@@ -0,0 +1,105 @@
+import concurrent.futures
+
+from rados_deploy.internal.util.printer import *
+from rados_deploy.internal.util.tracer import trace_span
+
+
+'''Dependency-graph scheduler: Runs every task as soon as all tasks it depends on have finished.'''
+
+
+class TaskGraph(object):
+    '''Collection of tasks with dependencies between them, executed with maximal parallelism.
+    A task fails when it raises an exception, or when it returns a falsy value and is marked as `required`.
+    When a task fails, no new tasks are started. Tasks already running are allowed to finish.'''
+    def __init__(self):
+        self._tasks = dict()
+        self._order = []
+
+    def add(self, name, func, args=(), kwargs=None, after=None, required=True):
+        '''Adds a task.
+        Args:
+            name (hashable): Unique name of the task, used to refer to it in `after` of other tasks.
+            func (callable): Function to execute.
+            args (optional tuple): Positional arguments for `func`.
+            kwargs (optional dict): Keyword arguments for `func`.
+            after (optional iterable): Names of tasks which must finish before this task starts.
+            required (optional bool): If set, a falsy return value of `func` counts as failure. Otherwise, the return value is ignored.
+
+        Returns:
+            `self`, to allow chaining.'''
+        if name in self._tasks:
+            raise ValueError('Task "{}" already exists.'.format(name))
+        self._tasks[name] = (func, tuple(args), dict(kwargs) if kwargs else dict(), list(after) if after else [], required)
+        self._order.append(name)
+        return self
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def _validate(self):
+        '''Checks that all dependencies exist, and that there are no dependency cycles. Raises `ValueError` otherwise.'''
+        for name in self._order:
+            for dependency in self._tasks[name][3]:
+                if not dependency in self._tasks:
+                    raise ValueError('Task "{}" depends on unknown task "{}".'.format(name, dependency))
+        remaining = {name: len(set(self._tasks[name][3])) for name in self._order}
+        dependents = self._dependents()
+        ready = [name for name, count in remaining.items() if count == 0]
+        visited = 0
+        while ready:
+            name = ready.pop()
+            visited += 1
+            for x in dependents[name]:
+                remaining[x] -= 1
+                if remaining[x] == 0:
+                    ready.append(x)
+        if visited != len(self._order):
+            raise ValueError('Tasks contain a dependency cycle, involving: {}'.format(', '.join(str(x) for x, count in remaining.items() if count > 0)))
+
+    def _dependents(self):
+        dependents = {name: [] for name in self._order}
+        for name in self._order:
+            for dependency in set(self._tasks[name][3]):
+                dependents[dependency].append(name)
+        return dependents
+
+    def _execute(self, name):
+        func, args, kwargs, _, required = self._tasks[name]
+        try:
+            with trace_span(str(name), category='task'):
+                result = func(*args, **kwargs)
+        except Exception as e:
+            printe('Task "{}" raised an error: {}'.format(name, e))
+            return False
+        return bool(result) if required else True
+
+    def run(self, max_workers=None):
+        '''Runs all tasks, each as soon as its dependencies are finished.
+        Args:
+            max_workers (optional int): Maximum number of tasks running at the same time. If not set, does not limit the number of tasks.
+
+        Returns:
+            `True` if all tasks succeeded, `False` otherwise.'''
+        self._validate()
+        if not self._order:
+            return True
+        remaining = {name: len(set(self._tasks[name][3])) for name in self._order}
+        dependents = self._dependents()
+
+        state_ok = True
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers if max_workers else len(self._order)) as executor:
+            running = {executor.submit(self._execute, name): name for name in self._order if remaining[name] == 0}
+            while running:
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if not future.result():
+                        if state_ok:
+                            printe('Task "{}" failed. Waiting for running tasks to finish...'.format(name))
+                        state_ok = False
+                        continue
+                    for x in dependents[name]:
+                        remaining[x] -= 1
+                        if remaining[x] == 0 and state_ok:
+                            running[executor.submit(self._execute, x)] = x
+        return state_ok
\ No newline at end of file
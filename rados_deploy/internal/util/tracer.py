@@ -0,0 +1,214 @@
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from rados_deploy.internal.util.executor import Executor
+from rados_deploy.internal.util.printer import *
+
+
+'''Records timed spans of deployment phases and commands, and exports them as a Chrome trace (viewable in chrome://tracing or https://ui.perfetto.dev).
+Tracing is disabled by default. When disabled, `trace_span` does nothing.
+When enabled, every `subprocess.call`, `subprocess.check_call`, `subprocess.check_output`, `remoto.process.check` and `Executor` run is recorded as well.
+Spans are grouped per host: Remote commands are attributed to the host they execute on.
+Note: Spans recorded on remote machines use the clock of that machine.'''
+
+
+_trace_enabled = False
+_trace_events = []
+_trace_lock = threading.Lock()
+_trace_local = threading.local() # Prevents recording commands issued from within recorded commands (e.g. `check_call` calls `call`).
+_trace_originals = dict()
+
+
+def _trace_hostname():
+    return socket.gethostname()
+
+
+def _trace_name(cmd):
+    '''Returns a short, readable span name for a command.'''
+    name = cmd if isinstance(cmd, str) else ' '.join(str(x) for x in cmd)
+    return name if len(name) <= 80 else name[:77]+'...'
+
+
+def tracing_enabled():
+    '''Returns `True` if tracing is enabled, `False` otherwise.'''
+    return _trace_enabled
+
+
+def trace_record(name, start, end, host=None, category='phase', args=None):
+    '''Records a finished span. Does nothing if tracing is disabled.
+    Args:
+        name (str): Name of the span.
+        start (float): Start time, in seconds since epoch.
+        end (float): End time, in seconds since epoch.
+        host (optional str): Host the span executed on. If `None`, uses the hostname of this machine.
+        category (optional str): Category of span, e.g. 'phase', 'task', 'command'.
+        args (optional dict): Extra information to attach to the span. Must be JSON-serializable.'''
+    if not _trace_enabled:
+        return
+    event = {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': int(start*1000000),
+        'dur': max(0, int((end-start)*1000000)),
+        'host': host if host else _trace_hostname(),
+        'tid': '{}:{}:{}'.format(_trace_hostname(), os.getpid(), threading.get_ident()),
+        'args': args if args else dict(),
+    }
+    with _trace_lock:
+        _trace_events.append(event)
+
+
+@contextlib.contextmanager
+def trace_span(name, host=None, category='phase', **kwargs):
+    '''Context manager recording the time spent in its body as a span. Does nothing if tracing is disabled.
+    Args:
+        name (str): Name of the span.
+        host (optional str): Host the span executes on. If `None`, uses the hostname of this machine.
+        category (optional str): Category of span.
+        kwargs (optional dict): Extra information to attach to the span. Must be JSON-serializable.'''
+    if not _trace_enabled:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        trace_record(name, start, time.time(), host=host, category=category, args=kwargs)
+
+
+def _trace_command(func, host_func=None):
+    '''Wraps a command-executing function, to record every call as a span.'''
+    def wrapped(*args, **kwargs):
+        if getattr(_trace_local, 'active', False):
+            return func(*args, **kwargs)
+        cmd = args[1] if host_func else (args[0] if len(args) > 0 else kwargs.get('args', ''))
+        host = host_func(args[0]) if host_func else None
+        _trace_local.active = True
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _trace_local.active = False
+            trace_record(_trace_name(cmd), start, time.time(), host=host, category='command', args={'cmd': cmd if isinstance(cmd, str) else ' '.join(str(x) for x in cmd)})
+    return wrapped
+
+
+def _trace_executor_finish(func):
+    '''Wraps `Executor._finish`, to record every finished executor as a span.'''
+    def wrapped(self):
+        func(self)
+        trace_record(_trace_name(self.cmd), self.start_time, self.end_time, category='command', args={'cmd': self.cmd if isinstance(self.cmd, str) else ' '.join(str(x) for x in self.cmd), 'returncode': self.returncode})
+    return wrapped
+
+
+def enable_tracing():
+    '''Enables tracing. Starts recording all commands executed in this process.'''
+    global _trace_enabled
+    with _trace_lock:
+        if _trace_enabled:
+            return
+        _trace_originals['subprocess'] = {x: getattr(subprocess, x) for x in ['call', 'check_call', 'check_output']}
+        for name, func in _trace_originals['subprocess'].items():
+            setattr(subprocess, name, _trace_command(func))
+
+        remoto_process = sys.modules.get('remoto.process') # Only patched when in use. Not all remote modules ship with remoto.
+        if remoto_process:
+            _trace_originals['remoto.process'] = remoto_process.check
+            remoto_process.check = _trace_command(remoto_process.check, host_func=lambda connection: getattr(connection, 'hostname', None))
+
+        _trace_originals['executor'] = Executor._finish
+        Executor._finish = _trace_executor_finish(Executor._finish)
+        _trace_enabled = True
+
+
+def disable_tracing():
+    '''Disables tracing, and restores all patched functions. Recorded spans are kept.'''
+    global _trace_enabled
+    with _trace_lock:
+        if not _trace_enabled:
+            return
+        for name, func in _trace_originals.pop('subprocess').items():
+            setattr(subprocess, name, func)
+        if 'remoto.process' in _trace_originals:
+            sys.modules['remoto.process'].check = _trace_originals.pop('remoto.process')
+        Executor._finish = _trace_originals.pop('executor')
+        _trace_enabled = False
+
+
+def trace_events(clear=False):
+    '''Returns a list of all recorded spans.
+    Args:
+        clear (optional bool): If set, removes returned spans from the recording.'''
+    with _trace_lock:
+        events = list(_trace_events)
+        if clear:
+            _trace_events.clear()
+    return events
+
+
+def trace_extend(events):
+    '''Adds spans recorded elsewhere (e.g. on a remote machine) to the recording.'''
+    with _trace_lock:
+        _trace_events.extend(events)
+
+
+def trace_export(path):
+    '''Writes all recorded spans to given path, in Chrome trace format. Every host gets its own process lane.
+    Returns:
+        `True` on success, `False` on failure.'''
+    events = trace_events()
+    hosts = {x: idx+1 for idx, x in enumerate(sorted(set(x['host'] for x in events)))}
+    threads = dict()
+    trace = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': host}} for host, pid in hosts.items()]
+    for x in sorted(events, key=lambda x: x['ts']):
+        pid = hosts[x['host']]
+        tid = threads.setdefault((pid, x['tid']), len(threads)+1)
+        trace.append({'name': x['name'], 'cat': x['cat'], 'ph': x['ph'], 'ts': x['ts'], 'dur': x['dur'], 'pid': pid, 'tid': tid, 'args': x['args']})
+    try:
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, file)
+        return True
+    except OSError as e:
+        printe('Could not write trace to "{}": {}'.format(path, e))
+        return False
+
+
+def trace_remote_call(remote_module, function_name, *args):
+    '''Calls a function of a remote module. When tracing is enabled, the remote side is traced as well, and its spans are added to the recording.
+    Note: The remote module must provide `call_traced`.
+    Args:
+        remote_module (remoto.JsonModuleExecute): Remote module to call function on.
+        function_name (str): Name of function to call.
+        args (tuple): Arguments for the function. Must be JSON-serializable.
+
+    Returns:
+        Return value of remote function.'''
+    if not _trace_enabled:
+        return getattr(remote_module, function_name)(*args)
+    with trace_span(function_name, category='remote'):
+        retval, events = remote_module.call_traced(function_name, *args)
+    trace_extend(events)
+    return retval
+
+
+def call_traced(function_name, *args):
+    '''Calls a function of this module with tracing enabled. Used by `trace_remote_call`.
+    Args:
+        function_name (str): Name of function to call.
+        args (tuple): Arguments for the function.
+
+    Returns:
+        `[return value, list of recorded spans]`.'''
+    enable_tracing()
+    try:
+        retval = globals()[function_name](*args)
+    finally:
+        disable_tracing()
+    return [retval, trace_events(clear=True)]
\ No newline at end of file
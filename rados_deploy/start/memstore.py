@@ -3,15 +3,15 @@ from rados_deploy.internal.remoto.modulegenerator import ModuleGenerator
 from rados_deploy.internal.remoto.ssh_wrapper import get_wrapper, close_wrappers
 from rados_deploy.internal.util.byteconverter import to_bytes
 import rados_deploy.internal.util.fs as fs
-import rados_deploy.internal.util.importer as importer
 from rados_deploy.internal.util.printer import *
+from rados_deploy.internal.util.tracer import trace_remote_call, trace_span
 
 from rados_deploy.start._internal import _pick_admin as _internal_pick_admin
 
 
-def _start_rados(remote_connection, module, reservation, mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, storage_size, silent=False, retries=5):
+def _start_rados(remote_connection, module, reservation, mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, storage_size, silent=False, retries=5, reconcile=False, max_in_flight=None):
     remote_module = remote_connection.import_module(module)
-    return remote_module.start_rados_memstore(str(reservation), mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, storage_size, silent, retries)
+    return trace_remote_call(remote_module, 'start_rados_memstore', str(reservation), mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, storage_size, silent, retries, reconcile, max_in_flight)
 
 
 def _generate_module_start(silent=False):
@@ -21,11 +21,14 @@ def _generate_module_start(silent=False):
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'util', 'printer.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'printer.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'util', 'executor.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'util', 'tracer.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'util', 'taskgraph.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'thirdparty', 'sshconf', 'sshconf.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'ssh_wrapper.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'designation.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'storagetype.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'env.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'apt.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'rados_util.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'config.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'pool.py'),
@@ -34,16 +37,18 @@ def _generate_module_start(silent=False):
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'mds.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'monitor.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'osd.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'state.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'health.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'start', 'shared.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'start', 'reconcile.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'start', 'memstore.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'remoto_base.py'),
     ]
     import metareserve.reservation as reserve
-    ModuleGenerator().with_modules(fs, reserve).with_files(*files).generate(generation_loc, allowed_imports=['remoto', 'remoto.process'], silent=True)
-    return importer.import_full_path(generation_loc)
+    return ModuleGenerator().with_modules(fs, reserve).with_files(*files).load(generation_loc, allowed_imports=['remoto', 'remoto.process'], silent=True, entrypoints=['start_rados_memstore', 'call_traced'], minify=True, compress=True)
 
 
-def memstore(reservation, key_path=None, admin_id=None, connectionwrapper=None, mountpoint_path=defaults.mountpoint_path(), osd_op_threads=defaults.osd_op_threads(), osd_pool_size=defaults.osd_pool_size(), osd_max_obj_size=defaults.osd_max_obj_size(), placement_groups=None, use_client_cache=True, storage_size=defaults.memstore_storage_size(), silent=False, retries=defaults.retries()):
+def memstore(reservation, key_path=None, admin_id=None, connectionwrapper=None, mountpoint_path=defaults.mountpoint_path(), osd_op_threads=defaults.osd_op_threads(), osd_pool_size=defaults.osd_pool_size(), osd_max_obj_size=defaults.osd_max_obj_size(), placement_groups=None, use_client_cache=True, storage_size=defaults.memstore_storage_size(), silent=False, retries=defaults.retries(), reconcile=False, max_in_flight=defaults.max_in_flight()):
     '''Boot RADOS-Ceph on an existing reservation, running memstore.
     Args:
         reservation (metareserve.Reservation): Reservation object with all nodes to start RADOS-Ceph on.
@@ -59,6 +64,8 @@ def memstore(reservation, key_path=None, admin_id=None, connectionwrapper=None,
         storage_size (optional str): Amount of bytes of RAM to allocate on each node. Value must use size indicator B, KiB, MiB, GiB, TiB.
         silent (optional bool): If set, we only print errors and critical info. Otherwise, more verbose output.
         retries (optional int): Number of tries we try to perform potentially-crashing operations.
+        reconcile (optional bool): If set, and a cluster with the same daemons is already running, only applies config changes and (re)mounts CephFS where needed, instead of rebuilding the cluster.
+        max_in_flight (optional int): Maximum number of commands running at the same time when fanning out to cluster nodes (e.g. ssh connections from the admin node).
 
     Returns:
         `(True, admin_node_id)` on success, `(False, None)` otherwise.'''
@@ -80,9 +87,11 @@ def memstore(reservation, key_path=None, admin_id=None, connectionwrapper=None,
         ssh_kwargs = {'IdentitiesOnly': 'yes', 'User': admin_picked.extra_info['user'], 'StrictHostKeyChecking': 'no'}
         if key_path:
             ssh_kwargs['IdentityFile'] = key_path
-        connectionwrapper = get_wrapper(admin_picked, admin_picked.ip_public, silent=silent, ssh_params=ssh_kwargs)
-    rados_module = _generate_module_start()
-    state_ok = _start_rados(connectionwrapper.connection, rados_module, reservation, mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, storage_size, silent=silent, retries=retries)
+        with trace_span('connect'):
+            connectionwrapper = get_wrapper(admin_picked, admin_picked.ip_public, silent=silent, ssh_params=ssh_kwargs)
+    with trace_span('generate module'):
+        rados_module = _generate_module_start()
+    state_ok = _start_rados(connectionwrapper.connection, rados_module, reservation, mountpoint_path, osd_op_threads, osd_pool_size, osd_max_obj_size, placement_groups, use_client_cache, storage_size, silent=silent, retries=retries, reconcile=reconcile, max_in_flight=max_in_flight)
 
     if local_connections:
         close_wrappers([connectionwrapper])
@@ -2,13 +2,13 @@ import rados_deploy.internal.defaults.start as start_defaults
 from rados_deploy.internal.remoto.modulegenerator import ModuleGenerator
 from rados_deploy.internal.remoto.ssh_wrapper import get_wrapper, close_wrappers
 import rados_deploy.internal.util.fs as fs
-import rados_deploy.internal.util.importer as importer
 from rados_deploy.internal.util.printer import *
+from rados_deploy.internal.util.tracer import trace_remote_call, trace_span
 
 
-def _stop_rados(remote_connection, module, reservation, mountpoint_path, silent=False):
+def _stop_rados(remote_connection, module, reservation, mountpoint_path, silent=False, max_in_flight=None):
     remote_module = remote_connection.import_module(module)
-    return remote_module.stop_rados_bluestore(str(reservation), mountpoint_path, silent)
+    return trace_remote_call(remote_module, 'stop_rados_bluestore', str(reservation), mountpoint_path, silent, max_in_flight)
 
 
 def _generate_module_stop(silent=False):
@@ -18,12 +18,14 @@ def _generate_module_stop(silent=False):
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'util', 'printer.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'printer.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'util', 'executor.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'util', 'tracer.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'thirdparty', 'sshconf', 'sshconf.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'ssh_wrapper.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'designation.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'rados_util.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'config.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'pool.py'),
+        fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'apt.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'cephfs.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'manager.py'),
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'rados', 'mds.py'),
@@ -33,8 +35,7 @@ def _generate_module_stop(silent=False):
         fs.join(fs.dirname(fs.dirname(fs.abspath(__file__))), 'internal', 'remoto', 'modules', 'remoto_base.py'),
     ]
     import metareserve.reservation as reserve
-    ModuleGenerator().with_modules(fs, reserve).with_files(*files).generate(generation_loc, allowed_imports=['remoto', 'remoto.process'], silent=True)
-    return importer.import_full_path(generation_loc)
+    return ModuleGenerator().with_modules(fs, reserve).with_files(*files).load(generation_loc, allowed_imports=['remoto', 'remoto.process'], silent=True, entrypoints=['stop_rados_bluestore', 'call_traced'], minify=True, compress=True)
 
 
 def _pick_admin(reservation, admin=None):
@@ -61,7 +62,7 @@ def _merge_kwargs(x, y):
     return z
 
 
-def bluestore(reservation, key_path=None, admin_id=None, connectionwrapper=None, mountpoint_path=start_defaults.mountpoint_path(), silent=False):
+def bluestore(reservation, key_path=None, admin_id=None, connectionwrapper=None, mountpoint_path=start_defaults.mountpoint_path(), silent=False, max_in_flight=start_defaults.max_in_flight()):
     '''Stop a running RADOS-Ceph cluster using bluestore.
     Args:
         reservation (`metareserve.Reservation`): Reservation object with all nodes to start RADOS-Ceph on.
@@ -70,7 +71,7 @@ def bluestore(reservation, key_path=None, admin_id=None, connectionwrapper=None,
         connectionwrapper (optional RemotoSSHWrapper): If set, uses given connection, instead of building a new one.
         mountpoint_path (optional str): Path where CephFS is mounted on all nodes.
         silent (optional bool): If set, we only print errors and critical info. Otherwise, more verbose output.
-        retries (optional int): Number of tries we try to perform potentially-crashing operations.
+        max_in_flight (optional int): Maximum number of commands running at the same time when fanning out to cluster nodes (e.g. ssh connections from the admin node).
 
     Returns:
         `True` on success, `False` otherwise.'''
@@ -86,11 +87,13 @@ def bluestore(reservation, key_path=None, admin_id=None, connectionwrapper=None,
         ssh_kwargs = {'IdentitiesOnly': 'yes', 'User': admin_picked.extra_info['user'], 'StrictHostKeyChecking': 'no'}
         if key_path:
             ssh_kwargs['IdentityFile'] = key_path
-        connectionwrapper = get_wrapper(admin_picked, admin_picked.ip_public, silent=silent, ssh_params=ssh_kwargs)
+        with trace_span('connect'):
+            connectionwrapper = get_wrapper(admin_picked, admin_picked.ip_public, silent=silent, ssh_params=ssh_kwargs)
 
 
-    rados_module = _generate_module_stop()
-    state_ok = _stop_rados(connectionwrapper.connection, rados_module, reservation, mountpoint_path, silent=silent)
+    with trace_span('generate module'):
+        rados_module = _generate_module_stop()
+    state_ok = _stop_rados(connectionwrapper.connection, rados_module, reservation, mountpoint_path, silent=silent, max_in_flight=max_in_flight)
     
     if local_connections:
         close_wrappers([connectionwrapper])
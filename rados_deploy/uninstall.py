@@ -4,14 +4,14 @@ import rados_deploy.internal.defaults.install as install_defaults
 from rados_deploy.internal.remoto.modulegenerator import ModuleGenerator
 from rados_deploy.internal.remoto.ssh_wrapper import get_wrappers, close_wrappers
 import rados_deploy.internal.util.fs as fs
-import rados_deploy.internal.util.importer as importer
 import rados_deploy.internal.util.location as loc
 from rados_deploy.internal.util.printer import *
+from rados_deploy.internal.util.tracer import trace_remote_call, trace_span
 
 
 def _uninstall(connection, module, install_dir=None, silent=False):
     remote_module = connection.import_module(module)
-    return remote_module.uninstall(install_dir, silent)
+    return trace_remote_call(remote_module, 'uninstall', install_dir, silent)
 
 
 def _generate_module_uninstall(silent=False):
@@ -20,12 +20,13 @@ def _generate_module_uninstall(silent=False):
     files = [
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'printer.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'printer.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'executor.py'),
+        fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'util', 'tracer.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'util.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'uninstall.py'),
         fs.join(fs.dirname(fs.abspath(__file__)), 'internal', 'remoto', 'modules', 'remoto_base.py'),
     ]
-    ModuleGenerator().with_module(fs).with_files(*files).generate(generation_loc, silent)
-    return importer.import_full_path(generation_loc)
+    return ModuleGenerator().with_module(fs).with_files(*files).load(generation_loc, silent=silent, entrypoints=['uninstall', 'call_traced'], minify=True, compress=True)
 
 
 def _pick_admin(reservation, admin=None):
@@ -67,12 +68,14 @@ def uninstall(reservation, install_dir=install_defaults.install_dir(), key_path=
         ssh_kwargs = {'IdentitiesOnly': 'yes', 'User': admin_picked.extra_info['user'], 'StrictHostKeyChecking': 'no'}
         if key_path:
             ssh_kwargs['IdentityFile'] = key_path
-        connectionwrappers = get_wrappers(reservation.nodes, lambda node: node.ip_public, ssh_params=ssh_kwargs, silent=silent)
+        with trace_span('connect'):
+            connectionwrappers = get_wrappers(reservation.nodes, lambda node: node.ip_public, ssh_params=ssh_kwargs, silent=silent)
     else:
         if not all(x.open for x in connectionwrappers):
             raise ValueError('SSH installation failed: At least one connection is already closed.')
 
-    uninstall_module = _generate_module_uninstall(silent=silent)
+    with trace_span('generate module'):
+        uninstall_module = _generate_module_uninstall(silent=silent)
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=len(reservation)) as executor:
         futures_uninstall = {node: executor.submit(_uninstall, wrapper.connection, uninstall_module, install_dir=install_dir, silent=silent) for node, wrapper in connectionwrappers.items()}
@@ -0,0 +1,23 @@
+from rados_deploy.internal.remoto.modules.artifacts import artifact_key
+
+
+def test_key_stable(tmp_path):
+    archive = tmp_path / 'source.tar.gz'
+    archive.write_bytes(b'source')
+    assert artifact_key(str(archive), ['-DA=1', '-DB=2']) == artifact_key(str(archive), ('-DA=1', '-DB=2'))
+
+
+def test_key_changes_with_content(tmp_path):
+    archive = tmp_path / 'source.tar.gz'
+    archive.write_bytes(b'source')
+    key = artifact_key(str(archive), ['-DA=1'])
+    archive.write_bytes(b'source changed')
+    assert artifact_key(str(archive), ['-DA=1']) != key
+
+
+def test_key_changes_with_flags(tmp_path):
+    archive = tmp_path / 'source.tar.gz'
+    archive.write_bytes(b'source')
+    assert artifact_key(str(archive), ['-DA=1']) != artifact_key(str(archive), ['-DA=2'])
+    assert artifact_key(str(archive), ['-DA=1', '-DB=2']) != artifact_key(str(archive), ['-DA=1-DB=2'])
+    assert artifact_key(str(archive), []) != artifact_key(str(archive), [''])
\ No newline at end of file
@@ -0,0 +1,44 @@
+import importlib.util
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def plugin():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rados_deploy', 'internal', 'data_deploy', 'rados_deploy.deploy.plugin.py')
+    spec = importlib.util.spec_from_file_location('rados_deploy_deploy_plugin', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_batch_files(plugin):
+    files = [('/r', 'a', 3), ('/r', 'b', 3), ('/r', 'c', 5), ('/r', 'd', 1), ('/r', 'e', 20)]
+    assert plugin._batch_files(files, 6) == [[files[0], files[1]], [files[2], files[3]], [files[4]]]
+
+
+def test_batch_files_empty(plugin):
+    assert plugin._batch_files([], 6) == []
+
+def test_shard_files(plugin):
+    files = [('/r', str(x), size) for x, size in enumerate([7, 5, 4, 3, 3, 2])]
+    shards = plugin._shard_files(files, 2)
+    assert sorted(x for shard in shards for x in shard) == sorted(files)
+    assert sorted(sum(x[2] for x in shard) for shard in shards) == [12, 12]
+
+
+def test_shard_files_lpt_bound(plugin):
+    sizes = [(x*7919) % 1000 + 1 for x in range(200)]
+    files = [('/r', str(x), size) for x, size in enumerate(sizes)]
+    for streams in (1, 3, 8, 16):
+        totals = [sum(x[2] for x in shard) for shard in plugin._shard_files(files, streams)]
+        assert len(totals) == streams
+        assert max(totals) - min(totals) <= max(sizes) # Every file goes to the smallest shard, so no shard exceeds another by more than 1 file.
+
+
+def test_shard_files_few_files(plugin):
+    files = [('/r', 'a', 1), ('/r', 'b', 2)]
+    shards = plugin._shard_files(files, 8)
+    assert len(shards) == 2 and all(shards)
+    assert plugin._shard_files([], 8) == []
\ No newline at end of file
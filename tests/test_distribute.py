@@ -0,0 +1,62 @@
+import hashlib
+import math
+import os
+
+import pytest
+
+from rados_deploy.internal.remoto.modules.distribute import checksum, distribution_rounds, remote_checksums
+from rados_deploy.internal.util.executor import set_max_in_flight
+
+
+@pytest.mark.parametrize('amount', [1, 2, 3, 4, 7, 8, 100])
+def test_rounds(amount):
+    hosts = ['node{}'.format(x) for x in range(amount)]
+    rounds = distribution_rounds(hosts)
+    assert len(rounds) == math.ceil(math.log2(amount+1))
+    assert sorted(dst for pairs in rounds for _, dst in pairs) == sorted(hosts)
+
+    holders = {None}
+    for pairs in rounds:
+        assert len(pairs) == min(len(holders), amount+1-len(holders)) # Every holder sends to at most 1 node per round.
+        assert all(src in holders for src, _ in pairs)
+        assert len(set(src for src, _ in pairs)) == len(pairs)
+        holders.update(dst for _, dst in pairs)
+
+
+def test_rounds_empty():
+    assert distribution_rounds([]) == []
+
+
+def test_rounds_falsy_hostname():
+    assert distribution_rounds(['']) == [[(None, '')]]
+
+@pytest.fixture
+def local_ssh(tmp_path, monkeypatch):
+    '''Puts an `ssh` on the path which runs commands locally, failing for host "down".'''
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    ssh = bindir / 'ssh'
+    ssh.write_text('#!/bin/sh\n[ "$1" = down ] && exit 255\nshift\nexec sh -c "$*"\n')
+    ssh.chmod(0o755)
+    monkeypatch.setenv('PATH', '{}:{}'.format(bindir, os.environ['PATH']))
+
+
+def test_remote_checksums(tmp_path, local_ssh):
+    present = tmp_path / 'present'
+    present.write_bytes(b'data')
+    missing = tmp_path / 'missing'
+    found = remote_checksums(['a', 'down', 'b'], [str(present), str(missing)])
+    assert found == {'a': {str(present): checksum(str(present))}, 'down': {}, 'b': {str(present): checksum(str(present))}}
+    assert checksum(str(present)) == hashlib.sha256(b'data').hexdigest()
+
+
+def test_remote_checksums_small_pool(tmp_path, local_ssh):
+    present = tmp_path / 'present'
+    present.write_bytes(b'data')
+    set_max_in_flight(2)
+    try:
+        found = remote_checksums(['node{}'.format(x) for x in range(10)], [str(present)])
+    finally:
+        set_max_in_flight(32)
+    assert all(x == {str(present): checksum(str(present))} for x in found.values())
+    assert len(found) == 10
\ No newline at end of file
@@ -0,0 +1,149 @@
+import hashlib
+import http.server
+import threading
+
+import pytest
+
+import rados_deploy.internal.util.download as download
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    '''Serves `server.content`. Supports range requests if `server.ranges` is set.
+    The first `server.drops` GET requests send only half of the requested bytes before closing the connection.'''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _range(self):
+        header = self.headers.get('Range')
+        if not (self.server.ranges and header):
+            return None
+        start, end = header.split('=', 1)[1].split('-', 1)
+        return int(start), int(end) if end else len(self.server.content)-1
+
+    def _send_headers(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        if self.server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        for key, val in (extra or dict()).items():
+            self.send_header(key, val)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.server.requests.append(('HEAD', None))
+        self._send_headers(200, len(self.server.content))
+
+    def do_GET(self):
+        bounds = self._range()
+        self.server.requests.append(('GET', bounds))
+        if bounds == None:
+            data = self.server.content
+            self._send_headers(200, len(data))
+        else:
+            data = self.server.content[bounds[0]:bounds[1]+1]
+            self._send_headers(206, len(data), {'Content-Range': 'bytes {}-{}/{}'.format(bounds[0], bounds[1], len(self.server.content))})
+        with self.server.lock:
+            drop = self.server.drops > 0
+            self.server.drops -= 1
+        if drop:
+            self.wfile.write(data[:len(data)//2])
+            self.wfile.flush()
+            self.close_connection = True
+        else:
+            self.wfile.write(data)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(download, '_download_backoff', lambda attempt: 0)
+    monkeypatch.setattr(download, '_download_chunk', 1024)
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.content = bytes(x % 251 for x in range(100*1024+17))
+    httpd.ranges = True
+    httpd.drops = 0
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.url = 'http://127.0.0.1:{}/file.bin'.format(httpd.server_address[1])
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_probe(server):
+    assert download._download_probe(server.url, 5) == (len(server.content), True)
+    server.ranges = False
+    assert download._download_probe(server.url, 5) == (len(server.content), False)
+    assert all(method == 'HEAD' for method, _ in server.requests)
+
+
+def test_download_without_ranges(server, tmp_path):
+    server.ranges = False
+    path = tmp_path / 'file.bin'
+    assert download.download(server.url, str(path), sha256=_sha256(server.content), silent=True)
+    assert path.read_bytes() == server.content
+
+
+def test_download_without_ranges_restarts(server, tmp_path):
+    server.ranges = False
+    server.drops = 1
+    path = tmp_path / 'file.bin'
+    assert download.download(server.url, str(path), sha256=_sha256(server.content), silent=True)
+    assert path.read_bytes() == server.content
+    assert [bounds for method, bounds in server.requests if method == 'GET'] == [None, None]
+
+
+def test_download_segments(server, tmp_path):
+    path = tmp_path / 'file.bin'
+    assert download.download(server.url, str(path), sha256=_sha256(server.content), segments=4, silent=True)
+    assert path.read_bytes() == server.content
+    gets = sorted(bounds for method, bounds in server.requests if method == 'GET')
+    assert len(gets) == 4
+    assert gets[0][0] == 0 and gets[-1][1] == len(server.content)-1
+    assert all(x[1]+1 == y[0] for x, y in zip(gets, gets[1:]))
+
+
+def test_download_segments_resume(server, tmp_path):
+    server.drops = 4
+    path = tmp_path / 'file.bin'
+    assert download.download(server.url, str(path), sha256=_sha256(server.content), segments=4, silent=True)
+    assert path.read_bytes() == server.content
+    assert len([1 for method, _ in server.requests if method == 'GET']) == 8
+
+
+def test_download_resume(server, tmp_path):
+    server.drops = 1
+    path = tmp_path / 'file.bin'
+    assert download.download(server.url, str(path), sha256=_sha256(server.content), silent=True)
+    assert path.read_bytes() == server.content
+    gets = [bounds for method, bounds in server.requests if method == 'GET']
+    assert len(gets) == 2
+    assert gets[0] == None and gets[1][0] == len(server.content)//2 # Continues from the last received byte.
+
+
+def test_download_resume_earlier_download(server, tmp_path):
+    path = tmp_path / 'file.bin'
+    path.write_bytes(server.content[:1000])
+    assert download.download(server.url, str(path), silent=True)
+    assert path.read_bytes() == server.content
+    assert [bounds for method, bounds in server.requests if method == 'GET'] == [(1000, len(server.content)-1)]
+
+
+def test_download_retries_exhausted(server, tmp_path):
+    server.ranges = False
+    server.drops = 3
+    path = tmp_path / 'file.bin'
+    assert not download.download(server.url, str(path), retries=3, silent=True)
+
+
+def test_download_checksum_mismatch(server, tmp_path):
+    path = tmp_path / 'file.bin'
+    assert not download.download(server.url, str(path), sha256=_sha256(b'other'), silent=True)
+    assert not path.exists()
\ No newline at end of file
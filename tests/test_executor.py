@@ -0,0 +1,62 @@
+import sys
+
+import pytest
+
+import rados_deploy.internal.util.executor as executor_module
+from rados_deploy.internal.util.executor import Executor, ExecutorPool
+
+
+def _sleep(seconds, exitcode=0):
+    return Executor([sys.executable, '-c', 'import sys, time; time.sleep({}); sys.exit({})'.format(seconds, exitcode)])
+
+
+def test_wait_all_completion_order():
+    executors = [_sleep(0.3), _sleep(0), _sleep(0.1)]
+    Executor.run_all(executors)
+    assert Executor.wait_all(executors, return_returncodes=True) == [0, 0, 0]
+    assert executors[1].end_time <= executors[2].end_time <= executors[0].end_time
+
+
+def test_wait_all_failure():
+    executors = [_sleep(0, exitcode=3), _sleep(0)]
+    Executor.run_all(executors)
+    assert not Executor.wait_all(executors, stop_on_error=False)
+
+
+def test_pool_bounds_in_flight():
+    pool = ExecutorPool(max_in_flight=2)
+    executors = [_sleep(0.2) for _ in range(5)]
+    pool.run_all(executors)
+    assert sum(x.started for x in executors) == 2
+    assert pool.wait_all()
+    assert all(x.stopped and x.returncode == 0 for x in executors)
+
+
+def test_pool_priority():
+    pool = ExecutorPool(max_in_flight=1, priority=True)
+    first, low, high = _sleep(0.2), _sleep(0), _sleep(0)
+    pool.submit(first)
+    pool.submit(low, priority=5)
+    pool.submit(high, priority=1)
+    assert pool.wait_all()
+    assert high.start_time <= low.start_time
+
+
+def test_pool_stop_on_error_drops_pending():
+    pool = ExecutorPool(max_in_flight=1)
+    executors = [_sleep(0, exitcode=1), _sleep(0), _sleep(0)]
+    pool.run_all(executors)
+    assert pool.wait_all(return_returncodes=True, stop_on_error=True)[0] == 1
+    assert not pool._pending
+
+
+def test_pool_default_max_in_flight(monkeypatch):
+    monkeypatch.setattr(executor_module, '_max_in_flight', 32)
+    assert ExecutorPool().max_in_flight == 32
+    executor_module.set_max_in_flight(4)
+    assert ExecutorPool().max_in_flight == 4
+    assert ExecutorPool(max_in_flight=2).max_in_flight == 2
+    executor_module.set_max_in_flight(None)
+    assert ExecutorPool().max_in_flight == 4
+    with pytest.raises(ValueError):
+        executor_module.set_max_in_flight(0)
\ No newline at end of file
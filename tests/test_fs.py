@@ -0,0 +1,42 @@
+import os
+import stat
+import zipfile
+
+import pytest
+
+from rados_deploy.internal.util.fs import unpack
+
+
+_members = {
+    'bin/tool': (b'#!/bin/sh\necho tool\n', 0o755),
+    'bin/script.sh': (b'#!/bin/sh\n', 0o750),
+    'lib/data.bin': (bytes(x % 256 for x in range(300*1024)), 0o644),
+    'lib/readonly.txt': (b'read only', 0o444),
+    'top.txt': (b'top', 0),  # No permissions stored in archive.
+}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / 'archive.zip'
+    with zipfile.ZipFile(str(path), 'w', compression=zipfile.ZIP_DEFLATED) as zip:
+        zip.writestr(zipfile.ZipInfo('bin/'), b'')
+        for name, (data, mode) in _members.items():
+            info = zipfile.ZipInfo(name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            if mode:
+                info.external_attr = (stat.S_IFREG | mode) << 16
+            zip.writestr(info, data)
+    return str(path)
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_unpack_zip(archive, tmp_path, workers):
+    extract_dir = tmp_path / 'out'
+    unpack(archive, str(extract_dir), workers=workers, buffer_size=4096)
+    for name, (data, mode) in _members.items():
+        path = extract_dir / name
+        assert path.read_bytes() == data
+        if mode:
+            assert stat.S_IMODE(os.stat(str(path)).st_mode) == mode
+    assert os.access(str(extract_dir / 'bin' / 'tool'), os.X_OK)
\ No newline at end of file
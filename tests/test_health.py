@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def health():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rados_deploy', 'internal', 'remoto', 'modules', 'rados', 'health.py')
+    namespace = dict()
+    with open(path, 'r') as f:
+        exec(compile(f.read(), path, 'exec'), namespace)
+    return namespace
+
+
+def _status(num_pgs, states):
+    return {'pgmap': {'num_pgs': num_pgs, 'pgs_by_state': [{'state_name': name, 'count': count} for name, count in states.items()]}}
+
+
+def test_pgs_active(health):
+    _, check = health['pgs_condition'](8)
+    assert check(_status(8, {'active+undersized': 4, 'active+clean+scrubbing': 4}))
+    assert check(_status(10, {'active+clean': 10}))
+    assert not check(_status(8, {'active+clean': 4, 'creating+peering': 4}))
+    assert not check(_status(8, {'peering': 8}))
+
+
+def test_pgs_active_waits_for_pgmap(health):
+    _, check = health['pgs_condition'](8)
+    assert not check(_status(0, {}))
+    assert not check(_status(4, {'active+clean': 4}))
+
+
+def test_pgs_clean(health):
+    _, check = health['pgs_condition'](8, clean=True)
+    assert check(_status(8, {'active+clean': 4, 'active+clean+snaptrim': 4}))
+    assert not check(_status(8, {'active+clean': 4, 'active+undersized+degraded': 4}))
\ No newline at end of file
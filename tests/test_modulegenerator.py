@@ -0,0 +1,89 @@
+import ast
+
+from rados_deploy.internal.remoto.modulegenerator import ModuleGenerator, _decompress, _minify, _prune
+
+
+_file_a = """import os
+
+
+'''Module docstring of a.'''
+
+def helper():
+    '''Docstring of helper.'''
+    return os.sep
+
+
+def unused():
+    return 'unused'
+"""
+
+_file_b = """import json
+
+
+'''Module docstring of b.'''
+
+def entry(x):
+    '''Docstring of entry.'''
+    return json.dumps([x, helper()])
+"""
+
+
+def _source(path):
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read())
+    source = _decompress(tree)
+    return source if source != None else ast.unparse(tree)
+
+
+def _write_inputs(tmp_path):
+    a, b = tmp_path / 'a.py', tmp_path / 'b.py'
+    a.write_text(_file_a)
+    b.write_text(_file_b)
+    return str(a), str(b)
+
+
+def test_prune_keeps_reachable():
+    source = _prune(_file_a+_file_b.replace('import json', ''), ['entry'], silent=True)
+    assert 'def helper' in source
+    assert 'def entry' in source
+    assert not 'def unused' in source
+
+
+def test_minify_drops_all_module_docstrings():
+    source = _minify(_file_a+_file_b, entrypoints=['entry'])
+    assert not 'Module docstring' in source
+    assert not 'Docstring of helper' in source
+    assert 'Docstring of entry' in source
+
+
+def test_generate_round_trip(tmp_path):
+    a, b = _write_inputs(tmp_path)
+    out = str(tmp_path / 'generated' / 'out.py')
+    module = ModuleGenerator().with_files(a, b).load(out, silent=True, entrypoints=['entry'], minify=True, compress=True)
+    assert module.entry(1) == '[1, "/"]'
+    assert module.entry.__doc__ == 'Docstring of entry.'
+
+    source = _source(out)
+    assert 'def helper' in source
+    assert not 'def unused' in source
+    assert not 'docstring' in source.lower().replace('docstring of entry', '')
+
+
+def test_generate_cache(tmp_path):
+    a, b = _write_inputs(tmp_path)
+    out = str(tmp_path / 'out.py')
+    assert ModuleGenerator().with_files(a, b).generate(out, silent=True, entrypoints=['entry'])
+    assert not ModuleGenerator().with_files(a, b).generate(out, silent=True, entrypoints=['entry'])
+    assert ModuleGenerator().with_files(a, b).generate(out, silent=True, entrypoints=['entry'], compress=True) # Options are part of the cache key.
+
+    with open(b, 'a') as f:
+        f.write('\n# changed\n')
+    assert ModuleGenerator().with_files(a, b).generate(out, silent=True, entrypoints=['entry'], compress=True)
+
+    module = ModuleGenerator().with_files(a, b).load(out, silent=True, entrypoints=['entry'], compress=True)
+    assert ModuleGenerator().with_files(a, b).load(out, silent=True, entrypoints=['entry'], compress=True) is module
+
+def test_dotted_imports_do_not_collide():
+    generator = ModuleGenerator()
+    assert generator._check_collisions({('os', None), ('os.path', None)}, set(), silent=True) == []
+    assert generator._check_collisions({('os', None), ('posixpath', 'os')}, set(), silent=True) == ['os']
\ No newline at end of file
@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import types
+
+import pytest
+
+from rados_deploy.internal.util.executor import Executor, ExecutorPool
+
+
+class _Ceph(object):
+    '''Stand-in for the `subprocess` module, answering `ceph osd ls` with the OSDs which remain after the removal session.'''
+    CalledProcessError = subprocess.CalledProcessError
+    DEVNULL = subprocess.DEVNULL
+
+    def __init__(self, osd_ids, removed, reachable=True):
+        self.osd_ids = list(osd_ids)
+        self.removed = removed
+        self.reachable = reachable
+        self.sessions = []
+
+    def check_output(self, cmd, **kwargs):
+        if not self.reachable:
+            raise subprocess.CalledProcessError(1, cmd)
+        return json.dumps(self.osd_ids).encode('utf-8')
+
+    def run(self, cmd, input=None, **kwargs):
+        self.sessions.append(input.splitlines())
+        self.osd_ids = [x for x in self.osd_ids if not x in self.removed]
+        return types.SimpleNamespace(returncode=0)
+
+
+@pytest.fixture
+def osd():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rados_deploy', 'internal', 'remoto', 'modules', 'rados', 'osd.py')
+    errors = []
+    namespace = {'printe': errors.append, 'printw': lambda *args, **kwargs: None, 'Executor': Executor, 'ExecutorPool': ExecutorPool}
+    with open(path, 'r') as f:
+        exec(compile(f.read(), path, 'exec'), namespace)
+    namespace['errors'] = errors
+    return namespace
+
+
+def test_remove_osds(osd):
+    osd['subprocess'] = _Ceph([0, 1, 2], removed=[0, 1, 2])
+    assert osd['_remove_osds']([0, 1, 2], True)
+    assert len(osd['subprocess'].sessions) == 1
+    assert 'osd rm 0 1 2' in osd['subprocess'].sessions[0]
+    assert osd['errors'] == []
+
+
+def test_remove_osd_zero(osd):
+    osd['subprocess'] = _Ceph([0], removed=[0])
+    assert osd['_remove_osds']([0], True)
+    assert len(osd['subprocess'].sessions) == 1
+
+
+def test_remove_osds_empty(osd):
+    osd['subprocess'] = _Ceph([], removed=[])
+    assert osd['_remove_osds']([], True)
+    assert osd['subprocess'].sessions == []
+
+
+def test_remove_osds_remaining(osd):
+    osd['subprocess'] = _Ceph([0, 1], removed=[0])
+    assert not osd['_remove_osds']([0, 1], True)
+    assert 'osd.1' in osd['errors'][0]
+
+
+def test_remove_osds_unverified(osd):
+    ceph = _Ceph([0], removed=[0])
+    osd['subprocess'] = ceph
+    ceph.run = lambda cmd, **kwargs: setattr(ceph, 'reachable', False)
+    assert not osd['_remove_osds']([0], True)
+    assert len(osd['errors']) == 1
+
+
+def test_stop_and_remove_unlisted(osd):
+    osd['subprocess'] = _Ceph([0], removed=[0], reachable=False)
+    assert not osd['_stop_and_remove_osds']([], True)
+    assert osd['subprocess'].sessions == []
+    assert len(osd['errors']) == 1
+
+
+def test_stop_and_remove_remaining(osd):
+    osd['subprocess'] = _Ceph([0, 1], removed=[1])
+    assert not osd['_stop_and_remove_osds']([], True)
+    assert 'osd.0' in osd['errors'][0]
\ No newline at end of file
@@ -0,0 +1,45 @@
+from rados_deploy.internal.remoto.modules.rados_ingest import object_extents, object_name
+
+
+def test_object_name():
+    assert object_name(0x10000000001, 0) == '10000000001.00000000'
+    assert object_name(0x10000000001, 0x1f) == '10000000001.0000001f'
+
+
+def test_extents_default_layout():
+    mb = 1024*1024
+    extents = object_extents(10*mb, 4*mb, 1, 4*mb)
+    assert extents == {0: [(0, 0, 4*mb)], 1: [(4*mb, 0, 4*mb)], 2: [(8*mb, 0, 2*mb)]}
+
+
+def test_extents_large_objects_are_contiguous():
+    mb = 1024*1024
+    extents = object_extents(10*mb, 4*mb, 1, 8*mb)
+    assert extents == {0: [(0, 0, 4*mb), (4*mb, 4*mb, 4*mb)], 1: [(8*mb, 0, 2*mb)]}
+
+
+def test_extents_striped():
+    # Stripe units are dealt round-robin over 3 objects, 2 units per object.
+    extents = object_extents(20, 2, 3, 4)
+    assert extents == {
+        0: [(0, 0, 2), (6, 2, 2)],
+        1: [(2, 0, 2), (8, 2, 2)],
+        2: [(4, 0, 2), (10, 2, 2)],
+        3: [(12, 0, 2), (18, 2, 2)],
+        4: [(14, 0, 2)],
+        5: [(16, 0, 2)],
+    }
+
+
+def test_extents_cover_file():
+    size = 1000003
+    extents = object_extents(size, 4096, 4, 65536)
+    covered = sorted((offset, length) for x in extents.values() for offset, _, length in x)
+    assert covered[0][0] == 0
+    assert all(a[0]+a[1] == b[0] for a, b in zip(covered, covered[1:]))
+    assert covered[-1][0]+covered[-1][1] == size
+    assert all(object_offset+length <= 65536 for x in extents.values() for _, object_offset, length in x)
+
+
+def test_extents_empty_file():
+    assert object_extents(0, 4096, 1, 4096) == dict()
\ No newline at end of file
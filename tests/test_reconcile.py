@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from rados_deploy import StorageType
+
+
+_modules = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rados_deploy', 'internal', 'remoto', 'modules')
+
+
+def _load(path, **names):
+    '''Executes a remote module file, providing the names it would normally get from the files it is merged with.'''
+    namespace = dict(names)
+    with open(os.path.join(_modules, path), 'r') as f:
+        exec(compile(f.read(), path, 'exec'), namespace)
+    return namespace
+
+
+class _Node(object):
+    def __init__(self, hostname):
+        self.hostname = hostname
+
+
+@pytest.fixture(scope='module')
+def shared():
+    return _load(os.path.join('start', 'shared.py'), isfile=os.path.isfile, StorageType=StorageType)
+
+
+@pytest.fixture(scope='module')
+def state():
+    return _load(os.path.join('rados', 'state.py'), printw=lambda *args, **kwargs: None)
+
+
+def _write_config(tmp_path, lines):
+    path = tmp_path / 'ceph.conf'
+    path.write_text('[global]\n{}\n'.format('\n'.join(lines)))
+    return str(path)
+
+
+def test_config_delta(shared, tmp_path):
+    path = _write_config(tmp_path, ['osd pool default size = 3', 'mon allow pool delete = true'])
+    rules = {'osd pool default size': '1', 'mon allow pool delete': 'true', 'osd op threads': '8'}
+    assert shared['config_delta'](path, rules, StorageType.BLUESTORE) == {'osd pool default size': '1', 'osd op threads': '8'}
+
+
+def test_config_delta_unchanged(shared, tmp_path):
+    path = _write_config(tmp_path, ['osd pool default size = 1'])
+    assert shared['config_delta'](path, {'osd pool default size': '1'}, StorageType.BLUESTORE) == {}
+
+
+def test_config_delta_other_storage_type(shared, tmp_path):
+    path = _write_config(tmp_path, ['memstore device bytes = 1073741824'])
+    assert shared['config_delta'](path, {}, StorageType.BLUESTORE) == None
+    assert shared['config_delta'](path, {}, StorageType.MEMSTORE) == {}
+
+
+def test_config_delta_missing(shared, tmp_path):
+    assert shared['config_delta'](str(tmp_path / 'ceph.conf'), {}, StorageType.BLUESTORE) == None
+
+
+def _cluster_state(monitors, managers, mdss, osds):
+    '''Builds a cluster state as returned by `get_cluster_state`.
+    Args:
+        monitors (list(str)): Short hostnames in quorum.
+        managers (int): Number of available managers.
+        mdss (int): Number of running MDSs, of which 1 is active.
+        osds (dict(str, list(str))): Maps short hostnames to the status of each of their OSDs.'''
+    nodes, osd_id = [], 0
+    for host_id, (host, statuses) in enumerate(osds.items()):
+        children = []
+        for status in statuses:
+            nodes.append({'id': osd_id, 'type': 'osd', 'name': 'osd.{}'.format(osd_id), 'status': status, 'reweight': 1.0})
+            children.append(osd_id)
+            osd_id += 1
+        nodes.append({'id': -2-host_id, 'type': 'host', 'name': host, 'children': children})
+    status = {
+        'quorum_names': monitors,
+        'mgrmap': {'available': managers > 0, 'num_standbys': max(0, managers-1)},
+        'fsmap': {'up': 1 if mdss else 0, 'up:standby': max(0, mdss-1), 'by_rank': [{'status': 'up:active'}] if mdss else []}}
+    return {'status': status, 'osd_tree': {'nodes': nodes}, 'fs_ls': [{'name': 'cephfs', 'metadata_pool': 'cephfs_metadata', 'data_pools': ['cephfs_data']}]}
+
+
+def test_cluster_matches(state):
+    a, b = _Node('a.cluster'), _Node('b.cluster')
+    cluster = _cluster_state(['a'], 1, 1, {'a': ['up'], 'b': ['up', 'up']})
+    assert state['cluster_matches'](cluster, [a], [a], [b], {a: 1, b: 2}, True)
+
+
+@pytest.mark.parametrize('monitors,managers,mdss,osds', [
+    (['a', 'b'], 1, 1, {'a': ['up'], 'b': ['up', 'up']}), # Different monitors.
+    (['a'], 2, 1, {'a': ['up'], 'b': ['up', 'up']}), # Different number of managers.
+    (['a'], 1, 0, {'a': ['up'], 'b': ['up', 'up']}), # No MDS.
+    (['a'], 1, 1, {'a': ['up'], 'b': ['up', 'down']}), # OSD down.
+    (['a'], 1, 1, {'a': ['up'], 'b': ['up']}), # OSD missing.
+    (['a'], 1, 1, {'a': ['up'], 'b': ['up', 'up'], 'c': ['up']}), # Unexpected OSD.
+])
+def test_cluster_mismatches(state, monitors, managers, mdss, osds):
+    a, b = _Node('a.cluster'), _Node('b.cluster')
+    assert not state['cluster_matches'](_cluster_state(monitors, managers, mdss, osds), [a], [a], [b], {a: 1, b: 2}, True)
+
+
+def test_cluster_matches_without_cephfs(state):
+    a = _Node('a')
+    cluster = _cluster_state(['a'], 1, 1, {'a': ['up']})
+    cluster['fs_ls'] = []
+    assert not state['cluster_matches'](cluster, [a], [a], [a], {a: 1}, True)
\ No newline at end of file
@@ -0,0 +1,43 @@
+import pytest
+
+import rados_deploy.internal.remoto.ssh_wrapper as ssh_wrapper
+
+
+class _Connection(object):
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.closed = False
+
+    def exit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    built = []
+    def _build_conn(hostname, loggername, silent, ssh_configpath=None):
+        built.append(_Connection(hostname))
+        return built[-1]
+    monkeypatch.setattr(ssh_wrapper, '_build_conn', _build_conn)
+    monkeypatch.setattr(ssh_wrapper, '_pool', dict())
+    return built
+
+
+def test_same_params_share_connection(connections):
+    a = ssh_wrapper.get_wrapper(None, 'host', ssh_params={'User': 'u', 'Port': 22})
+    b = ssh_wrapper.get_wrapper(None, 'host', ssh_params={'Port': 22, 'User': 'u'})
+    assert a is b
+    assert len(connections) == 1
+    a.exit()
+    assert a.open and not connections[0].closed
+    b.exit()
+    assert not a.open and connections[0].closed
+
+
+def test_different_params_get_own_connection(connections):
+    a = ssh_wrapper.get_wrapper(None, 'host', ssh_params={'User': 'u', 'Port': 22})
+    b = ssh_wrapper.get_wrapper(None, 'host', ssh_params={'User': 'u', 'Port': 2222})
+    assert a is not b
+    assert len(connections) == 2
+    ssh_wrapper.close_wrappers([a, b])
+    assert all(x.closed for x in connections)
\ No newline at end of file
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from rados_deploy.internal.util.taskgraph import TaskGraph
+
+
+def test_dependency_order():
+    order = []
+    lock = threading.Lock()
+    def _task(name):
+        with lock:
+            order.append(name)
+        return True
+    graph = TaskGraph()
+    graph.add('c', _task, args=('c',), after=['a', 'b'])
+    graph.add('a', _task, args=('a',))
+    graph.add('b', _task, args=('b',), after=['a'])
+    assert graph.run()
+    assert order == ['a', 'b', 'c']
+
+
+def test_independent_tasks_run_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)
+    graph = TaskGraph()
+    graph.add('a', lambda: barrier.wait() is not None)
+    graph.add('b', lambda: barrier.wait() is not None)
+    assert graph.run()
+
+
+def test_cycle():
+    graph = TaskGraph()
+    graph.add('a', lambda: True, after=['c'])
+    graph.add('b', lambda: True, after=['a'])
+    graph.add('c', lambda: True, after=['b'])
+    graph.add('d', lambda: True)
+    with pytest.raises(ValueError, match='cycle'):
+        graph.run()
+
+
+def test_unknown_dependency():
+    graph = TaskGraph().add('a', lambda: True, after=['missing'])
+    with pytest.raises(ValueError, match='unknown'):
+        graph.run()
+
+
+def test_duplicate_name():
+    graph = TaskGraph().add('a', lambda: True)
+    with pytest.raises(ValueError):
+        graph.add('a', lambda: True)
+
+
+def test_failure_skips_dependents():
+    ran = []
+    graph = TaskGraph()
+    graph.add('a', lambda: False)
+    graph.add('b', lambda: ran.append('b') or True, after=['a'])
+    graph.add('c', lambda: ran.append('c') or True, after=['b'])
+    assert not graph.run()
+    assert ran == []
+
+
+def test_exception_fails_run():
+    def _raise():
+        raise RuntimeError('broken')
+    ran = []
+    graph = TaskGraph()
+    graph.add('a', _raise)
+    graph.add('b', lambda: ran.append('b') or True, after=['a'])
+    assert not graph.run()
+    assert ran == []
+
+
+def test_not_required_ignores_result():
+    ran = []
+    graph = TaskGraph()
+    graph.add('a', lambda: False, required=False)
+    graph.add('b', lambda: ran.append('b') or True, after=['a'])
+    assert graph.run()
+    assert ran == ['b']
+
+
+def test_empty():
+    assert TaskGraph().run()
\ No newline at end of file